@@ -0,0 +1,131 @@
+"""Compare per-row action inserts with the buffered `ActionWriter`.
+
+Starts a local PostgREST stand-in that accepts `POST /rest/v1/actions` (single rows
+or arrays), adds a fixed per-request latency and records the order rows arrive in.
+Concurrent simulated runs then save their step actions either:
+
+* direct:  one synchronous insert per action, as the step hook used to do
+* writer:  `ActionWriter.enqueue` per action and a `flush()` at end of run
+
+For each mode it reports time spent on the run threads, total time until every row
+is stored, HTTP requests made, and whether each msg_id's actions arrived in order.
+
+    python -m benchmarks.bench_action_writer --runs 20 --steps 8 --latency-ms 15
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from helpers.action_writer import ActionWriter
+from helpers.supabase_helper import ScopedSupabaseHelper, SupabaseHelper
+
+
+class _Store:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rows: dict = defaultdict(list)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.rows.clear()
+
+
+def _handler(store: _Store, latency: float):
+    class _PostgRESTHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+            rows = body if isinstance(body, list) else [body]
+            time.sleep(latency)
+            with store.lock:
+                store.requests += 1
+                for row in rows:
+                    store.rows[row["msg_id"]].append(row["seq"])
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return _PostgRESTHandler
+
+
+def _action(msg_id: str, seq: int) -> dict:
+    return {
+        "action_id": str(uuid.uuid4()),
+        "msg_id": msg_id,
+        "seq": seq,
+        "action_summary": f"step {seq}",
+        "actor": "agent",
+        "details": {"step": seq},
+        "action_type": "step_output",
+    }
+
+
+def _run(label: str, save_run, store: _Store, runs: int, steps: int, wait_all) -> None:
+    store.reset()
+    run_thread_seconds = []
+    lock = threading.Lock()
+
+    def one(_: int) -> None:
+        msg_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        save_run(msg_id, steps)
+        with lock:
+            run_thread_seconds.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=runs) as pool:
+        list(pool.map(one, range(runs)))
+    wait_all()
+    elapsed = time.perf_counter() - start
+
+    ordered = all(seqs == sorted(seqs) for seqs in store.rows.values())
+    stored = sum(len(seqs) for seqs in store.rows.values())
+    print(
+        f"{label:<7} run-thread avg {sum(run_thread_seconds) / len(run_thread_seconds) * 1000:7.1f} ms  "
+        f"total {elapsed * 1000:7.1f} ms  requests={store.requests:<5} rows={stored}/{runs * steps}  ordered={ordered}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=15.0)
+    args = parser.parse_args()
+
+    store = _Store()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(store, args.latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    supabase = ScopedSupabaseHelper(url, "anon", "bench", SupabaseHelper.shared_transport())
+
+    def direct(msg_id: str, steps: int) -> None:
+        for seq in range(steps):
+            supabase.client.table("actions").insert(_action(msg_id, seq)).execute()
+
+    writer = ActionWriter(max_batch=50, flush_interval=0.05)
+
+    def buffered(msg_id: str, steps: int) -> None:
+        for seq in range(steps):
+            writer.enqueue(supabase, "actions", _action(msg_id, seq))
+        writer.flush(wait=False)
+
+    _run("direct", direct, store, args.runs, args.steps, lambda: None)
+    _run("writer", buffered, store, args.runs, args.steps, writer.flush)
+    writer.shutdown()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Per-request overhead of AuthMiddleware for a token-cache hit versus a miss.
+
+The Supabase client is replaced by a stub whose `get_user`/`set_session` sleep for
+`--remote-ms`, so the numbers isolate middleware cost from network variance.
+
+    python -m benchmarks.bench_auth_middleware --requests 500 --remote-ms 40
+"""
+import argparse
+import os
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+import jwt
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import middleware.auth_middleware as auth_middleware
+
+JWT_SECRET = "bench-secret"
+
+
+class _StubAuth:
+    def __init__(self, remote_seconds: float) -> None:
+        self.remote_seconds = remote_seconds
+
+    def get_user(self, token: str):
+        time.sleep(self.remote_seconds)
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return SimpleNamespace(user=SimpleNamespace(id=claims["sub"], email="bench@example.com"))
+
+    def set_session(self, access_token: str, refresh_token: str):
+        return None
+
+
+def _make_token() -> str:
+    return jwt.encode(
+        {"sub": str(uuid.uuid4()), "aud": "authenticated", "exp": int(time.time()) + 3600},
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def _measure(client: TestClient, tokens: list[str]) -> list[float]:
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        response = client.get("/ping", headers={"Authorization": f"Bearer {token}", "X-Refresh-Token": "r"})
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(f"{label:<6} n={len(samples_ms):<5} p50={statistics.median(samples_ms):8.3f}ms p95={p95:8.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--remote-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    stub_auth = _StubAuth(args.remote_ms / 1000)
+    auth_middleware.SupabaseHelper = lambda: SimpleNamespace(
+        client=SimpleNamespace(auth=stub_auth), scoped=lambda token: SimpleNamespace(client=None)
+    )
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+    os.environ.pop("SUPABASE_URL", None)
+
+    app = FastAPI()
+    app.add_middleware(auth_middleware.AuthMiddleware)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        _report("miss", _measure(client, [_make_token() for _ in range(args.requests)]))
+        token = _make_token()
+        _measure(client, [token])  # populate the cache
+        _report("hit", _measure(client, [token] * args.requests))
+
+
+if __name__ == "__main__":
+    main()
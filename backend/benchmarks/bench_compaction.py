@@ -0,0 +1,85 @@
+"""Bytes and tokens `helpers.compaction` removes from LLM inputs, and what it keeps.
+
+Compacts the fixture mail the plans read (`fixtures/noisy_emails.json`, the
+offline Gmail mailbox and the thread replies) and checks on every message that
+the fields extraction reads are unchanged: ids, senders, subjects, dates, links
+and labels are identical, every `keep` fact of a noisy email (including the
+offer in a forwarded pitch or next to a "confidential" line) is still in its
+body, and every `drop` string (quoted history, signatures, disclaimers, tracking
+parameters) is gone. Exits non-zero if a check fails.
+
+    python -m benchmarks.bench_compaction --rounds 200
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from helpers.compaction import TEXT_FIELDS, CompactionStats, Compactor
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _messages() -> Tuple[List[dict], List[dict]]:
+    noisy = json.loads((FIXTURES / "noisy_emails.json").read_text())
+    mailbox = json.loads((FIXTURES / "mailbox.json").read_text())
+    thread = json.loads((FIXTURES / "thread.json").read_text())
+    return noisy, mailbox + [thread["email"]] + thread["replies"]
+
+
+def _check(original: dict, compacted: dict, keep: List[str], drop: List[str]) -> List[str]:
+    problems = []
+    for key, value in original.items():
+        if key not in TEXT_FIELDS and compacted.get(key) != value:
+            problems.append(f"{original.get('id') or original.get('email_id')}: field {key} changed")
+    body = compacted.get("body", "")
+    problems += [f"{original['id']}: lost {fact!r}" for fact in keep if fact not in body]
+    problems += [f"{original['id']}: kept {noise!r}" for noise in drop if noise in body]
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--field-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    compactor = Compactor(field_tokens=args.field_tokens)
+    noisy, others = _messages()
+    problems: List[str] = []
+    report = {}
+
+    for name, messages in (("noisy", [case["message"] for case in noisy]), ("mailbox+thread", others)):
+        stats = CompactionStats()
+        compacted = compactor.compact(messages, stats)
+        if name == "noisy":
+            for case, result in zip(noisy, compacted):
+                problems += _check(case["message"], result, case["keep"], case["drop"])
+        else:
+            for original, result in zip(messages, compacted):
+                problems += _check(original, result, [], [])
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            compactor.compact(messages)
+        per_field_us = (time.perf_counter() - start) / args.rounds / max(stats.fields, 1) * 1e6
+
+        report[name] = {
+            "messages": len(messages),
+            "fields": stats.fields,
+            "bytes": f"{stats.bytes_before} -> {stats.bytes_after} ({stats.bytes_saved / max(stats.bytes_before, 1):.0%} saved)",
+            "tokens": f"{stats.tokens_before} -> {stats.tokens_after} ({stats.tokens_saved} saved)",
+            "us_per_field": round(per_field_us, 1),
+        }
+
+    print(json.dumps(report, indent=2))
+    if problems:
+        print("\n".join(["FAIL:"] + problems))
+        sys.exit(1)
+    print("extraction fields unchanged on all fixtures")
+
+
+if __name__ == "__main__":
+    main()
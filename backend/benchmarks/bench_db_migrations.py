@@ -0,0 +1,167 @@
+"""EXPLAIN ANALYZE the hot queries before and after `db/migrations` on synthetic data.
+
+Needs a local Postgres and `psql` on PATH; the benchmark database is dropped and
+recreated. It applies the base `db/create_*.sql` schema, loads synthetic users,
+emails, messages and actions (10M actions by default), times each hot query, applies
+the migrations in order (timing each), then times the same queries again:
+
+    python -m benchmarks.bench_db_migrations --dsn postgresql://postgres@localhost:5432 --actions 10000000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DB_DIR = Path(__file__).resolve().parent.parent / "db"
+BASE_SCHEMA = ("create_emails_table.sql", "create_messages_table.sql", "create_actions_table.sql")
+
+# Queries the app and dashboard run, with parameters filled from one sampled user/email
+HOT_QUERIES = {
+    "email_by_id": "select * from public.emails where email_id = {email_id} and user_id = {user_id}",
+    "emails_page": (
+        "select email_id, subject, received_at, relevance_score from public.emails where user_id = {user_id} "
+        "order by received_at desc nulls last, email_id desc limit 50"
+    ),
+    "known_email_ids": (
+        "select email_id from public.emails where user_id = {user_id} and received_at >= now() - interval '30 days'"
+    ),
+    "messages_for_email": "select * from public.messages where email_id = {email_id} order by created_at",
+    "actions_for_messages": (
+        "select * from public.actions where msg_id in (select msg_id from public.messages "
+        "where email_id = {email_id}) order by created_at"
+    ),
+    "actions_for_msg": "select * from public.actions where msg_id = {msg_id} order by created_at",
+}
+
+
+class Psql:
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+
+    def run(self, sql: str = "", path: Optional[Path] = None) -> str:
+        args = ["psql", self.dsn, "-X", "-q", "-At", "-v", "ON_ERROR_STOP=1"]
+        args += ["-f", str(path)] if path else ["-c", sql]
+        return subprocess.run(args, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _database_dsn(dsn: str, database: str) -> str:
+    return f"{dsn.rstrip('/')}/{database}"
+
+
+def _load(db: Psql, users: int, emails: int, messages: int, actions: int) -> None:
+    # Skip FK triggers while bulk loading; the generator keeps the references valid
+    db.run(f"""
+        set session_replication_role = replica;
+        insert into public.emails (email_id, user_id, from_email, subject, summary, received_at, labels, relevance_score)
+        select 'm' || g, md5('user' || (g % {users}))::uuid, 'brand' || (g % 997) || '@example.com',
+               'Collab proposal ' || g, 'Summary of proposal ' || g,
+               now() - random() * interval '365 days', array['collab'], round(random()::numeric, 2)
+        from generate_series(1, {emails}) g;
+
+        insert into public.messages (msg_id, user_id, message, email_id, created_at)
+        select md5('msg' || g)::uuid, e.user_id, 'message ' || g, e.email_id,
+               least(e.received_at + interval '1 hour', now())
+        from generate_series(1, {messages}) g
+        join public.emails e on e.email_id = 'm' || (1 + g % {emails});
+
+        insert into public.actions (action_id, msg_id, action_summary, details, created_at)
+        select md5('act' || g)::uuid, m.msg_id, 'step ' || (g % 10), jsonb_build_object('step', g % 10),
+               least(m.created_at + (g % 10) * interval '5 seconds', now())
+        from generate_series(1, {actions}) g
+        join public.messages m on m.msg_id = md5('msg' || (1 + g % {messages}))::uuid;
+        reset session_replication_role;
+        analyze;
+    """)
+
+
+def _explain(db: Psql, sql: str, repeat: int) -> Dict[str, object]:
+    timings: List[float] = []
+    plan: Dict[str, object] = {}
+    for _ in range(repeat):
+        output = json.loads(db.run(f"explain (analyze, buffers, format json) {sql}"))[0]
+        timings.append(output["Execution Time"])
+        plan = output["Plan"]
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "plan": plan["Node Type"],
+        "shared_hit_blocks": plan.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": plan.get("Shared Read Blocks", 0),
+    }
+
+
+def _measure(db: Psql, params: Dict[str, str], repeat: int) -> Dict[str, Dict[str, object]]:
+    return {
+        name: _explain(db, sql.format(**params), repeat)
+        for name, sql in HOT_QUERIES.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_PG_DSN", "postgresql://postgres@localhost:5432"),
+                        help="server DSN without a database name")
+    parser.add_argument("--database", default="kyodo_bench")
+    parser.add_argument("--actions", type=int, default=10_000_000)
+    parser.add_argument("--actions-per-message", type=int, default=10)
+    parser.add_argument("--messages-per-email", type=int, default=4)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    messages = max(1, args.actions // args.actions_per_message)
+    emails = max(1, messages // args.messages_per_email)
+
+    server = Psql(_database_dsn(args.dsn, "postgres"))
+    server.run(f'drop database if exists "{args.database}"')
+    server.run(f'create database "{args.database}"')
+    db = Psql(_database_dsn(args.dsn, args.database))
+
+    for name in BASE_SCHEMA:
+        db.run(path=DB_DIR / name)
+    start = time.perf_counter()
+    _load(db, args.users, emails, messages, args.actions)
+    load_s = time.perf_counter() - start
+
+    user_id, email_id, msg_id = db.run(
+        "select m.user_id, m.email_id, m.msg_id from public.messages m "
+        "order by m.created_at desc limit 1"
+    ).split("|")
+    params = {"user_id": f"'{user_id}'", "email_id": f"'{email_id}'", "msg_id": f"'{msg_id}'"}
+    before = _measure(db, params, args.repeat)
+
+    migrations: Dict[str, float] = {}
+    for path in sorted((DB_DIR / "migrations").glob("*.sql")):
+        start = time.perf_counter()
+        db.run(path=path)
+        migrations[path.name] = round(time.perf_counter() - start, 2)
+    db.run("analyze")
+    after = _measure(db, params, args.repeat)
+
+    report = {
+        "config": {**vars(args), "emails": emails, "messages": messages},
+        "load_s": round(load_s, 1),
+        "migrations_s": migrations,
+        "queries": {
+            name: {
+                "before": before[name],
+                "after": after[name],
+                "speedup": round(before[name]["median_ms"] / max(after[name]["median_ms"], 1e-3), 1),
+            }
+            for name in HOT_QUERIES
+        },
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
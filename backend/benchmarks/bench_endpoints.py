@@ -0,0 +1,146 @@
+"""Offline throughput benchmark for /search-emails and /start-process.
+
+Boots the FastAPI app in process against the fakes in `benchmarks.offline` (no
+Gemini, Gmail or Supabase needed), runs the app's lifespan, and drives each
+endpoint at the given concurrency through `httpx.ASGITransport`. Prints one JSON
+document with p50/p95/p99 latency, req/s, status counts and peak RSS per endpoint,
+tagged with the current commit, so runs can be diffed across commits:
+
+    python -m benchmarks.bench_endpoints --requests 200 --concurrency 16 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.offline import OfflineEnv, install
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _drive(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, object]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": dict(statuses),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "req_per_s": round(requests / elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+async def _run(env: OfflineEnv, endpoints: List[str], requests: int, concurrency: int) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    transport = httpx.ASGITransport(app=env.app)
+    async with env.app.router.lifespan_context(env.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=None) as client:
+            if "search" in endpoints:
+                async def search(i: int) -> httpx.Response:
+                    user = env.users[i % len(env.users)]
+                    return await client.post("/search-emails", json={}, headers=user.headers)
+
+                results["search_emails"] = await _drive(search, requests, concurrency)
+
+            if "start" in endpoints:
+                async def start(i: int) -> httpx.Response:
+                    user = env.users[i % len(env.users)]
+                    email_id = user.email_ids[(i // len(env.users)) % len(user.email_ids)]
+                    return await client.post("/start-process", json={"email_id": email_id}, headers=user.headers)
+
+                results["start_process"] = await _drive(start, requests, concurrency)
+
+            stats = await client.get("/stats", headers=env.users[0].headers)
+            results["stats"] = stats.json()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="search,start", help="comma separated: search, start")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--gmail-ms", type=float, default=200.0)
+    parser.add_argument("--db-ms", type=float, default=5.0)
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("PORTIA_POOL_SIZE", "4")))
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    env = install(
+        users=args.users,
+        llm_latency=args.llm_ms / 1000,
+        gmail_latency=args.gmail_ms / 1000,
+        db_latency=args.db_ms / 1000,
+        pool_size=args.pool_size,
+    )
+    results = asyncio.run(_run(env, args.endpoints.split(","), args.requests, args.concurrency))
+
+    report = {
+        "commit": _commit(),
+        "config": vars(args),
+        "results": results,
+        "fakes": {"llm_calls": env.model.calls, "gmail_calls": env.gmail.calls, "db_requests": env.store.requests},
+    }
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
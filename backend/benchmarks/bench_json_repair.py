@@ -0,0 +1,87 @@
+"""Recovery rate and cost of `helpers.json_repair` on damaged structured outputs.
+
+Builds a valid `StartColabProcessResponse` JSON document, derives the defects
+seen in LLM output (prose around it, bracketed citations before it, fences, a second block, trailing commas,
+smart quotes, Python literals, truncation at several points) and reports how
+many each strategy recovers: the old fenced-block regex + `json.loads`, and
+`parse_structured`.
+
+    python -m benchmarks.bench_json_repair --rounds 200
+"""
+import argparse
+import json
+import re
+import time
+
+from helpers.json_repair import JSONRepairError, parse_structured
+from helpers.schemas import StartColabProcessResponse
+
+VALID = {
+    "email_parsed": {
+        "sender": "Ava Chen", "sender_email": "ava@glowskin.co", "brand": "GlowSkin",
+        "subject": "Paid partnership with GlowSkin", "offer_summary": "Three sponsored posts",
+        "proposed_deliverables": ["1 reel", "2 stories"], "compensation_terms": "$2,000",
+        "exclusivity": None, "deadlines": ["2025-10-01"], "attachments": [],
+        "thread_link": "https://mail.google.com/mail/u/0/#inbox/abc", "received_at": "2025-09-01T10:00:00Z",
+    },
+    "analysis": {"fit": "high", "relevance_notes": "Skincare fits the niche", "missing_info": ["usage rights"], "risk_flags": []},
+    "next_action": "need_clarification",
+    "confidence_score": 0.82,
+    "suggested_reply": {"subject": "Re: Paid partnership", "body": "Thanks Ava! Could you share usage rights?"},
+    "temporary_contract_draft": None,
+    "clarifying_questions": ["How long are usage rights?"],
+    "autonomous_actions": ["drafted reply"],
+    "assumptions": ["USD"],
+    "next_steps": ["send reply"],
+}
+
+
+def _cases() -> dict:
+    doc = json.dumps(VALID, indent=2)
+    return {
+        "clean": doc,
+        "fenced": f"```json\n{doc}\n```",
+        "prose": f"Here is the analysis you asked for:\n{doc}\nLet me know if you need anything else!",
+        "prose_citation": f"Per rule [1] and the profile's rates [2], the analysis is:\n{doc}",
+        "two_blocks": f"```json\n{doc}\n```\nAlternative:\n```json\n{doc}\n```",
+        "trailing_commas": re.sub(r'("next_steps": \[[^\]]*)\]', r'\1,]', doc).replace('"send reply"\n  ]\n}', '"send reply"\n  ],\n}'),
+        "smart_quotes": doc.replace('"', "“", 1).replace('"email_parsed"', "“email_parsed”"),
+        "python_literals": doc.replace("null", "None"),
+        "truncated_tail": doc[: doc.rindex('"send reply"') + len('"send reply"')],
+        "truncated_mid_string": doc[: doc.index("Could you share") + 10],
+    }
+
+
+def _regex(text: str) -> bool:
+    match = re.search(r"```json\s*([\s\S]*?)\s*```", text.strip())
+    try:
+        StartColabProcessResponse.model_validate(json.loads(match.group(1).strip() if match else text.strip()))
+        return True
+    except Exception:
+        return False
+
+
+def _repair(text: str) -> bool:
+    try:
+        parse_structured(text, StartColabProcessResponse)
+        return True
+    except JSONRepairError:
+        return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'case':<22}{'regex':>7}{'repair':>8}{'repair us':>11}")
+    for name, text in _cases().items():
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            ok = _repair(text)
+        per_call = (time.perf_counter() - start) / args.rounds * 1e6
+        print(f"{name:<22}{'ok' if _regex(text) else '-':>7}{'ok' if ok else '-':>8}{per_call:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Load test for the LLM governor.
+
+Floods `LLMGovernor.admit` from a few heavy users and one light user with stub
+plan runs of `--run-ms`, then reports admitted and rejected runs, wait times and
+the light user's latency, which fair queuing should keep close to one run.
+
+    python -m benchmarks.bench_llm_governor --heavy-users 3 --heavy-requests 20 --concurrent 4
+"""
+import argparse
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.llm_governor import LLMBusy, LLMGovernor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--heavy-users", type=int, default=3)
+    parser.add_argument("--heavy-requests", type=int, default=20)
+    parser.add_argument("--concurrent", type=int, default=4)
+    parser.add_argument("--run-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-minute", type=int, default=600_000)
+    args = parser.parse_args()
+
+    governor = LLMGovernor(
+        max_concurrent=args.concurrent,
+        tokens_per_minute=args.tokens_per_minute,
+        max_queue=32,
+        max_queue_per_user=8,
+        max_wait=10,
+    )
+    latencies = defaultdict(list)
+    rejections = defaultdict(int)
+    lock = threading.Lock()
+
+    def one(user_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            with governor.admit(user_id, tokens=2000):
+                time.sleep(args.run_ms / 1000)
+        except LLMBusy:
+            with lock:
+                rejections[user_id] += 1
+            return
+        with lock:
+            latencies[user_id].append(time.perf_counter() - start)
+
+    calls = [f"heavy-{u}" for _ in range(args.heavy_requests) for u in range(args.heavy_users)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(calls) + 1) as pool:
+        futures = [pool.submit(one, user_id) for user_id in calls]
+        # The light user arrives once the heavy users have filled the queue
+        time.sleep(args.run_ms / 1000 / 2)
+        futures.append(pool.submit(one, "light"))
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    for user_id in sorted(set(latencies) | set(rejections)):
+        runs = latencies[user_id]
+        avg = sum(runs) / len(runs) * 1000 if runs else 0.0
+        print(f"{user_id:<8} admitted={len(runs):<3} rejected={rejections[user_id]:<3} avg latency {avg:7.1f} ms")
+    print(f"total {elapsed * 1000:.1f} ms")
+    print(governor.stats())
+
+
+if __name__ == "__main__":
+    main()
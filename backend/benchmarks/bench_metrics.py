@@ -0,0 +1,62 @@
+"""Measure the per-call overhead of the /metrics instrumentation.
+
+Times `Histogram.observe` and `Counter.inc` from several threads, an instrumented
+httpx transport against a no-op transport, and `registry.render()` with the
+series a busy process would hold.
+
+    python -m benchmarks.bench_metrics --calls 200000 --threads 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from helpers.metrics import InstrumentedTransport, llm_tokens, plan_step_seconds, registry
+
+
+class _NullTransport(httpx.BaseTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[])
+
+
+def _per_call(label: str, fn, calls: int, threads: int) -> None:
+    per_thread = calls // threads
+
+    def work(_: int) -> None:
+        for i in range(per_thread):
+            fn(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, range(threads)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed / (per_thread * threads) * 1e6:7.2f} us/call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    _per_call("histogram.observe", lambda i: plan_step_seconds.observe(
+        (i % 100) / 10, plan="start_colab_process", step=f"step_{i % 6}"
+    ), args.calls, args.threads)
+    _per_call("counter.inc", lambda i: llm_tokens.inc(
+        100, model="google/gemini-2.0-flash", direction="prompt"
+    ), args.calls, args.threads)
+
+    plain = httpx.Client(base_url="http://supabase.local", transport=_NullTransport())
+    instrumented = httpx.Client(base_url="http://supabase.local", transport=InstrumentedTransport(_NullTransport()))
+    requests = args.calls // 20
+    _per_call("httpx plain", lambda i: plain.get("/rest/v1/emails"), requests, args.threads)
+    _per_call("httpx instrumented", lambda i: instrumented.get("/rest/v1/emails"), requests, args.threads)
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"render                 {(time.perf_counter() - start) * 1000:7.2f} ms  ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Start-process latency with every step on one model versus the routing table.
+
+Boots the app offline (see `benchmarks.offline`) with one stub provider per
+model id in the default tiers, each with its own latency (`--fast-ms`,
+`--standard-ms`, `--quality-ms`) and optionally an error rate on the fast tier's
+model (`--fast-failure-rate`) to exercise fallbacks. The same `--emails` emails
+are started once with the default routes (every step on the standard tier) and
+once with the opt-in `TIERED_ROUTES`, each by its own user so the step cache can't serve the second
+pass. Prints wall time, per-route call latency, fallbacks and token estimates.
+
+    python -m benchmarks.bench_model_router --emails 6 --fast-failure-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.offline import FakeModel, OfflineEnv, install
+from helpers import model_router
+from helpers.model_router import DEFAULT_ROUTES, DEFAULT_TIERS, TIERED_ROUTES, ModelRouter
+from helpers.plan_templates import get_plan_templates
+
+
+def _stubs(args: argparse.Namespace) -> Dict[str, FakeModel]:
+    latencies = {"fast": args.fast_ms, "standard": args.standard_ms, "quality": args.quality_ms}
+    stubs: Dict[str, FakeModel] = {}
+    # A model id shared by two tiers keeps the latency of the first tier naming it
+    for tier_name, tier in DEFAULT_TIERS.items():
+        stubs.setdefault(tier.model, FakeModel(
+            latency=latencies[tier_name] / 1000,
+            name=tier.model,
+            failure_rate=args.fast_failure_rate if tier_name == "fast" else 0.0,
+        ))
+    return stubs
+
+
+async def _start(env: OfflineEnv, headers: Dict[str, str], email_ids: List[str]) -> Dict[str, object]:
+    transport = httpx.ASGITransport(app=env.app)
+    statuses: Dict[str, int] = {}
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=None) as client:
+        for email_id in email_ids:
+            response = await client.post("/start-process", json={"email_id": email_id}, headers=headers)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": round(elapsed, 2), "s_per_email": round(elapsed / len(email_ids), 2), "statuses": statuses}
+
+
+async def _run(env: OfflineEnv, stubs: Dict[str, FakeModel], emails: int) -> Dict[str, object]:
+    configs = {
+        "uniform": dict(DEFAULT_ROUTES),
+        "routed": dict(TIERED_ROUTES),
+    }
+    report = {}
+    async with env.app.router.lifespan_context(env.app):
+        for (name, routes), user in zip(configs.items(), env.users):
+            router = ModelRouter(tiers=DEFAULT_TIERS, routes=routes, resolve=stubs.__getitem__)
+            model_router._router = router
+            # Templates hold the routed models they were built with
+            get_plan_templates().reset()
+            result = await _start(env, user.headers, user.email_ids[:emails])
+            calls = router.stats()["calls"]
+            result["fallbacks"] = sum(c["fallbacks"] for c in calls)
+            result["errors"] = sum(c["errors"] for c in calls)
+            result["routes"] = {
+                f"{c['route']} @ {c['model']}": {
+                    "calls": c["calls"],
+                    "avg_s": c["avg_seconds"],
+                    "tokens": c["prompt_tokens"] + c["completion_tokens"],
+                }
+                for c in calls
+            }
+            report[name] = result
+    report["speedup"] = round(report["uniform"]["elapsed_s"] / max(report["routed"]["elapsed_s"], 1e-6), 2)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=6)
+    parser.add_argument("--fast-ms", type=float, default=80.0)
+    parser.add_argument("--standard-ms", type=float, default=300.0)
+    parser.add_argument("--quality-ms", type=float, default=900.0)
+    parser.add_argument("--fast-failure-rate", type=float, default=0.0)
+    parser.add_argument("--db-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    stubs = _stubs(args)
+    env = install(users=2, llm_latency=args.standard_ms / 1000, db_latency=args.db_ms / 1000, models=stubs)
+    print(json.dumps(asyncio.run(_run(env, stubs, args.emails)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
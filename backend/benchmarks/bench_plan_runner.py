@@ -0,0 +1,78 @@
+"""Wall-clock time of PlanRunner against sequential execution with stubbed LLM latencies.
+
+Builds a plan with the same dependency shape as the start-process plan, whose steps
+sleep for a configurable latency instead of calling a model. It checks that parallel
+results equal sequential ones and that wall time tracks the critical path.
+
+    python -m benchmarks.bench_plan_runner --latencies 0.4,0.3,0.3,0.5,0.6,0.3
+"""
+import argparse
+import time
+
+from portia import Input, PlanBuilderV2, StepOutput
+
+from helpers.plan_runner import PlanRunner
+
+# Same reads as run_start_colab_process: parse, analyse, decide, calendar, workflow, structure
+STEP_INPUTS = [
+    {"email_data": Input("email_data")},
+    {"email_parsed": StepOutput(0), "user_preferences": Input("user_preferences")},
+    {"email_parsed": StepOutput(0), "analysis": StepOutput(1)},
+    {"email_parsed": StepOutput(0)},
+    {"email_parsed": StepOutput(0), "analysis": StepOutput(1), "decision": StepOutput(2), "calendar_event": StepOutput(3)},
+    {"email_parsed": StepOutput(0), "analysis": StepOutput(1), "decision": StepOutput(2),
+     "calendar_event": StepOutput(3), "workflow": StepOutput(4), "user_preferences": Input("user_preferences")},
+]
+
+
+class _StubStep:
+    def __init__(self, index: int, latency: float) -> None:
+        self.index = index
+        self.latency = latency
+
+    def run(self, **inputs) -> str:
+        time.sleep(self.latency)
+        return f"step{self.index}(" + ",".join(f"{k}={inputs[k]}" for k in sorted(inputs)) + ")"
+
+
+def _build_plan(latencies: list[float]):
+    builder = PlanBuilderV2("stub start-process plan").input(name="email_data").input(name="user_preferences")
+    for index, args in enumerate(STEP_INPUTS):
+        builder = builder.function_step(function=_StubStep(index, latencies[index]).run, args=args)
+    return builder.build()
+
+
+def _critical_path(deps: list[set[int]], latencies: list[float]) -> float:
+    finish: list[float] = []
+    for index, step_deps in enumerate(deps):
+        finish.append(max((finish[d] for d in step_deps), default=0.0) + latencies[index])
+    return max(finish)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latencies", default="0.4,0.3,0.3,0.5,0.6,0.3",
+                        help="comma separated per-step latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=3)
+    args = parser.parse_args()
+    latencies = [float(x) for x in args.latencies.split(",")]
+    plan = _build_plan(latencies)
+    inputs = {"email_data": "email", "user_preferences": "prefs"}
+
+    start = time.perf_counter()
+    sequential = PlanRunner(max_concurrency=1).run(plan, inputs)
+    sequential_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = PlanRunner(max_concurrency=args.concurrency).run(plan, inputs)
+    parallel_s = time.perf_counter() - start
+
+    assert parallel == sequential, "parallel results differ from sequential"
+    print(f"sum of step latencies: {sum(latencies):.2f}s")
+    print(f"critical path:         {_critical_path(PlanRunner.dependencies(plan), latencies):.2f}s")
+    print(f"sequential wall time:  {sequential_s:.2f}s")
+    print(f"parallel wall time:    {parallel_s:.2f}s (results identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Per-request CPU and allocations of rebuilding plans versus the template registry.
+
+Before templates, every search and start-process request rebuilt its
+`PlanBuilderV2` chain: the inline prompts, the routed LLM step objects and the
+builder's validation. This times `--requests` iterations of that rebuild (the
+search plan plus the start-process plan) against fetching the same plans from
+`helpers.plan_templates`, with CPU time from `time.process_time` and the bytes
+one request's plans keep allocated from `tracemalloc`. It also checks that
+building a template twice gives the same version, since runs store it for
+reproducibility.
+
+    python -m benchmarks.bench_plan_templates --requests 2000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from helpers import model_router
+from helpers.model_router import ModelRouter
+from helpers.plan_templates import PlanTemplateRegistry, get_plan_templates
+from helpers.portia_helper import build_search_colab_emails_plan, build_start_colab_process_plan
+
+
+def _rebuild() -> Tuple[Any, Any]:
+    return build_search_colab_emails_plan(), build_start_colab_process_plan(follow_up=False)
+
+
+def _template() -> Tuple[Any, Any]:
+    templates = get_plan_templates()
+    return templates.get("search_colab_emails").plan, templates.get("start_colab_process").plan
+
+
+def _measure(fn: Callable[[], Any], requests: int) -> Dict[str, float]:
+    fn()
+    start_cpu = time.process_time()
+    for _ in range(requests):
+        fn()
+    cpu_us = (time.process_time() - start_cpu) / requests * 1e6
+
+    # Keep every result alive so the traced growth is what one request's plans cost
+    samples = min(requests, 200)
+    kept: List[Any] = []
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(samples):
+        kept.append(fn())
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cpu_us_per_request": round(cpu_us, 1),
+        "allocated_kib_per_request": round((after - before) / samples / 1024, 2),
+        "peak_kib": round((peak - before) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Stub models: resolving real providers would only add the same constant to both sides
+    model_router._router = ModelRouter(resolve=lambda name: name)
+    get_plan_templates().build_all()
+
+    rebuild = _measure(_rebuild, args.requests)
+    template = _measure(_template, args.requests)
+
+    first, second = PlanTemplateRegistry(), PlanTemplateRegistry()
+    for registry in (first, second):
+        registry.register("start_colab_process", 1, lambda: build_start_colab_process_plan(follow_up=False))
+    stable = first.get("start_colab_process").version == second.get("start_colab_process").version
+
+    print(json.dumps({
+        "requests": args.requests,
+        "rebuild": rebuild,
+        "template": template,
+        "cpu_saved_us_per_request": round(rebuild["cpu_us_per_request"] - template["cpu_us_per_request"], 1),
+        "versions": {name: entry["version"] for name, entry in get_plan_templates().stats().items() if entry},
+        "version_stable_across_builds": stable,
+    }, indent=2))
+    if not stable:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare building a PortiaHelper per request against leasing one from PortiaPool.
+
+Needs the same env as the backend (PORTIA_API_KEY, GOOGLE_API_KEY, ...) because
+construction fetches the Portia tool registry.
+
+    python -m benchmarks.bench_portia_pool --iterations 20 --pool-size 2
+"""
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from helpers.portia_helper import PortiaHelper
+from helpers.portia_pool import PortiaPool
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(
+        f"{label:<12} n={len(samples_ms):<4} "
+        f"p50={statistics.median(samples_ms):9.3f}ms p95={p95:9.3f}ms "
+        f"mean={statistics.fmean(samples_ms):9.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+    load_dotenv(override=True)
+
+    construct = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        PortiaHelper()
+        construct.append(time.perf_counter() - start)
+
+    pool = PortiaPool(size=args.pool_size)
+    warm_start = time.perf_counter()
+    pool.warm()
+    print(f"warm-up of {args.pool_size} engines took {(time.perf_counter() - warm_start) * 1000:.1f}ms")
+
+    lease = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        with pool.lease():
+            lease.append(time.perf_counter() - start)
+
+    _report("construct", construct)
+    _report("lease", lease)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Tokens sent to the LLM filter step and end-to-end latency, with and without the prefilter.
+
+Uses the fixture mailbox in benchmarks/fixtures/mailbox.json. LLM latency is
+simulated as `--llm-base-ms` plus `--llm-ms-per-1k` per thousand prompt tokens,
+so the numbers show how the prefilter changes the filter step's prompt.
+
+It then checks the thresholds against the labels in
+benchmarks/fixtures/prefilter_labels.json (the mailbox plus hard cases such as a
+friendly "thanks for the collaboration"): for a sweep of `fast_track_at` and
+`drop_below` values it counts non-offers that would skip the LLM filter and
+offers that would be dropped, and exits non-zero if the defaults allow either.
+
+    python -m benchmarks.bench_prefilter --own-email me@creator.com
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from helpers.email_prefilter import EmailPrefilter
+
+FIXTURE = Path(__file__).parent / "fixtures" / "mailbox.json"
+LABELS = Path(__file__).parent / "fixtures" / "prefilter_labels.json"
+
+
+def _tokens(value) -> int:
+    # ~4 characters per token for English text
+    return len(json.dumps(value)) // 4
+
+
+def _stub_llm(prompt_tokens: int, base_ms: float, ms_per_1k: float) -> None:
+    time.sleep((base_ms + ms_per_1k * prompt_tokens / 1000) / 1000)
+
+
+def _labelled(mailbox: List[dict]) -> List[Tuple[dict, bool]]:
+    labels = json.loads(LABELS.read_text())
+    relevant = set(labels["mailbox_relevant"])
+    return [(m, m["id"] in relevant) for m in mailbox] + [(c["message"], c["relevant"]) for c in labels["extra"]]
+
+
+def _mistakes(labelled: List[Tuple[dict, bool]], prefilter: EmailPrefilter) -> Tuple[List[str], List[str]]:
+    """Non-offers fast-tracked past the LLM filter, and offers dropped before it."""
+    split = prefilter.split([m for m, _ in labelled])
+    relevant = {m["id"] for m, is_offer in labelled if is_offer}
+    kept = {m["id"] for m in split["fast_tracked"] + split["uncertain"]}
+    wrongly_fast = [m["id"] for m in split["fast_tracked"] if m["id"] not in relevant]
+    wrongly_dropped = sorted(relevant - kept)
+    return wrongly_fast, wrongly_dropped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--own-email", default="me@creator.com")
+    parser.add_argument("--llm-base-ms", type=float, default=400.0)
+    parser.add_argument("--llm-ms-per-1k", type=float, default=250.0)
+    args = parser.parse_args()
+    mailbox = json.loads(FIXTURE.read_text())
+
+    start = time.perf_counter()
+    without_tokens = _tokens(mailbox)
+    _stub_llm(without_tokens, args.llm_base_ms, args.llm_ms_per_1k)
+    without_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    split = EmailPrefilter(own_email=args.own_email).split(mailbox)
+    prefilter_ms = (time.perf_counter() - start) * 1000
+    with_tokens = _tokens(split["uncertain"])
+    if split["uncertain"]:
+        _stub_llm(with_tokens, args.llm_base_ms, args.llm_ms_per_1k)
+    with_ms = (time.perf_counter() - start) * 1000
+
+    print(f"messages: {len(mailbox)}  fast-tracked: {len(split['fast_tracked'])}  "
+          f"uncertain: {len(split['uncertain'])}  dropped: {split['dropped']}")
+    print(f"fast-tracked ids: {[m['id'] for m in split['fast_tracked']]}")
+    print(f"uncertain ids:    {[m['id'] for m in split['uncertain']]}")
+    print(f"without prefilter: {without_tokens:6d} filter-step tokens  {without_ms:8.1f}ms")
+    print(f"with prefilter:    {with_tokens:6d} filter-step tokens  {with_ms:8.1f}ms "
+          f"(prefilter itself {prefilter_ms:.2f}ms)")
+
+    labelled = _labelled(mailbox)
+    defaults = EmailPrefilter(own_email=args.own_email)
+    print(f"\ncalibration on {len(labelled)} labelled messages "
+          f"({sum(1 for _, is_offer in labelled if is_offer)} offers):")
+    for fast_track_at in (0.8, 0.85, 0.9, 0.95):
+        for drop_below in (0.1, 0.2, 0.3):
+            prefilter = EmailPrefilter(own_email=args.own_email, drop_below=drop_below, fast_track_at=fast_track_at)
+            wrongly_fast, wrongly_dropped = _mistakes(labelled, prefilter)
+            fast = len(prefilter.split([m for m, _ in labelled])["fast_tracked"])
+            marker = "  <- defaults" if (fast_track_at, drop_below) == (defaults.fast_track_at, defaults.drop_below) else ""
+            print(f"  fast_track_at={fast_track_at:.2f} drop_below={drop_below:.1f}: {fast:2d} fast-tracked, "
+                  f"non-offers fast-tracked {wrongly_fast}, offers dropped {wrongly_dropped}{marker}")
+    wrongly_fast, wrongly_dropped = _mistakes(labelled, defaults)
+    if wrongly_fast or wrongly_dropped:
+        print(f"FAIL: defaults fast-track {wrongly_fast} and drop {wrongly_dropped}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Show that a burst of start-process profile lookups costs one fetch.
+
+Fires `--burst` concurrent `ProfileCache.get` calls for the same user against a
+fake Supabase client whose profile select takes `--latency-ms`, then repeats the
+burst after the revalidation window to show the `updated_at` check, and once more
+after `invalidate()`.
+
+    python -m benchmarks.bench_profile_cache --burst 50 --latency-ms 40
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.profile_cache import ProfileCache
+
+
+class _Query:
+    def __init__(self, db: "_FakeSupabase", columns: str) -> None:
+        self.db = db
+        self.columns = columns
+
+    def eq(self, column: str, value: str) -> "_Query":
+        return self
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        with self.db.lock:
+            key = "revalidate" if self.columns == "updated_at" else "fetch"
+            self.db.queries[key] += 1
+        row = {"updated_at": self.db.updated_at}
+        if self.columns != "updated_at":
+            row.update(email="creator@example.com", min_budget=500, max_budget=5000,
+                       content_niche="tech", auto_generate_invoice=False, guidelines="")
+        return type("Response", (), {"data": [row]})()
+
+
+class _FakeSupabase:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.queries = {"fetch": 0, "revalidate": 0}
+        self.updated_at = "2025-01-01T00:00:00+00:00"
+        self.client = self
+
+    def table(self, name: str) -> "_FakeSupabase":
+        return self
+
+    def select(self, columns: str) -> _Query:
+        return _Query(self, columns)
+
+
+def _burst(label: str, cache: ProfileCache, supabase: _FakeSupabase, size: int) -> None:
+    before = dict(supabase.queries)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        profiles = list(pool.map(lambda _: cache.get(supabase, "user-1"), range(size)))
+    elapsed = time.perf_counter() - start
+    assert all(p == profiles[0] for p in profiles)
+    fetches = supabase.queries["fetch"] - before["fetch"]
+    revalidations = supabase.queries["revalidate"] - before["revalidate"]
+    print(f"{label:<12} {size} calls  {elapsed * 1000:7.1f} ms  fetches={fetches}  revalidations={revalidations}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    supabase = _FakeSupabase(args.latency_ms / 1000)
+    cache = ProfileCache(ttl_seconds=60, revalidate_seconds=0.2)
+
+    _burst("cold", cache, supabase, args.burst)
+    _burst("warm", cache, supabase, args.burst)
+    time.sleep(0.25)
+    _burst("revalidated", cache, supabase, args.burst)
+    cache.invalidate("user-1")
+    _burst("invalidated", cache, supabase, args.burst)
+    assert supabase.queries["fetch"] == 2, supabase.queries
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
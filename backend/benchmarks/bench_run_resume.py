@@ -0,0 +1,157 @@
+"""Failure injection for start-process checkpoints and resume.
+
+Boots the app offline (see `benchmarks.offline`) and, for every step of the
+start-process plan, routes that step to a stub model that always fails, starts
+a run (which fails at that step), heals the model and calls
+`POST /start-process/{msg_id}/resume`. For each injected failure it checks that
+
+* the resume re-entered at the first step without a checkpoint and ran exactly
+  the steps that had none (`resumed_steps`),
+* no step ran twice: the run has one `step_output` action per plan step,
+* the resumed run finished with a 200 and a final action, its checkpoints were
+  deleted, and resuming it again is refused with a 409.
+
+It prints the steps and model calls each resume saved and exits non-zero if a
+check fails.
+
+    python -m benchmarks.bench_run_resume --llm-ms 20
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.offline import FakeModel, OfflineEnv, install
+from helpers import model_router
+from helpers.action_writer import get_action_writer
+from helpers.model_router import DEFAULT_ROUTES, DEFAULT_TIERS, ModelRouter, ModelTier
+from helpers.plan_templates import get_plan_templates
+
+BROKEN_MODEL = "offline/broken"
+
+
+def _use_router(env: OfflineEnv, broken: FakeModel, routes: Dict[str, str]) -> None:
+    model_router._router = ModelRouter(
+        tiers={**DEFAULT_TIERS, "broken": ModelTier(BROKEN_MODEL)},
+        routes=routes,
+        resolve=lambda name: broken if name == BROKEN_MODEL else env.model,
+    )
+    # Templates hold the routed models they were built with
+    get_plan_templates().reset()
+
+
+def _step_routes() -> List[str]:
+    plan = get_plan_templates().get("start_colab_process").plan
+    return [step.function.__self__.model.route for step in plan.steps]
+
+
+def _checkpoints(env: OfflineEnv, msg_id: str) -> List[int]:
+    get_action_writer().flush(wait=True)
+    rows = env.store.tables["run_checkpoints"].values()
+    return sorted(int(r["step_index"]) for r in rows if r["msg_id"] == msg_id and int(r["step_index"]) >= 0)
+
+
+def _step_actions(env: OfflineEnv, msg_id: str) -> int:
+    return sum(
+        1 for a in env.store.tables["actions"].values()
+        if a["msg_id"] == msg_id and a.get("action_type") == "step_output"
+    )
+
+
+def _model_calls(env: OfflineEnv, broken: FakeModel) -> int:
+    return env.model.calls + broken.calls
+
+
+async def _inject(
+    env: OfflineEnv, client: httpx.AsyncClient, broken: FakeModel, step: int, route: str, email_id: str
+) -> Dict[str, Any]:
+    user = env.users[0]
+    _use_router(env, broken, {**DEFAULT_ROUTES, route: "broken"})
+    steps = len(get_plan_templates().get("start_colab_process").plan.steps)
+
+    broken.failure_rate = 1.0
+    first = await client.post("/start-process", json={"email_id": email_id}, headers=user.headers)
+    resume_url = first.json().get("resume_url")
+    if not resume_url:
+        return {"failed_step": step, "ok": False, "problem": f"no resume_url in {first.status_code} {first.text[:200]}"}
+    msg_id = resume_url.split("/")[2]
+    before = _checkpoints(env, msg_id)
+
+    broken.failure_rate = 0.0
+    calls = _model_calls(env, broken)
+    resumed = await client.post(resume_url, headers=user.headers)
+    resume_calls = _model_calls(env, broken) - calls
+    body = resumed.json()
+    left = _checkpoints(env, msg_id)
+    again = await client.post(resume_url, headers=user.headers)
+
+    expected = [i for i in range(steps) if i not in before]
+    problems = []
+    if resumed.status_code != 200:
+        problems.append(f"resume returned {resumed.status_code}: {body.get('detail')}")
+    if body.get("resumed_steps") != expected:
+        problems.append(f"resumed {body.get('resumed_steps')}, expected {expected}")
+    if step not in expected:
+        problems.append(f"failed step {step} was checkpointed")
+    if _step_actions(env, msg_id) != steps:
+        problems.append(f"{_step_actions(env, msg_id)} step actions for {steps} steps")
+    if left:
+        problems.append(f"checkpoints left after the run finished: {left}")
+    if again.status_code != 409:
+        problems.append(f"resuming a finished run returned {again.status_code}")
+    final = [
+        a for a in env.store.tables["actions"].values()
+        if a["msg_id"] == msg_id and a.get("action_type") == "final_start_colab_process"
+    ]
+    if not final:
+        problems.append("no final action")
+    return {
+        "failed_step": step,
+        "route": route,
+        "first_status": first.status_code,
+        "restored_steps": before,
+        "resumed_steps": body.get("resumed_steps"),
+        "steps_saved": len(before),
+        # Resumed steps plus the summary; a full re-run makes steps + 1 calls
+        "model_calls_on_resume": resume_calls,
+        "ok": not problems,
+        **({"problems": problems} if problems else {}),
+    }
+
+
+async def _run(env: OfflineEnv, broken: FakeModel) -> List[Dict[str, Any]]:
+    transport = httpx.ASGITransport(app=env.app)
+    results = []
+    async with env.app.router.lifespan_context(env.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=None) as client:
+            _use_router(env, broken, dict(DEFAULT_ROUTES))
+            routes = _step_routes()
+            for step, route in enumerate(routes):
+                # A fresh email per scenario, so no step is served from the step cache
+                email_id = env.users[0].email_ids[step % len(env.users[0].email_ids)]
+                results.append(await _inject(env, client, broken, step, route, email_id))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-ms", type=float, default=20.0)
+    parser.add_argument("--db-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    broken = FakeModel(latency=args.llm_ms / 1000, name=BROKEN_MODEL)
+    env = install(users=1, llm_latency=args.llm_ms / 1000, db_latency=args.db_ms / 1000, models={BROKEN_MODEL: broken})
+    results = asyncio.run(_run(env, broken))
+    print(json.dumps(results, indent=2))
+    failed = [r for r in results if not r["ok"]]
+    if failed:
+        print(f"FAIL: {len(failed)} of {len(results)} injected failures did not resume cleanly")
+        sys.exit(1)
+    print(f"all {len(results)} injected failures resumed from their first incomplete step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Stress test RLS isolation and throughput of scoped Supabase clients.
+
+Starts a local PostgREST stand-in that answers every select with rows owned by
+the `sub` claim of the request's bearer token, the same way RLS would. Many
+simulated users then query concurrently through:
+
+* shared:  the old flow. The middleware calls `set_session` on one shared
+           client, then the handler runs its queries (a profile lookup, then
+           the emails) on that client
+* scoped:  the same queries on `SupabaseHelper.scoped(token)`, built per
+           request over the shared transport
+
+A request "leaks" when any of its queries gets back rows that belong to another
+user, i.e. another request switched the shared session between the middleware
+and the handler. Before the concurrent runs it also builds scoped clients for
+two users and queries through the first, which catches a client whose headers
+are overwritten by the next one built (postgrest 1.x does this to a shared
+`http_client`). Exits non-zero if a scoped request leaks.
+
+    python -m benchmarks.bench_scoped_clients --users 50 --requests 2000 --concurrency 32
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import postgrest
+from postgrest import SyncPostgrestClient
+
+from helpers.supabase_helper import ScopedSupabaseHelper, SupabaseHelper
+
+
+class _RLSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        token = self.headers.get("Authorization", "").partition(" ")[2]
+        sub = jwt.decode(token, options={"verify_signature": False})["sub"]
+        # Yield so interleaved requests on the shared client can race
+        time.sleep(0.001)
+        body = json.dumps([{"user_id": sub}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _token(user_id: str) -> str:
+    return jwt.encode({"sub": user_id, "aud": "authenticated"}, "bench-signing-key-not-checked-by-the-stand-in", algorithm="HS256")
+
+
+def _run(label: str, query, users: list[str], requests: int, concurrency: int) -> int:
+    leaks = 0
+    leaks_lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal leaks
+        user_id = users[i % len(users)]
+        rows = query(user_id)
+        if any(row["user_id"] != user_id for row in rows):
+            with leaks_lock:
+                leaks += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<7} {requests / elapsed:8.1f} req/s  leaked={leaks}/{requests}")
+    return leaks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RLSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    tokens = {user_id: _token(user_id) for user_id in users}
+
+    shared = SyncPostgrestClient(f"{url}/rest/v1", headers={"apikey": "anon"})
+
+    def handler(table) -> list:
+        # What a request handler does after the middleware: profile, then emails
+        return table("profiles").select("*").execute().data + table("emails").select("*").execute().data
+
+    def shared_query(user_id: str) -> list:
+        shared.auth(tokens[user_id])
+        return handler(shared.from_)
+
+    transport = SupabaseHelper.shared_transport()
+
+    def scoped(user_id: str) -> ScopedSupabaseHelper:
+        return ScopedSupabaseHelper(url, "anon", tokens[user_id], transport)
+
+    def scoped_query(user_id: str) -> list:
+        return handler(scoped(user_id).client.table)
+
+    print(f"postgrest {postgrest.__version__}")
+    first, second = users[:2]
+    first_client = scoped(first)
+    scoped(second)
+    sequential_leak = any(row["user_id"] != first for row in handler(first_client.client.table))
+    print(f"client built before another user's: {'LEAKED' if sequential_leak else 'ok'}")
+
+    _run("shared", shared_query, users, args.requests, args.concurrency)
+    scoped_leaks = _run("scoped", scoped_query, users, args.requests, args.concurrency)
+    server.shutdown()
+    if scoped_leaks or sequential_leak:
+        print(f"FAIL: scoped clients saw another user's rows ({scoped_leaks} concurrent requests)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
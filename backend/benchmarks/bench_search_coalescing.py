@@ -0,0 +1,63 @@
+"""Concurrency check for /search-emails coalescing.
+
+Simulates bursts of concurrent searches from several users against a stubbed plan
+that sleeps `--plan-ms` and counts how often it runs. Each burst should cost one
+plan execution per user; a burst landing inside the result TTL should cost none.
+
+    python -m benchmarks.bench_search_coalescing --users 5 --burst 20 --plan-ms 200
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.single_flight import SingleFlight
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--plan-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    runs: Counter = Counter()
+    runs_lock = threading.Lock()
+
+    def stub_plan(user_id: str) -> tuple[int, dict]:
+        with runs_lock:
+            runs[user_id] += 1
+        time.sleep(args.plan_ms / 1000)
+        return 200, {"value": {"emails": [], "user_id": user_id}, "summary": ""}
+
+    def burst(label: str, flights: SingleFlight) -> int:
+        runs.clear()
+        calls = [f"user-{i % args.users}" for i in range(args.users * args.burst)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            results = list(pool.map(
+                lambda user_id: flights.run(f"{user_id}:sync", lambda: stub_plan(user_id)), calls
+            ))
+        elapsed = time.perf_counter() - start
+        assert all(content["value"]["user_id"] == user_id for user_id, (_, content) in zip(calls, results))
+        print(f"{label:<10} {len(calls)} requests  {elapsed * 1000:7.1f} ms  plan runs={sum(runs.values())}")
+        return sum(runs.values())
+
+    no_cache = SingleFlight(result_ttl=0)
+    # Without coalescing every request is its own run
+    runs.clear()
+    with ThreadPoolExecutor(max_workers=args.users * args.burst) as pool:
+        list(pool.map(lambda i: stub_plan(f"user-{i % args.users}"), range(args.users * args.burst)))
+    print(f"{'direct':<10} {args.users * args.burst} requests  plan runs={sum(runs.values())}")
+
+    assert burst("coalesced", no_cache) == args.users
+
+    flights = SingleFlight(result_ttl=5)
+    assert burst("cold", flights) == args.users
+    assert burst("cached", flights) == 0
+    print(flights.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Batch start-process throughput versus one /start-process call per email.
+
+Boots the app offline (see `benchmarks.offline`) and starts the collaboration
+process for the same `--emails` emails of one user twice: as N serial
+`/start-process` calls, the way the dashboard clicks through them, and as one
+`/start-process/batch` request whose NDJSON lines are timed as they arrive.
+
+    python -m benchmarks.bench_start_batch --emails 12 --concurrency 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.offline import OfflineEnv, install
+
+
+async def _serial(client: httpx.AsyncClient, headers: Dict[str, str], email_ids: List[str]) -> Dict[str, object]:
+    start = time.perf_counter()
+    statuses: Dict[str, int] = {}
+    for email_id in email_ids:
+        response = await client.post("/start-process", json={"email_id": email_id}, headers=headers)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": round(elapsed, 2), "emails_per_s": round(len(email_ids) / elapsed, 2), "statuses": statuses}
+
+
+async def _batch(
+    client: httpx.AsyncClient, headers: Dict[str, str], email_ids: List[str], concurrency: int
+) -> Dict[str, object]:
+    start = time.perf_counter()
+    first_result = None
+    statuses: Dict[str, int] = {}
+    async with client.stream(
+        "POST", "/start-process/batch", json={"email_ids": email_ids, "concurrency": concurrency}, headers=headers
+    ) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if result.get("done"):
+                continue
+            first_result = first_result or time.perf_counter() - start
+            statuses[str(result["status_code"])] = statuses.get(str(result["status_code"]), 0) + 1
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "first_result_s": round(first_result or 0.0, 2),
+        "emails_per_s": round(len(email_ids) / elapsed, 2),
+        "statuses": statuses,
+    }
+
+
+async def _run(env: OfflineEnv, emails: int, concurrency: int) -> Dict[str, object]:
+    # Two users with the same mailbox, so the batch can't replay the serial runs'
+    # cached LLM steps
+    serial_user, batch_user = env.users
+    transport = httpx.ASGITransport(app=env.app)
+    async with env.app.router.lifespan_context(env.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=None) as client:
+            serial = await _serial(client, serial_user.headers, serial_user.email_ids[:emails])
+            batch = await _batch(client, batch_user.headers, batch_user.email_ids[:emails], concurrency)
+    return {
+        "emails": min(emails, len(serial_user.email_ids)),
+        "serial": serial,
+        "batch": batch,
+        "speedup": round(serial["elapsed_s"] / max(batch["elapsed_s"], 1e-6), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--db-ms", type=float, default=5.0)
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("PORTIA_POOL_SIZE", "4")))
+    args = parser.parse_args()
+
+    os.environ["START_BATCH_CONCURRENCY"] = str(args.concurrency)
+    env = install(
+        users=2,
+        llm_latency=args.llm_ms / 1000,
+        db_latency=args.db_ms / 1000,
+        pool_size=args.pool_size,
+    )
+    print(json.dumps(asyncio.run(_run(env, args.emails, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
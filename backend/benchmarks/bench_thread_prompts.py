@@ -0,0 +1,75 @@
+"""Prompt size per start-process iteration across a ten-reply thread.
+
+Replays `fixtures/thread.json` (the original email and ten partner replies). For
+every iteration the client sends the whole thread so far, and the benchmark
+compares the plan inputs two ways:
+
+- full: the whole thread is re-sent and re-parsed from scratch on every run;
+- incremental: `ThreadState` feeds only unseen replies plus the previous
+  `email_parsed`/`analysis`.
+
+Sizes are estimated like the LLM governor does (`estimate_plan_tokens`, seven
+LLM calls per run). Fails if the incremental size grows by more than
+`--max-growth` between the first follow-up and the last one, or if a retry with
+no new replies (or none sent at all) is planned as an empty follow-up instead of
+re-reading the email.
+
+    python -m benchmarks.bench_thread_prompts
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from helpers.thread_state import ThreadState, start_process_inputs
+from helpers.tokens import estimate_plan_tokens
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "thread.json"
+LLM_STEPS = 7
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-growth", type=float, default=1.25,
+                        help="allowed ratio of the last follow-up's tokens to the first one's")
+    args = parser.parse_args()
+
+    fixture = json.loads(FIXTURE.read_text())
+    email, preferences, replies = fixture["email"], fixture["user_preferences"], fixture["replies"]
+    state = ThreadState(user_id=preferences["id"], email_id=email["email_id"])
+
+    print(f"{'iteration':>9} {'replies':>7} {'new':>4} {'full tokens':>12} {'incremental':>12} {'saved':>7}")
+    incremental_tokens = []
+    for iteration in range(len(replies) + 1):
+        thread = replies[:iteration]
+        full = estimate_plan_tokens(start_process_inputs(email, preferences, None, thread), LLM_STEPS)
+        inputs = start_process_inputs(email, preferences, state, thread)
+        incremental = estimate_plan_tokens(inputs, LLM_STEPS)
+        new = len(inputs.get("new_messages", thread))
+        print(
+            f"{iteration:>9} {len(thread):>7} {new:>4} {full:>12} {incremental:>12} "
+            f"{1 - incremental / full:>6.0%}"
+        )
+        if iteration:
+            incremental_tokens.append(incremental)
+        # The run succeeded: keep its structured outputs for the next reply
+        state.advance(thread, fixture["state"]["email_parsed"], fixture["state"]["analysis"])
+
+    growth = max(incremental_tokens) / min(incremental_tokens)
+    print(f"\nincremental follow-up size varies by {growth:.2f}x across {len(incremental_tokens)} replies")
+    if growth > args.max_growth:
+        print(f"FAIL: follow-up prompts grow with the thread (> {args.max_growth}x)")
+        sys.exit(1)
+
+    empty_follow_ups = [
+        name for name, thread in (("retry", replies), ("no replies sent", []))
+        if "email_data" not in start_process_inputs(email, preferences, state, thread)
+    ]
+    if empty_follow_ups:
+        print(f"FAIL: planned as follow-ups with no new messages: {empty_follow_ups}")
+        sys.exit(1)
+    print("retries without new replies re-read the email")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""Offline stand-ins for Gemini, Gmail and Supabase, used by `bench_endpoints`.
+
+`install()` points the FastAPI app at these fakes, so the real request path runs
+without network access: auth middleware, caches, governor, engine pool, plan
+building, plan execution hooks and database writes. The only replaced pieces are:
+
+* `FakeModel`: answers `get_response` / `get_structured_response` after a
+  configurable latency. Text answers are derived from a hash of the prompt so the
+  step cache doesn't turn the benchmark into a cache benchmark. Structured answers
+  are sampled from the requested pydantic schema.
+* `FakeGmail`: plays `portia:google:gmail:search_email`, returning the
+  `fixtures/mailbox.json` messages with fresh ids on every call.
+* `MemoryPostgREST`: an `httpx.MockTransport` handler for the PostgREST subset the
+  backend uses (select with eq/gte/order/limit, insert, upsert, update).
+* `OfflinePortia`: runs `PlanBuilderV2` plans in process. It resolves step
+  references like `PlanRunner` and fires the same after-step hook Portia would.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import types
+import typing
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+import httpx
+import jwt
+from portia.model import Message
+from pydantic import BaseModel
+from supabase_auth import User
+
+FIXTURES = Path(__file__).parent / "fixtures"
+JWT_SECRET = "offline-benchmark-secret"
+SUPABASE_URL = "http://supabase.offline"
+# Shaped like a Supabase anon key so client construction accepts it
+SUPABASE_KEY = jwt.encode({"role": "anon", "iss": "supabase"}, JWT_SECRET, algorithm="HS256")
+
+PRIMARY_KEYS = {
+    "profiles": "id",
+    "emails": "email_id",
+    "messages": "msg_id",
+    "actions": "action_id",
+    "mailbox_sync_state": "user_id",
+    # Keyed on (user_id, email_id) in Postgres; fixture email ids are unique across users
+    "colab_threads": "email_id",
+    # Keyed on (msg_id, step_index) in Postgres; rows here get a generated key
+    "run_checkpoints": "checkpoint_id",
+}
+
+
+def _jitter(seconds: float) -> float:
+    return seconds * random.uniform(0.8, 1.2)
+
+
+def sample(annotation: Any, name: str = "", list_size: int = 3) -> Any:
+    """A valid value for a pydantic field annotation; `*_id` strings are unique."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union or origin is types.UnionType:
+        return sample(next(a for a in args if a is not type(None)), name, list_size)
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (list, List):
+        return [sample(args[0] if args else str, name, list_size) for _ in range(list_size)]
+    if origin in (dict, Dict):
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            field: sample(info.annotation, field, list_size)
+            for field, info in annotation.model_fields.items()
+        }
+    if annotation is float:
+        return round(random.uniform(0.5, 0.95), 2)
+    if annotation is int:
+        return 1
+    if annotation is bool:
+        return True
+    if name.endswith("_id"):
+        return uuid.uuid4().hex
+    if name.endswith("_at") or name.endswith("_received"):
+        return datetime.now(timezone.utc).isoformat()
+    return f"offline {name or 'value'}"
+
+
+class FakeModel:
+    """GenerativeModel stand-in with fixed latency and synthetic answers.
+
+    With `failure_rate` a call raises after its latency, like a provider error,
+    which exercises the model router's fallback.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        list_size: int = 3,
+        name: str = "offline/fake-model",
+        failure_rate: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.list_size = list_size
+        self.name = name
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return self.name
+
+    def _wait(self) -> None:
+        with self._lock:
+            self.calls += 1
+        time.sleep(_jitter(self.latency))
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.name}: simulated provider error")
+
+    def get_response(self, messages: List[Message]) -> Message:
+        self._wait()
+        digest = hashlib.sha1("".join(str(m.content) for m in messages).encode()).hexdigest()[:12]
+        return Message(role="assistant", content=f"Offline analysis {digest}: looks like a paid collaboration.")
+
+    def get_structured_response(self, messages: List[Message], schema: Type[BaseModel]) -> BaseModel:
+        self._wait()
+        data = sample(schema, list_size=self.list_size)
+        if "confidence_score" in data:
+            data["confidence_score"] = 0.8
+        return schema.model_validate(data)
+
+
+class FakeGmail:
+    """`portia:google:gmail:search_email` returning the fixture mailbox with fresh ids."""
+
+    TOOL_ID = "portia:google:gmail:search_email"
+
+    def __init__(self, latency: float = 0.3) -> None:
+        self.latency = latency
+        self.messages = json.loads((FIXTURES / "mailbox.json").read_text())
+        self.calls = 0
+
+    def search(self, query: str = "", **_: Any) -> List[dict]:
+        self.calls += 1
+        time.sleep(_jitter(self.latency))
+        return [{**message, "id": f"{message['id']}-{uuid.uuid4().hex[:8]}"} for message in self.messages]
+
+
+class _Output:
+    """The slice of Portia's step `Output` the after-step hook reads."""
+
+    def __init__(self, value: Any) -> None:
+        self._value = value
+
+    def get_value(self) -> Any:
+        return self._value
+
+    def get_summary(self) -> Optional[str]:
+        return None
+
+
+class OfflinePortia:
+    """Runs `PlanBuilderV2` plans in process against `FakeModel` and `FakeGmail`."""
+
+    def __init__(self, model: FakeModel, gmail: FakeGmail, after_step) -> None:
+        self.model = model
+        self.gmail = gmail
+        self.after_step = after_step
+
+    def _llm(self, task: str, inputs: List[Any], schema: Optional[Type[BaseModel]] = None) -> Any:
+        prompt = "\n".join([task, *(json.dumps(i, default=str) for i in inputs)])
+        messages = [Message(role="user", content=prompt)]
+        if schema is not None:
+            return self.model.get_structured_response(messages, schema)
+        return self.model.get_response(messages).content
+
+    def run_plan(self, plan: Any, plan_run_inputs: Dict[str, Any], end_user: Any = None) -> Any:
+        # Imported here so the benchmark module can be loaded before env is set up
+        from helpers.plan_runner import PlanRunner
+
+        runner = PlanRunner(max_concurrency=1)
+        inputs = {p.name: getattr(p, "default_value", None) for p in getattr(plan, "plan_inputs", [])}
+        inputs.update(plan_run_inputs)
+        outputs: Dict[int, Any] = {}
+        for index, step in enumerate(plan.steps):
+            if callable(getattr(step, "function", None)):
+                value = step.function(**runner._resolve(plan, step.args or {}, inputs, outputs))
+                tool_id = None
+            elif getattr(step, "tool", None) == FakeGmail.TOOL_ID:
+                value = self.gmail.search(**runner._resolve(plan, step.args or {}, inputs, outputs))
+                tool_id = FakeGmail.TOOL_ID
+            elif getattr(step, "task", None):
+                value = self._llm(
+                    step.task,
+                    runner._resolve(plan, list(getattr(step, "inputs", None) or []), inputs, outputs),
+                    getattr(step, "output_schema", None),
+                )
+                tool_id = "llm_tool"
+            else:
+                raise ValueError(f"Offline Portia can't run step {index}: {type(step).__name__}")
+            outputs[index] = value
+            legacy_step = types.SimpleNamespace(
+                task=getattr(step, "task", None) or getattr(step, "step_name", ""),
+                tool_id=tool_id,
+                output=f"$step_{index}_output",
+            )
+            self.after_step(plan, None, legacy_step, _Output(value))
+
+        last = outputs.get(len(plan.steps) - 1)
+        schema = getattr(plan, "final_output_schema", None)
+        value = self._llm("Produce the final output.", [last], schema) if schema else last
+        summary = self._llm("Summarize the result.", [last]) if getattr(plan, "summarize", False) else None
+        final_output = types.SimpleNamespace(value=value, summary=summary)
+        return types.SimpleNamespace(outputs=types.SimpleNamespace(final_output=final_output))
+
+
+def offline_engine(model: FakeModel, gmail: FakeGmail):
+    """A `PortiaHelper` whose config and Portia instance are the offline fakes."""
+    from helpers.plan_runner import PlanRunner
+    from helpers.portia_helper import PortiaHelper
+
+    engine = PortiaHelper.__new__(PortiaHelper)
+    engine.config = types.SimpleNamespace(get_default_model=lambda: model)
+    engine.plan_runner = PlanRunner()
+    engine.supabase_helper = None
+    engine.portia = OfflinePortia(model, gmail, after_step=engine.log_after_step_in_db)
+    engine._task_engines = {str(model): engine.portia}
+    return engine
+
+
+class MemoryPostgREST:
+    """In-memory PostgREST for `httpx.MockTransport`, with a fixed per-request latency."""
+
+    def __init__(self, latency: float = 0.005) -> None:
+        self.latency = latency
+        self.tables: Dict[str, Dict[str, dict]] = {table: {} for table in PRIMARY_KEYS}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def seed(self, table: str, rows: List[dict]) -> None:
+        key = PRIMARY_KEYS[table]
+        with self._lock:
+            for row in rows:
+                self.tables[table][str(row[key])] = dict(row)
+
+    @staticmethod
+    def _matches(row: dict, filters: List[tuple]) -> bool:
+        for column, op, value in filters:
+            current = row.get(column)
+            current = "" if current is None else str(current)
+            if op == "eq" and current != value:
+                return False
+            if op == "neq" and current == value:
+                return False
+            if op == "gte" and current < value:
+                return False
+            if op == "gt" and current <= value:
+                return False
+            if op == "lte" and current > value:
+                return False
+            if op == "lt" and current >= value:
+                return False
+            if op == "in" and current not in value.strip("()").split(","):
+                return False
+        return True
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        table = request.url.path.rsplit("/", 1)[-1]
+        if table not in self.tables:
+            return httpx.Response(404, json={"message": f"relation {table} does not exist"})
+
+        params = request.url.params
+        filters = []
+        for column, raw in params.multi_items():
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            op, _, value = raw.partition(".")
+            filters.append((column, op, value))
+
+        with self._lock:
+            self.requests += 1
+            rows = self.tables[table]
+            key = PRIMARY_KEYS[table]
+            if request.method == "GET":
+                result = [r for r in rows.values() if self._matches(r, filters)]
+                if "order" in params:
+                    column, _, direction = params["order"].partition(".")
+                    result.sort(key=lambda r: str(r.get(column) or ""), reverse=direction.startswith("desc"))
+                if "limit" in params:
+                    result = result[: int(params["limit"])]
+                columns = [c.strip() for c in params.get("select", "*").split(",")]
+                if columns != ["*"]:
+                    result = [{c: r.get(c) for c in columns} for r in result]
+                return httpx.Response(200, json=result)
+
+            body = json.loads(request.content or b"null")
+            if request.method == "POST":
+                upsert = "resolution=merge-duplicates" in request.headers.get("prefer", "")
+                created = []
+                for row in body if isinstance(body, list) else [body]:
+                    row_key = str(row.get(key) or uuid.uuid4())
+                    if row_key in rows and not upsert:
+                        return httpx.Response(409, json={"message": "duplicate key value"})
+                    rows[row_key] = {**rows.get(row_key, {}), **row, key: row.get(key, row_key)}
+                    created.append(rows[row_key])
+                return httpx.Response(201, json=created)
+            if request.method == "PATCH":
+                updated = []
+                for row in rows.values():
+                    if self._matches(row, filters):
+                        row.update(body)
+                        row["updated_at"] = datetime.now(timezone.utc).isoformat()
+                        updated.append(row)
+                return httpx.Response(200, json=updated)
+            if request.method == "DELETE":
+                doomed = [k for k, r in rows.items() if self._matches(r, filters)]
+                return httpx.Response(200, json=[rows.pop(k) for k in doomed])
+        return httpx.Response(405)
+
+
+class OfflineUser:
+    """A benchmark user with a signed access token and seeded profile and emails."""
+
+    def __init__(self, index: int) -> None:
+        self.id = str(uuid.uuid4())
+        self.email = f"creator{index}@offline.test"
+        now = datetime.now(timezone.utc)
+        self.token = jwt.encode(
+            {"sub": self.id, "email": self.email, "aud": "authenticated",
+             "exp": int((now + timedelta(hours=2)).timestamp())},
+            JWT_SECRET,
+            algorithm="HS256",
+        )
+        self.email_ids: List[str] = []
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}", "X-Refresh-Token": "offline"}
+
+
+def _remote_user(_self: Any, token: str) -> Optional[User]:
+    claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+    return User(
+        id=claims["sub"],
+        email=claims.get("email"),
+        aud="authenticated",
+        app_metadata={},
+        user_metadata={},
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+class OfflineEnv:
+    def __init__(self, app: Any, store: MemoryPostgREST, model: FakeModel, gmail: FakeGmail, users: List[OfflineUser]) -> None:
+        self.app = app
+        self.store = store
+        self.model = model
+        self.gmail = gmail
+        self.users = users
+
+
+ENV = {
+    "SUPABASE_URL": SUPABASE_URL,
+    "SUPABASE_KEY": SUPABASE_KEY,
+    "SUPABASE_JWT_SECRET": JWT_SECRET,
+    "SUPABASE_JWKS_URL": "",
+    "STEP_CACHE_SQLITE": "",
+    # Every search should run its plan; coalescing still applies to overlapping ones
+    "SEARCH_RESULT_TTL": "0",
+    "SEARCH_FRESH_SECONDS": "0",
+    "SYNC_SCHEDULER_ENABLED": "0",
+}
+
+
+def install(
+    users: int = 20,
+    llm_latency: float = 0.5,
+    gmail_latency: float = 0.3,
+    db_latency: float = 0.005,
+    pool_size: int = 4,
+    models: Optional[Dict[str, FakeModel]] = None,
+) -> OfflineEnv:
+    """Wire the app to the fakes and seed `users` profiles with fixture emails.
+
+    Routed LLM steps resolve model ids through `models` (e.g. stubs with per-tier
+    latencies); ids not in it get the shared `FakeModel`.
+    """
+    os.environ.update(ENV)
+    import main
+    # main.py loads .env with override=True; put the offline settings back on top
+    os.environ.update(ENV)
+
+    from helpers import model_router, plan_templates, portia_pool
+    from helpers.metrics import InstrumentedTransport
+    from helpers.supabase_helper import SupabaseHelper
+    from middleware.auth_middleware import AuthMiddleware
+
+    store = MemoryPostgREST(latency=db_latency)
+    model = FakeModel(latency=llm_latency)
+    gmail = FakeGmail(latency=gmail_latency)
+
+    SupabaseHelper._transport = InstrumentedTransport(httpx.MockTransport(store.handle))
+    AuthMiddleware.get_remote_user = _remote_user
+    portia_pool._pool = portia_pool.PortiaPool(size=pool_size, factory=lambda: offline_engine(model, gmail))
+    model_router._router = model_router.ModelRouter(
+        tiers=model_router.tiers_from_env(),
+        routes=model_router.routes_from_env(),
+        resolve=lambda name: (models or {}).get(name, model),
+    )
+    # Templates built before this point hold the real router's models
+    plan_templates.get_plan_templates().reset()
+
+    offline_users = [OfflineUser(i) for i in range(users)]
+    for user in offline_users:
+        store.seed("profiles", [{
+            "id": user.id,
+            "email": user.email,
+            "min_budget": 500,
+            "max_budget": 5000,
+            "content_niche": "tech reviews",
+            "auto_generate_invoice": False,
+            "guidelines": "No gambling or crypto sponsors.",
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }])
+        emails = []
+        for message in gmail.messages:
+            email_id = f"{message['id']}-{user.id[:8]}"
+            user.email_ids.append(email_id)
+            emails.append({
+                "email_id": email_id,
+                "user_id": user.id,
+                "from_email": message.get("from"),
+                "subject": message.get("subject"),
+                "summary": message.get("snippet"),
+                "received_at": datetime.now(timezone.utc).isoformat(),
+                "relevance_score": 0.5,
+            })
+        store.seed("emails", emails)
+
+    return OfflineEnv(main.app, store, model, gmail, offline_users)
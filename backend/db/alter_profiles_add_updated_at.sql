@@ -0,0 +1,17 @@
+-- Lets the backend profile cache revalidate cheaply: it compares updated_at
+-- instead of refetching the whole row.
+alter table public.profiles
+  add column if not exists updated_at timestamp with time zone not null default now();
+
+create or replace function public.set_profiles_updated_at()
+returns trigger as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists profiles_set_updated_at on public.profiles;
+create trigger profiles_set_updated_at
+  before update on public.profiles
+  for each row execute function public.set_profiles_updated_at();
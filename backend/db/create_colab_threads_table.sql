@@ -0,0 +1,17 @@
+-- Needs emails keyed on (user_id, email_id): db/migrations/001_emails_user_email_key.sql
+create table public.colab_threads (
+  user_id uuid not null,
+  email_id text not null,
+  email_parsed jsonb null,
+  analysis jsonb null,
+  seen_digests text[] not null default '{}'::text[],
+  iteration integer not null default 0,
+  created_at timestamp with time zone null default now(),
+  updated_at timestamp with time zone null default now(),
+  constraint colab_threads_pkey primary key (user_id, email_id),
+  constraint colab_threads_email_fkey foreign KEY (user_id, email_id) references emails (user_id, email_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+alter table public.colab_threads enable row level security;
+create policy "Users manage their own colab threads" on public.colab_threads
+  for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
@@ -24,4 +24,6 @@ create index IF not exists idx_emails_from_email on public.emails using btree (f
 create index IF not exists idx_emails_received_at on public.emails using btree (received_at) TABLESPACE pg_default;
 create index IF not exists idx_emails_relevance on public.emails using btree (relevance_score) TABLESPACE pg_default;
 create index IF not exists idx_emails_labels_gin on public.emails using gin (labels) TABLESPACE pg_default;
-create index IF not exists idx_emails_tags_gin on public.emails using gin (tags) TABLESPACE pg_default;
\ No newline at end of file
+create index IF not exists idx_emails_tags_gin on public.emails using gin (tags) TABLESPACE pg_default;
+-- Keyset pagination for GET /emails: one range scan per page in (received_at, email_id) order
+create index IF not exists idx_emails_user_received_email on public.emails using btree (user_id, received_at desc nulls last, email_id desc) TABLESPACE pg_default;
@@ -0,0 +1,13 @@
+create table public.mailbox_sync_state (
+  user_id uuid not null,
+  synced_until timestamp with time zone not null,
+  last_received_at timestamp with time zone null,
+  emails_found integer null default 0,
+  created_at timestamp with time zone null default now(),
+  updated_at timestamp with time zone null default now(),
+  constraint mailbox_sync_state_pkey primary key (user_id)
+) TABLESPACE pg_default;
+
+alter table public.mailbox_sync_state enable row level security;
+create policy "Users manage their own mailbox sync state" on public.mailbox_sync_state
+  for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
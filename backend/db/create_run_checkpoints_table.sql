@@ -0,0 +1,34 @@
+-- Step outputs of start-process runs, for resuming a failed run (helpers/run_checkpoints.py).
+-- step_index -1 holds the run's plan inputs. messages is partitioned by created_at
+-- (db/migrations/003_partition_messages_actions.sql), so msg_id can't be a foreign key.
+create table public.run_checkpoints (
+  msg_id uuid not null,
+  step_index integer not null,
+  user_id uuid not null default auth.uid(),
+  plan_version text not null,
+  output jsonb null,
+  created_at timestamp with time zone null default now(),
+  constraint run_checkpoints_pkey primary key (msg_id, step_index)
+) TABLESPACE pg_default;
+
+create index IF not exists idx_run_checkpoints_created_at on public.run_checkpoints using btree (created_at) TABLESPACE pg_default;
+
+alter table public.run_checkpoints enable row level security;
+create policy "Users manage their own run checkpoints" on public.run_checkpoints
+  for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- Finished runs delete their checkpoints; those of runs never resumed expire after
+-- seven days. Needs pg_cron; without it, run the delete daily from any scheduler.
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule(
+      'kyodo-run-checkpoints-retention',
+      '45 3 * * *',
+      $job$delete from public.run_checkpoints where created_at < now() - interval '7 days'$job$
+    );
+  else
+    raise notice 'pg_cron is not installed; expire public.run_checkpoints rows externally';
+  end if;
+end;
+$$;
@@ -0,0 +1,17 @@
+-- Gmail message ids are only unique within one mailbox, and every lookup is scoped
+-- to a user (`email_id = ? and user_id = ?`), so key emails on (user_id, email_id).
+-- Messages reference the email through the same pair.
+begin;
+
+alter table public.messages drop constraint if exists messages_email_id_fkey;
+-- Left by an earlier run of this migration; it depends on emails_pkey
+alter table public.messages drop constraint if exists messages_email_fkey;
+
+alter table public.emails drop constraint if exists emails_pkey;
+alter table public.emails add constraint emails_pkey primary key (user_id, email_id);
+
+alter table public.messages
+  add constraint messages_email_fkey foreign key (user_id, email_id)
+  references public.emails (user_id, email_id) on delete cascade;
+
+commit;
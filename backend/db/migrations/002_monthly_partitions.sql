@@ -0,0 +1,112 @@
+-- Helpers for monthly range partitions on created_at. Partitions are named
+-- <parent>_YYYY_MM and bounded in UTC; a <parent>_default partition catches
+-- anything outside the created months. If maintenance lapses and rows for a
+-- month land in the default partition, the next run moves them into the
+-- month's new partition and raises a warning.
+
+create or replace function public.ensure_monthly_partitions(
+  parent regclass,
+  months_ahead integer default 2,
+  from_month date default null
+) returns integer
+language plpgsql as $$
+declare
+  parent_name text := (select relname from pg_class where oid = parent);
+  bucket date := date_trunc('month', coalesce(from_month, now() at time zone 'utc'))::date;
+  last_month date := (date_trunc('month', now() at time zone 'utc') + make_interval(months => months_ahead))::date;
+  default_name text := parent_name || '_default';
+  partition_name text;
+  lower_bound timestamptz;
+  upper_bound timestamptz;
+  stranded boolean;
+  moved bigint;
+  created integer := 0;
+begin
+  while bucket <= last_month loop
+    partition_name := format('%s_%s', parent_name, to_char(bucket, 'YYYY_MM'));
+    if to_regclass(format('public.%I', partition_name)) is null then
+      lower_bound := bucket::timestamp at time zone 'utc';
+      upper_bound := (bucket + interval '1 month')::timestamp at time zone 'utc';
+
+      -- The month can't be created while the default partition holds rows in its
+      -- range, so detach the default first and move those rows across after
+      stranded := false;
+      if to_regclass(format('public.%I', default_name)) is not null then
+        execute format(
+          'select exists (select 1 from public.%I where created_at >= $1 and created_at < $2)', default_name
+        ) into stranded using lower_bound, upper_bound;
+      end if;
+      if stranded then
+        execute format('alter table %s detach partition public.%I', parent, default_name);
+      end if;
+
+      execute format(
+        'create table public.%I partition of %s for values from (%L) to (%L)',
+        partition_name, parent, lower_bound, upper_bound
+      );
+      -- Partitions are reachable directly through PostgREST; only the parent's policies apply to users
+      execute format('alter table public.%I enable row level security', partition_name);
+
+      if stranded then
+        -- Detaching removed the default's clones of the parent's triggers, so this
+        -- delete does not fire messages_delete_actions
+        execute format(
+          'with moved as (delete from public.%I where created_at >= $1 and created_at < $2 returning *) '
+          'insert into %s select * from moved',
+          default_name, parent
+        ) using lower_bound, upper_bound;
+        get diagnostics moved = row_count;
+        execute format('alter table %s attach partition public.%I default', parent, default_name);
+        raise warning '% had no partition for %: moved % rows out of %',
+          parent_name, to_char(bucket, 'YYYY-MM'), moved, default_name;
+      end if;
+      created := created + 1;
+    end if;
+    bucket := (bucket + interval '1 month')::date;
+  end loop;
+
+  if to_regclass(format('public.%I', default_name)) is null then
+    execute format('create table public.%I partition of %s default', default_name, parent);
+    execute format('alter table public.%I enable row level security', default_name);
+  end if;
+  return created;
+end;
+$$;
+
+create or replace function public.drop_expired_partitions(
+  parent regclass,
+  keep_months integer
+) returns integer
+language plpgsql as $$
+declare
+  cutoff date := (date_trunc('month', now() at time zone 'utc') - make_interval(months => keep_months))::date;
+  child record;
+  dropped integer := 0;
+begin
+  for child in
+    select c.relname
+    from pg_inherits i
+    join pg_class c on c.oid = i.inhrelid
+    where i.inhparent = parent and c.relname ~ '_\d{4}_\d{2}$'
+  loop
+    if to_date(right(child.relname, 7), 'YYYY_MM') < cutoff then
+      execute format('drop table public.%I', child.relname);
+      dropped := dropped + 1;
+    end if;
+  end loop;
+  return dropped;
+end;
+$$;
+
+-- Messages and actions are kept for the same window: an action is written within
+-- minutes of its message, so dropping the same months keeps them consistent.
+create or replace function public.maintain_message_partitions(keep_months integer default 6)
+returns void
+language plpgsql as $$
+begin
+  perform public.ensure_monthly_partitions('public.messages'::regclass);
+  perform public.ensure_monthly_partitions('public.actions'::regclass);
+  perform public.drop_expired_partitions('public.actions'::regclass, keep_months);
+  perform public.drop_expired_partitions('public.messages'::regclass, keep_months);
+end;
+$$;
@@ -0,0 +1,94 @@
+-- Range-partition messages and actions by month of created_at so retention is a
+-- partition drop instead of a bulk delete, and recent months stay small.
+--
+-- The partition key has to be part of every unique constraint, so the keys become
+-- (msg_id, created_at) and (action_id, created_at). actions can no longer carry a
+-- foreign key to messages(msg_id); deleting a message still removes its actions
+-- through the messages_delete_actions trigger.
+begin;
+
+lock table public.messages, public.actions in access exclusive mode;
+
+alter table public.actions rename to actions_legacy;
+alter table public.actions_legacy rename constraint actions_pkey to actions_legacy_pkey;
+alter table public.messages rename to messages_legacy;
+alter table public.messages_legacy rename constraint messages_pkey to messages_legacy_pkey;
+
+update public.messages_legacy set created_at = coalesce(updated_at, now()) where created_at is null;
+update public.actions_legacy set created_at = coalesce(updated_at, now()) where created_at is null;
+
+-- LIKE keeps columns added outside these files (e.g. actions.action_type)
+create table public.messages (
+  like public.messages_legacy including defaults including constraints including generated including comments
+) partition by range (created_at);
+alter table public.messages alter column created_at set not null;
+alter table public.messages add constraint messages_pkey primary key (msg_id, created_at);
+alter table public.messages
+  add constraint messages_email_fkey foreign key (user_id, email_id)
+  references public.emails (user_id, email_id) on delete cascade;
+
+create table public.actions (
+  like public.actions_legacy including defaults including constraints including generated including comments
+) partition by range (created_at);
+alter table public.actions alter column created_at set not null;
+alter table public.actions add constraint actions_pkey primary key (action_id, created_at);
+
+select public.ensure_monthly_partitions(
+  'public.messages'::regclass, 2, (select min(created_at) from public.messages_legacy)::date
+);
+select public.ensure_monthly_partitions(
+  'public.actions'::regclass, 2, (select min(created_at) from public.actions_legacy)::date
+);
+
+insert into public.messages select * from public.messages_legacy;
+insert into public.actions select * from public.actions_legacy;
+
+create or replace function public.delete_message_actions()
+returns trigger
+language plpgsql
+security definer
+set search_path = ''
+as $$
+begin
+  delete from public.actions where msg_id = old.msg_id;
+  return old;
+end;
+$$;
+
+create trigger messages_delete_actions
+  after delete on public.messages
+  for each row execute function public.delete_message_actions();
+
+-- Carry row level security and its policies over from the old tables
+do $$
+declare
+  legacy text;
+  pol record;
+begin
+  foreach legacy in array array['messages_legacy', 'actions_legacy'] loop
+    if (select relrowsecurity from pg_class where oid = format('public.%I', legacy)::regclass) then
+      execute format('alter table public.%I enable row level security', replace(legacy, '_legacy', ''));
+    end if;
+  end loop;
+
+  for pol in
+    select * from pg_policies where schemaname = 'public' and tablename in ('messages_legacy', 'actions_legacy')
+  loop
+    execute format(
+      'create policy %I on public.%I as %s for %s to %s %s %s',
+      pol.policyname,
+      replace(pol.tablename, '_legacy', ''),
+      pol.permissive,
+      pol.cmd,
+      (select string_agg(case when r = 'public' then r else quote_ident(r) end, ', ') from unnest(pol.roles) r),
+      coalesce('using (' || pol.qual || ')', ''),
+      coalesce('with check (' || pol.with_check || ')', '')
+    );
+  end loop;
+end;
+$$;
+
+drop table public.actions_legacy;
+drop table public.messages_legacy;
+
+commit;
@@ -0,0 +1,18 @@
+-- Indexes matching the queries the app actually runs. Indexes on the partitioned
+-- parents are created on every partition, current and future.
+
+-- Chat view: messages of an email in order (ChatRooms); msg_id is included so the
+-- follow-up actions lookup can collect ids from the index alone.
+create index if not exists idx_messages_email_created on public.messages using btree (email_id, created_at) include (msg_id);
+create index if not exists idx_messages_user_id on public.messages using btree (user_id);
+create index if not exists idx_messages_chat_id on public.messages using btree (chat_id);
+create index if not exists idx_messages_processed on public.messages using btree (processed);
+
+-- Run timeline: actions of a set of messages in order (ChatRooms, run resume)
+create index if not exists idx_actions_msg_created on public.actions using btree (msg_id, created_at);
+
+-- Every emails read is scoped to a user; the (user_id, received_at, email_id) index
+-- from create_emails_table.sql serves the sync window and the dashboard listing,
+-- and the primary key serves single-email lookups, so the unscoped one goes.
+create index if not exists idx_emails_user_received_email on public.emails using btree (user_id, received_at desc nulls last, email_id desc);
+drop index if exists public.idx_emails_received_at;
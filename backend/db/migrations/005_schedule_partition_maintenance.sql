@@ -0,0 +1,18 @@
+-- Create upcoming months and drop expired ones nightly. Needs pg_cron (enabled from
+-- the Supabase dashboard); without it, run `select public.maintain_message_partitions(6);`
+-- at least once a month from any scheduler. A missed month is recovered on the next
+-- run: rows that landed in the default partition meanwhile are moved into the new
+-- month's partition (see ensure_monthly_partitions in 002).
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule(
+      'kyodo-message-partitions',
+      '15 3 * * *',
+      'select public.maintain_message_partitions(6)'
+    );
+  else
+    raise notice 'pg_cron is not installed; schedule public.maintain_message_partitions() externally';
+  end if;
+end;
+$$;
@@ -0,0 +1,7 @@
+-- Plan template version (helpers/plan_templates.py) each run used: the search plan
+-- that classified a stored email, and the start-process plan behind a run's final
+-- action. Null for rows written before templates were versioned.
+-- Apply before deploying the backend that writes it: emails upserts and actions
+-- inserts always send plan_version and fail on a schema without the column.
+alter table public.emails add column if not exists plan_version text;
+alter table public.actions add column if not exists plan_version text;
@@ -0,0 +1,15 @@
+-- colab_threads was created without row level security, so any authenticated
+-- client could read or write other users' parsed threads through PostgREST.
+-- The backend only touches it with the caller's token, so an owner policy is enough.
+-- Skipped where the table doesn't exist yet; create_colab_threads_table.sql enables it.
+do $$
+begin
+  if to_regclass('public.colab_threads') is null then
+    return;
+  end if;
+  alter table public.colab_threads enable row level security;
+  drop policy if exists "Users manage their own colab threads" on public.colab_threads;
+  create policy "Users manage their own colab threads" on public.colab_threads
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+end;
+$$;
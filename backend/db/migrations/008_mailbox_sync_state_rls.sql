@@ -0,0 +1,15 @@
+-- mailbox_sync_state was created without row level security, so any authenticated
+-- client could read or overwrite other users' sync watermarks through PostgREST.
+-- The backend (requests and the sync scheduler) only uses the user's own token.
+-- Skipped where the table doesn't exist yet; create_mailbox_sync_state_table.sql enables it.
+do $$
+begin
+  if to_regclass('public.mailbox_sync_state') is null then
+    return;
+  end if;
+  alter table public.mailbox_sync_state enable row level security;
+  drop policy if exists "Users manage their own mailbox sync state" on public.mailbox_sync_state;
+  create policy "Users manage their own mailbox sync state" on public.mailbox_sync_state
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+end;
+$$;
@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from portia import logger
+
+from helpers.supabase_helper import SupabaseHelper
+
+_Row = Tuple[int, SupabaseHelper, str, dict]
+
+
+class ActionWriter:
+    """Buffers row inserts and writes them in bulk from a background thread.
+
+    `enqueue` returns immediately. The writer thread flushes when `max_batch` rows are
+    waiting, `flush_interval` seconds after the first buffered row, or when `flush()` is
+    called at the end of a run. Rows are written in the order each thread enqueued them
+    (consecutive rows for the same client and table share one bulk insert), so actions
+    of a msg_id land in the order they were produced; a failed batch is retried with exponential
+    backoff before anything after it is written.
+
+    The queue is bounded by `max_queue`. When it is full, `enqueue` blocks for up to
+    `put_timeout` seconds until the writer catches up; only then is the row written
+    synchronously (it may land ahead of buffered rows of its run) instead of growing
+    memory without limit. `flush(wait=True)` returns only once every row enqueued
+    before it is written, whichever path wrote it.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 50,
+        flush_interval: float = 0.5,
+        max_queue: int = 5000,
+        max_retries: int = 5,
+        backoff: float = 0.2,
+        put_timeout: float = 5.0,
+    ) -> None:
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._queue: "queue.Queue[_Row]" = queue.Queue(maxsize=max_queue)
+        self._flush_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._progress = threading.Condition()
+        self._enqueued = 0
+        # Every seq up to `_written` is written; later ones that finished out of order wait in `_done`
+        self._written = 0
+        self._done: Set[int] = set()
+        self._seq_lock = threading.Lock()
+
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.sync_fallbacks = 0
+
+        self._thread = threading.Thread(target=self._loop, name="kyodo-action-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, supabase: SupabaseHelper, table: str, row: dict) -> None:
+        with self._seq_lock:
+            self._enqueued += 1
+            seq = self._enqueued
+            try:
+                self._queue.put_nowait((seq, supabase, table, row))
+                return
+            except queue.Full:
+                pass
+        # Backpressure: wait for the writer rather than jump ahead of the run's earlier rows
+        try:
+            self._queue.put((seq, supabase, table, row), timeout=self.put_timeout)
+            return
+        except queue.Full:
+            pass
+        self.sync_fallbacks += 1
+        logger().warning(f"Action writer queue full for {self.put_timeout:.0f}s, writing row synchronously")
+        try:
+            self._insert(supabase, table, [row])
+        finally:
+            self._mark_written([seq])
+
+    def flush(self, wait: bool = True, timeout: float = 10.0) -> bool:
+        """Ask the writer to flush now. With `wait`, block until rows enqueued so far are written."""
+        with self._seq_lock:
+            target = self._enqueued
+        self._flush_requested.set()
+        if not wait:
+            return True
+        with self._progress:
+            return self._progress.wait_for(lambda: self._written >= target, timeout=timeout)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Drain buffered rows and stop the writer thread."""
+        self._stopping.set()
+        self._flush_requested.set()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger().warning(f"Action writer still had {self._queue.qsize()} rows at shutdown")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "sync_fallbacks": self.sync_fallbacks,
+        }
+
+    def _loop(self) -> None:
+        while True:
+            batch: List[_Row] = []
+            try:
+                batch.append(self._queue.get(timeout=0.1 if self._stopping.is_set() else 1.0))
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if self._flush_requested.is_set() or remaining <= 0:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except queue.Empty:
+                        break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+            if self._queue.empty():
+                self._flush_requested.clear()
+
+            self._write(batch)
+
+    def _write(self, batch: List[_Row]) -> None:
+        # Group consecutive rows by (client, table) so order is preserved across groups
+        groups: List[Tuple[SupabaseHelper, str, List[dict]]] = []
+        for _, supabase, table, row in batch:
+            if groups and groups[-1][0] is supabase and groups[-1][1] == table:
+                groups[-1][2].append(row)
+            else:
+                groups.append((supabase, table, [row]))
+
+        for supabase, table, rows in groups:
+            self._insert(supabase, table, rows)
+        self._mark_written(seq for seq, _, _, _ in batch)
+
+    def _insert(self, supabase: SupabaseHelper, table: str, rows: List[dict]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                supabase.client.table(table).insert(rows).execute()
+                self.batches += 1
+                self.rows_written += len(rows)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.rows_dropped += len(rows)
+                    logger().error(f"Dropping {len(rows)} {table} rows after {attempt + 1} attempts: {e}")
+                    return
+                delay = self.backoff * (2 ** attempt)
+                logger().warning(f"Insert into {table} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _mark_written(self, seqs: Iterable[int]) -> None:
+        with self._progress:
+            self._done.update(seqs)
+            while self._written + 1 in self._done:
+                self._written += 1
+                self._done.remove(self._written)
+            self._progress.notify_all()
+
+
+_writer: Optional[ActionWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_action_writer() -> ActionWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActionWriter(
+                    max_batch=int(os.getenv("ACTION_WRITER_BATCH", "50")),
+                    flush_interval=float(os.getenv("ACTION_WRITER_INTERVAL", "0.5")),
+                )
+    return _writer
@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from helpers.metrics import Counter, registry
+from helpers.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+compaction_saved = registry.register(Counter(
+    "kyodo_compaction_saved_total",
+    "Bytes and estimated tokens removed from LLM inputs by compaction.",
+    ("plan", "unit"),
+))
+
+# Free-text fields of emails, Gmail results and thread replies; ids, addresses,
+# dates, links and labels are never touched
+TEXT_FIELDS = {"body", "text", "content", "snippet", "message", "notes", "summary", "html"}
+
+# A forwarded mail (e.g. a manager passing on a brand's pitch) is content, not
+# quoted history: its header block and body are kept
+_FORWARD_MARKER = re.compile(
+    r"^[ \t]*(?:-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Everything from a reply header on is the quoted conversation
+_QUOTE_HEADER = re.compile(
+    r"^(?:On .{1,200}wrote:|-{2,}\s*Original Message\s*-{2,}|From: .+\n(?:.*\n){0,3}?(?:Sent|Date): .+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_QUOTED_LINE = re.compile(r"^\s*>.*(?:\n|$)", re.MULTILINE)
+_SIGNATURE_DELIMITER = re.compile(r"^-- ?$", re.MULTILINE)
+_MOBILE_FOOTER = re.compile(r"^\s*Sent from my \w+.*$|^\s*Get Outlook for \w+.*$", re.IGNORECASE | re.MULTILINE)
+_SIGN_OFF = re.compile(
+    r"^\s*(?:best(?: regards| wishes)?|kind regards|warm regards|regards|thanks|thank you|cheers|sincerely|all the best|xo+)[,!.]?\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Lines kept after a sign-off: the sender's name and role, which may name the brand
+SIGNATURE_KEEP_LINES = 2
+SIGNATURE_MAX_LINES = 8
+_BOILERPLATE = re.compile(
+    r"confidential|intended recipient|unsubscribe|manage (?:your )?preferences|privacy policy|"
+    r"no longer wish to receive|please consider the environment|virus[- ]free|this message was sent to",
+    re.IGNORECASE,
+)
+_URL = re.compile(r"https?://[^\s<>\"')\]]+")
+LONG_URL_CHARS = 60
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+
+
+@dataclass
+class CompactionStats:
+    fields: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def add(self, before: str, after: str) -> None:
+        self.fields += 1
+        self.bytes_before += len(before.encode())
+        self.bytes_after += len(after.encode())
+        self.tokens_before += estimate_tokens(before)
+        self.tokens_after += estimate_tokens(after)
+
+
+def _shorten_url(match: re.Match) -> str:
+    url = match.group(0)
+    if len(url) <= LONG_URL_CHARS:
+        return url
+    scheme, _, rest = url.partition("://")
+    host = rest.split("/", 1)[0].split("?", 1)[0]
+    return f"{scheme}://{host}/…"
+
+
+def _strip_signature(text: str) -> str:
+    delimiter = _SIGNATURE_DELIMITER.search(text)
+    if delimiter:
+        text = text[:delimiter.start()]
+    for sign_off in reversed(list(_SIGN_OFF.finditer(text))):
+        # A "Thanks!" opening the mail is not a sign-off
+        if sign_off.start() < len(text) // 2:
+            break
+        tail = text[sign_off.end():].strip("\n").splitlines()
+        if len(tail) <= SIGNATURE_MAX_LINES:
+            return text[:sign_off.end()] + "\n" + "\n".join(tail[:SIGNATURE_KEEP_LINES])
+        break
+    return text
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " …[truncated]"
+
+
+def _strip_footer(text: str) -> str:
+    # Only trailing paragraphs are footers; "confidential" or "unsubscribe" in the
+    # body of a mail may sit next to the offer itself
+    paragraphs = re.split(r"\n\s*\n", text.strip())
+    while len(paragraphs) > 1 and _BOILERPLATE.search(paragraphs[-1]):
+        paragraphs.pop()
+    return "\n\n".join(paragraphs)
+
+
+def _compact_message(text: str) -> Tuple[str, bool]:
+    """One message with its quoted history, signature and footer removed, and
+    whether quoted history was cut."""
+    header = _QUOTE_HEADER.search(text)
+    quoted = bool(header and header.start() > 0)
+    if quoted:
+        text = text[:header.start()]
+    text = _QUOTED_LINE.sub("", text)
+    text = _MOBILE_FOOTER.sub("", text)
+    text = _strip_signature(text)
+    return _strip_footer(text), quoted
+
+
+def _split_forwarded(text: str) -> List[Tuple[str, str]]:
+    """`(header, body)` per message: the newest first (no header), then each
+    forwarded message with its marker and From/Date/Subject block as the header."""
+    markers = list(_FORWARD_MARKER.finditer(text))
+    parts = [("", text[:markers[0].start()] if markers else text)]
+    for marker, following in zip(markers, markers[1:] + [None]):
+        block = text[marker.start():following.start() if following else len(text)]
+        header, _, body = block.partition("\n\n")
+        parts.append((header, body))
+    return parts
+
+
+def compact_text(text: str, max_tokens: Optional[int] = None) -> str:
+    """Email body with quoted history, signature, boilerplate and long URLs removed.
+
+    Only the newest message in a body is kept, plus any messages forwarded in
+    it: the quoted chain is the earlier thread, which the caller either already
+    has or doesn't need, while a forwarded mail is often the offer itself.
+    """
+    text = text.replace("\r\n", "\n")
+    kept = []
+    for header, body in _split_forwarded(text):
+        body, quoted = _compact_message(body)
+        kept.append(f"{header}\n\n{body}" if header else body)
+        # Anything after a quote header, forwarded or not, is history
+        if quoted:
+            break
+    text = "\n\n".join(kept)
+    text = _URL.sub(_shorten_url, text)
+    text = _BLANK_LINES.sub("\n\n", _TRAILING_SPACE.sub("\n", text)).strip()
+    return truncate_to_tokens(text, max_tokens) if max_tokens else text
+
+
+class Compactor:
+    """Shrinks the email content a plan hands to its LLM steps.
+
+    `compact(value)` walks dicts and lists and rewrites the free-text fields
+    (`TEXT_FIELDS`) with `compact_text`, truncating each to `field_tokens`. Every
+    other field is returned unchanged so extraction still sees the same ids,
+    senders, dates and links. A bare string (e.g. a tool's text output) may hold
+    several messages, so it only gets URL shortening and whitespace cleanup.
+    """
+
+    def __init__(self, field_tokens: Optional[int] = None) -> None:
+        self.field_tokens = field_tokens or int(os.getenv("COMPACT_FIELD_TOKENS", "1500"))
+
+    def compact(self, value: Any, stats: Optional[CompactionStats] = None) -> Any:
+        stats = stats if stats is not None else CompactionStats()
+        if isinstance(value, str):
+            stripped = value.lstrip()
+            if stripped[:1] in ("[", "{"):
+                try:
+                    return self.compact(json.loads(stripped), stats)
+                except ValueError:
+                    pass
+            compacted = _BLANK_LINES.sub("\n\n", _URL.sub(_shorten_url, value)).strip()
+            stats.add(value, compacted)
+            return compacted
+        return self._walk(value, stats)
+
+    def _walk(self, value: Any, stats: CompactionStats) -> Any:
+        if isinstance(value, dict):
+            result = {}
+            for key, item in value.items():
+                if key in TEXT_FIELDS and isinstance(item, str):
+                    result[key] = compact_text(item, self.field_tokens)
+                    stats.add(item, result[key])
+                else:
+                    result[key] = self._walk(item, stats)
+            return result
+        if isinstance(value, (list, tuple)):
+            return [self._walk(item, stats) for item in value]
+        return value
+
+
+def record_compaction(plan: str, stats: CompactionStats) -> None:
+    compaction_saved.inc(stats.bytes_saved, plan=plan, unit="bytes")
+    compaction_saved.inc(stats.tokens_saved, plan=plan, unit="tokens")
+
+
+_compactor: Optional[Compactor] = None
+_compactor_lock = threading.Lock()
+
+
+def get_compactor() -> Compactor:
+    """Return the process-wide compactor, configured by COMPACT_FIELD_TOKENS."""
+    global _compactor
+    if _compactor is None:
+        with _compactor_lock:
+            if _compactor is None:
+                _compactor = Compactor()
+    return _compactor
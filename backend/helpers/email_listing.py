@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from helpers.supabase_helper import SupabaseHelper
+
+# Columns callers may project with `fields=`
+EMAIL_FIELDS = {
+    "email_id", "from_name", "from_email", "subject", "summary", "received_at",
+    "thread_link", "labels", "tags", "relevance_score", "confidence", "first_received",
+    "last_received", "ui_actions", "notes", "created_at", "updated_at", "is_ai_activate",
+}
+# What the dashboard list needs; bodies of notes/threads stay out unless asked for
+DEFAULT_FIELDS = (
+    "email_id", "from_name", "from_email", "subject", "summary", "received_at",
+    "labels", "relevance_score", "ui_actions",
+)
+MAX_PAGE_SIZE = 200
+
+
+class InvalidListingRequest(ValueError):
+    """A bad cursor or field list; the endpoint answers 400."""
+
+
+def encode_cursor(row: dict) -> str:
+    payload = json.dumps([row.get("received_at"), row["email_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        received_at, email_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidListingRequest("Invalid cursor") from e
+    if not isinstance(email_id, str) or (received_at is not None and not isinstance(received_at, str)):
+        raise InvalidListingRequest("Invalid cursor")
+    return received_at, email_id
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - EMAIL_FIELDS)
+    if unknown:
+        raise InvalidListingRequest(f"Unknown fields: {', '.join(unknown)}")
+    # The keyset columns are always returned so the next cursor can be built
+    return list(dict.fromkeys(["email_id", "received_at", *requested]))
+
+
+def _quoted(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def list_emails(
+    supabase: SupabaseHelper,
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    labels: Optional[List[str]] = None,
+    min_relevance: Optional[float] = None,
+    max_relevance: Optional[float] = None,
+) -> Dict[str, Any]:
+    """One page of a user's emails, newest first.
+
+    Keyset pagination on `(user_id, received_at desc nulls last, email_id desc)`: the
+    cursor is the last row's sort key, so every page is an index range scan rather
+    than an ever-growing OFFSET, and rows inserted while paging don't shift pages.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    columns = parse_fields(fields)
+
+    query = supabase.client.table("emails").select(",".join(columns)).eq("user_id", user_id)
+    if labels:
+        query = query.contains("labels", labels)
+    if min_relevance is not None:
+        query = query.gte("relevance_score", min_relevance)
+    if max_relevance is not None:
+        query = query.lte("relevance_score", max_relevance)
+
+    if cursor:
+        received_at, email_id = decode_cursor(cursor)
+        if received_at is None:
+            query = query.is_("received_at", "null").lt("email_id", email_id)
+        else:
+            query = query.or_(
+                f"received_at.lt.{_quoted(received_at)},"
+                f"and(received_at.eq.{_quoted(received_at)},email_id.lt.{_quoted(email_id)}),"
+                "received_at.is.null"
+            )
+
+    rows = (
+        query.order("received_at", desc=True, nullsfirst=False)
+        .order("email_id", desc=True)
+        .limit(limit + 1)
+        .execute()
+        .data
+        or []
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "emails": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
+
+
+def page_etag(page: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(
+        json.dumps(page, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+    return f'W/"{digest[:32]}"'
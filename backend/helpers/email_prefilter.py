@@ -0,0 +1,302 @@
+import json
+import re
+import threading
+import time
+import zlib
+from email.utils import parseaddr
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from portia import logger
+
+from helpers.supabase_helper import SupabaseHelper
+
+# Automated-sender markers in the From address
+AUTOMATED_SENDER = re.compile(
+    r"(no-?reply|do-?not-?reply|notifications?|newsletter|mailer-daemon|updates|digest|alerts?)@",
+    re.IGNORECASE,
+)
+
+# Phrase weights; positive means "looks like a collaboration offer"
+PHRASE_WEIGHTS: Dict[str, float] = {
+    "collaboration": 1.0,
+    "collab": 1.0,
+    "partnership": 1.0,
+    "sponsorship": 1.2,
+    "sponsored post": 1.2,
+    "sponsored video": 1.2,
+    "brand deal": 1.5,
+    "paid promotion": 1.5,
+    "ambassador": 1.0,
+    "work with you": 1.0,
+    "your rates": 1.2,
+    "rate card": 1.2,
+    "media kit": 1.0,
+    "campaign": 0.6,
+    "budget": 0.6,
+    "deliverables": 0.8,
+    "unsubscribe": -1.5,
+    "newsletter": -1.5,
+    "view in browser": -1.2,
+    "order confirmation": -2.0,
+    "receipt": -1.5,
+    "verify your": -2.0,
+    "password": -2.0,
+    "webinar": -1.0,
+    "% off": -1.5,
+}
+
+HASH_DIM = 1024
+# Stored emails at or above this relevance_score count as offers when fitting
+RELEVANT_AT = 0.5
+# Samples of each class a RelevanceModel needs before it may score mail
+MIN_CLASS_SAMPLES = 5
+TOKEN = re.compile(r"[a-z0-9']+")
+# Phrases match whole tokens ("collab" is not found inside "collaboration"); "%"
+# is its own token so "% off" matches "70% off"
+PHRASE_TOKEN = re.compile(r"[a-z0-9']+|%")
+
+
+def _phrase_index(weights: Dict[str, float]) -> Dict[str, List[Tuple[Tuple[str, ...], str]]]:
+    """Phrases by first token, longest first, for non-overlapping matching."""
+    index: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+    for phrase in weights:
+        tokens = tuple(PHRASE_TOKEN.findall(phrase))
+        index.setdefault(tokens[0], []).append((tokens, phrase))
+    for candidates in index.values():
+        candidates.sort(key=lambda c: len(c[0]), reverse=True)
+    return index
+
+
+_PHRASES = _phrase_index(PHRASE_WEIGHTS)
+
+
+def matched_phrases(text: str) -> List[str]:
+    """`PHRASE_WEIGHTS` phrases in the text, each once, matched on word boundaries
+    with a token never counted towards two phrases."""
+    tokens = PHRASE_TOKEN.findall(text.lower())
+    found: Dict[str, None] = {}
+    i = 0
+    while i < len(tokens):
+        for phrase_tokens, phrase in _PHRASES.get(tokens[i], ()):
+            if tuple(tokens[i:i + len(phrase_tokens)]) == phrase_tokens:
+                found[phrase] = None
+                i += len(phrase_tokens)
+                break
+        else:
+            i += 1
+    return list(found)
+
+
+def _field(message: dict, *keys: str) -> str:
+    for key in keys:
+        value = message.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def _headers(message: dict) -> Dict[str, str]:
+    headers = message.get("headers") or {}
+    if isinstance(headers, list):
+        headers = {h.get("name", ""): h.get("value", "") for h in headers if isinstance(h, dict)}
+    return {str(k).lower(): str(v) for k, v in headers.items()}
+
+
+def message_text(message: dict) -> str:
+    return " ".join(
+        [
+            _field(message, "subject"),
+            _field(message, "snippet", "summary"),
+            _field(message, "body", "text", "content"),
+        ]
+    )
+
+
+def hashed_features(text: str) -> np.ndarray:
+    """Unigram+bigram hashing-trick vector, L2 normalised."""
+    vector = np.zeros(HASH_DIM, dtype=np.float32)
+    tokens = TOKEN.findall(text.lower())
+    for gram in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        vector[zlib.crc32(gram.encode()) % HASH_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class RelevanceModel:
+    """Ridge regression on hashed text features, fit to stored `emails.relevance_score`.
+
+    Stored emails are mostly ones the LLM filter already kept, so a model is only
+    `usable` once it has seen `MIN_CLASS_SAMPLES` of both offers and non-offers;
+    fit on offers alone it rates everything alike and would drop mail at random.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, samples: int, negatives: int = 0) -> None:
+        self.weights = weights
+        self.bias = bias
+        self.samples = samples
+        self.negatives = negatives
+
+    @property
+    def usable(self) -> bool:
+        return min(self.negatives, self.samples - self.negatives) >= MIN_CLASS_SAMPLES
+
+    @classmethod
+    def fit(cls, texts: List[str], scores: List[float], alpha: float = 1.0) -> "RelevanceModel":
+        X = np.stack([hashed_features(t) for t in texts])
+        y = np.asarray(scores, dtype=np.float32)
+        bias = float(y.mean())
+        # Dual form: n is a few hundred at most, far smaller than HASH_DIM
+        gram = X @ X.T + alpha * np.eye(len(texts), dtype=np.float32)
+        weights = X.T @ np.linalg.solve(gram, y - bias)
+        return cls(weights, bias, len(texts), negatives=int((y < RELEVANT_AT).sum()))
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        X = np.stack([hashed_features(t) for t in texts])
+        return np.clip(X @ self.weights + self.bias, 0.0, 1.0)
+
+
+class EmailPrefilter:
+    """Cheap local scoring of Gmail search hits before the LLM filter step.
+
+    Header heuristics drop obvious non-offers outright: List-Unsubscribe or bulk
+    precedence, automated senders, and mail sent by the user. The rest get a phrase
+    score, blended with the per-user `RelevanceModel` when one is `usable`. Messages
+    scoring below `drop_below` are discarded, those at or above `fast_track_at` skip the
+    LLM filter, and only the uncertain middle is sent to the model.
+
+    The thresholds are calibrated on the labelled fixtures in `bench_prefilter`:
+    one offer phrase alone ("collaboration") stays uncertain, fast-tracking takes
+    two strong ones, and dropping takes a clearly negative phrase.
+    """
+
+    def __init__(
+        self,
+        own_email: Optional[str] = None,
+        model: Optional[RelevanceModel] = None,
+        drop_below: float = 0.2,
+        fast_track_at: float = 0.9,
+    ) -> None:
+        self.own_email = (own_email or "").strip().lower()
+        self.model = model
+        self.drop_below = drop_below
+        self.fast_track_at = fast_track_at
+
+    def header_reject(self, message: dict) -> Optional[str]:
+        headers = _headers(message)
+        sender = _field(message, "from", "from_email", "sender").lower()
+        if "list-unsubscribe" in headers:
+            return "list_unsubscribe"
+        if headers.get("precedence", "").lower() in ("bulk", "list", "junk"):
+            return "bulk_precedence"
+        if AUTOMATED_SENDER.search(sender):
+            return "automated_sender"
+        if self.own_email and parseaddr(sender)[1].lower() == self.own_email:
+            return "own_mail"
+        return None
+
+    def phrase_score(self, text: str) -> float:
+        raw = sum(PHRASE_WEIGHTS[phrase] for phrase in matched_phrases(text))
+        # Squash to 0-1 around a neutral 0.5
+        return float(1.0 / (1.0 + np.exp(-raw)))
+
+    def split(self, messages: Any) -> Dict[str, Any]:
+        """Plan function step: partition search hits into fast-tracked, uncertain and dropped."""
+        items = messages
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                items = None
+        if not isinstance(items, list):
+            # Unknown tool output shape: let the LLM see everything
+            return {"fast_tracked": [], "uncertain": messages, "dropped": 0}
+
+        candidates: List[dict] = []
+        dropped = 0
+        for message in items:
+            if not isinstance(message, dict):
+                candidates.append(message)
+                continue
+            reason = self.header_reject(message)
+            if reason:
+                dropped += 1
+                continue
+            candidates.append(message)
+
+        texts = [message_text(m) if isinstance(m, dict) else str(m) for m in candidates]
+        phrase = np.array([self.phrase_score(t) for t in texts], dtype=np.float32)
+        if self.model is not None and self.model.usable and texts:
+            scores = 0.5 * phrase + 0.5 * self.model.predict(texts)
+        else:
+            scores = phrase
+
+        fast_tracked, uncertain = [], []
+        for message, score in zip(candidates, scores):
+            if score < self.drop_below:
+                dropped += 1
+            elif score >= self.fast_track_at:
+                fast_tracked.append(message)
+            else:
+                uncertain.append(message)
+
+        logger().info(
+            f"Prefilter: {len(fast_tracked)} fast-tracked, {len(uncertain)} uncertain, {dropped} dropped"
+        )
+        return {"fast_tracked": fast_tracked, "uncertain": uncertain, "dropped": dropped}
+
+    @staticmethod
+    def uncertain(split_result: Dict[str, Any]) -> Any:
+        """Plan function step: the hits that still need the LLM filter."""
+        return split_result.get("uncertain", [])
+
+    @staticmethod
+    def fast_tracked(split_result: Dict[str, Any]) -> Any:
+        """Plan function step: the hits accepted without the LLM filter."""
+        return split_result.get("fast_tracked", [])
+
+
+class RelevanceModelCache:
+    """Per-user `RelevanceModel`s, refit from `emails` at most every `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: float = 3600, min_samples: int = 20, max_samples: int = 500) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._models: Dict[str, Tuple[Optional[RelevanceModel], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, supabase: SupabaseHelper, user_id: str) -> Optional[RelevanceModel]:
+        with self._lock:
+            cached = self._models.get(user_id)
+        if cached and time.time() - cached[1] < self.ttl_seconds:
+            return cached[0]
+
+        model = None
+        try:
+            rows = supabase.client.table("emails").select(
+                "subject, summary, relevance_score"
+            ).eq("user_id", user_id).order("received_at", desc=True).limit(self.max_samples).execute().data or []
+            rows = [r for r in rows if r.get("relevance_score") is not None]
+            negatives = sum(1 for r in rows if float(r["relevance_score"]) < RELEVANT_AT)
+            if len(rows) < self.min_samples or min(negatives, len(rows) - negatives) < MIN_CLASS_SAMPLES:
+                logger().info(
+                    f"Not training prefilter relevance model: {len(rows) - negatives} offers, {negatives} non-offers"
+                )
+            else:
+                model = RelevanceModel.fit(
+                    [message_text(r) for r in rows],
+                    [float(r["relevance_score"]) for r in rows],
+                )
+                logger().info(f"Trained prefilter relevance model on {len(rows)} emails ({negatives} non-offers)")
+        except Exception as e:
+            logger().warning(f"Failed to train prefilter relevance model: {e}")
+
+        with self._lock:
+            self._models[user_id] = (model, time.time())
+        return model
+
+
+relevance_models = RelevanceModelCache()
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from portia import logger
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds `max_pending` jobs."""
+
+
+class Job:
+    """State of one background run, keyed by the msg_id it was started for."""
+
+    def __init__(self, job_id: str, user_id: str, on_cancelled: Optional[Callable[[], None]] = None) -> None:
+        self.job_id = job_id
+        self.user_id = user_id
+        # Called once if the job is cancelled before it ran, to close what it owns
+        self.on_cancelled = on_cancelled
+        self.status = "queued"  # queued | running | succeeded | failed | cancelled
+        self.cancel_requested = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.status_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "msg_id": self.job_id,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "status_code": self.status_code,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Bounded worker pool for long plan runs started from request handlers.
+
+    Handlers submit a callable and return immediately, so Starlette's threadpool is no
+    longer held for the duration of an LLM plan. The callable must return a
+    `(status_code, content)` tuple, the same shape the synchronous endpoint responds with.
+
+    A queued job can be cancelled outright, and its `on_cancelled` callback closes
+    whatever the handler opened for it. A running plan can't be interrupted, so
+    cancelling it only marks `cancel_requested` and its result is discarded.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 50, retention_seconds: float = 3600) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kyodo-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        job_id: str,
+        user_id: str,
+        fn: Callable[[], tuple],
+        on_cancelled: Optional[Callable[[], None]] = None,
+    ) -> Job:
+        """Enqueue `fn` under `job_id`; `on_cancelled` runs if it is cancelled before starting.
+
+        Raises:
+            JobQueueFull: If `max_pending` jobs are already queued or running.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs pending")
+            job = Job(job_id, user_id, on_cancelled)
+            self._jobs[job_id] = job
+            job.future = self._executor.submit(self._run, job, fn)
+        logger().info(f"Queued job {job_id} ({pending + 1} pending)")
+        return job
+
+    def _run(self, job: Job, fn: Callable[[], tuple]) -> None:
+        with self._lock:
+            # Cancelled after a worker picked the job up but before it started
+            cancelled = job.cancel_requested
+            if not cancelled:
+                job.status = "running"
+                job.started_at = time.time()
+        if cancelled:
+            self._finish_cancelled(job)
+            return
+        try:
+            status_code, content = fn()
+            with self._lock:
+                job.status_code = status_code
+                if job.cancel_requested:
+                    job.status = "cancelled"
+                else:
+                    job.result = content
+                    job.status = "succeeded" if status_code < 400 else "failed"
+        except Exception as e:
+            logger().exception(f"Job {job.job_id} failed")
+            with self._lock:
+                job.status = "failed"
+                job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def _finish_cancelled(self, job: Job) -> None:
+        """Mark a job that never ran as cancelled and run its callback, once."""
+        with self._lock:
+            if job.finished_at is not None:
+                return
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        if job.on_cancelled is not None:
+            try:
+                job.on_cancelled()
+            except Exception as e:
+                logger().warning(f"Failed to close cancelled job {job.job_id}: {e}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.status not in ("queued", "running"):
+                return job
+            job.cancel_requested = True
+            never_ran = job.future is not None and job.future.cancel()
+        if never_ran:
+            self._finish_cancelled(job)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {"max_workers": self.max_workers, "max_pending": self.max_pending, "jobs": by_status}
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Stop taking jobs: queued ones are cancelled (running their `on_cancelled`),
+        running ones get up to `timeout` seconds to finish and record their results."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.future is not None and job.future.cancelled():
+                self._finish_cancelled(job)
+        running = [job.future for job in jobs if job.future is not None and not job.future.done()]
+        if running:
+            _, unfinished = wait(running, timeout=timeout)
+            if unfinished:
+                logger().warning(f"{len(unfinished)} jobs still running after {timeout:.0f}s shutdown drain")
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide queue, sized by JOB_WORKERS and JOB_MAX_PENDING."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(
+                    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+                    max_pending=int(os.getenv("JOB_MAX_PENDING", "50")),
+                )
+    return _queue
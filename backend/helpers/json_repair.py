@@ -0,0 +1,192 @@
+import json
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from helpers.metrics import Counter, registry
+
+json_repair_total = registry.register(Counter(
+    "kyodo_json_repair_total",
+    "Structured LLM outputs by how they were parsed: clean, repaired, failed or rerun.",
+    ("schema", "outcome"),
+))
+
+_M = TypeVar("_M", bound=BaseModel)
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON value matching the schema can be recovered from the text."""
+
+
+@lru_cache(maxsize=32)
+def type_adapter(schema: Type[_M]) -> TypeAdapter:
+    """Adapters are costly to build; one per schema is kept for the process."""
+    return TypeAdapter(schema)
+
+
+def _balanced_json(text: str, start: int) -> Tuple[str, bool]:
+    """Scan one JSON object/array starting at `text[start]`.
+
+    Returns the candidate text and whether it had to be repaired. Repairs happen in
+    the same pass: smart-quoted strings and Python literals are normalised, trailing
+    commas are dropped, and a truncated value has its open string and brackets closed.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    smart_string = False
+    escaped = False
+    repaired = False
+    # Where the last object key started in `out`, to drop a key cut off before its value
+    key_start = key_end = -1
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"' or (smart_string and ch in "“”"):
+                ch = '"'
+                in_string = False
+            out.append(ch)
+            if not in_string and key_start >= 0:
+                key_end = len(out)
+            i += 1
+            continue
+
+        if ch in "“”":
+            ch = '"'
+            smart_string = True
+            repaired = True
+        elif ch == '"':
+            smart_string = False
+        if ch == '"':
+            in_string = True
+            previous = next((c for c in reversed(out) if not c.isspace()), "")
+            key_start = len(out) if stack and stack[-1] == "}" and previous in "{," else -1
+            key_end = -1
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repaired = True
+            if stack and stack[-1] == ch:
+                stack.pop()
+            else:
+                repaired = True
+            out.append(ch)
+            if not stack:
+                return "".join(out), repaired
+        else:
+            literal = next((word for word in _LITERALS if text.startswith(word, i)), None) if ch in "TFN" else None
+            if literal:
+                out.append(_LITERALS[literal])
+                i += len(literal)
+                repaired = True
+                continue
+            out.append(ch)
+        i += 1
+
+    # Truncated: drop a dangling key, then close whatever is still open
+    value_started = any(not c.isspace() and c != ":" for c in out[key_end:]) if key_end >= 0 else True
+    if key_start >= 0 and (key_end < 0 or not value_started):
+        del out[key_start:]
+    elif in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out), True
+
+
+def iter_json(text: str, max_candidates: int = 20) -> Iterator[Tuple[Any, bool]]:
+    """Yield every JSON value that parses from LLM output, in order, as `(value, repaired)`.
+
+    Handles fenced code blocks, leading/trailing prose (including stray brackets),
+    several blocks, trailing commas, smart quotes and truncated output.
+
+    Raises:
+        JSONRepairError: If no candidate parses at all.
+    """
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            yield json.loads(stripped), False
+            return
+        except ValueError:
+            pass
+    starts = [i for i, ch in enumerate(text) if ch in "{["][:max_candidates]
+    if not starts:
+        raise JSONRepairError("No JSON object found in output")
+    error: Optional[Exception] = None
+    parsed = False
+    for start in starts:
+        candidate, repaired = _balanced_json(text, start)
+        try:
+            value = json.loads(candidate)
+        except ValueError as e:
+            error = e
+            continue
+        parsed = True
+        yield value, repaired
+    if not parsed:
+        raise JSONRepairError(f"Could not repair JSON: {error}")
+
+
+def extract_json(text: str, max_candidates: int = 20) -> Tuple[Any, bool]:
+    """Parse the first JSON value in LLM output; returns `(value, repaired)`.
+
+    See `iter_json`; the first candidate that parses wins.
+    """
+    return next(iter_json(text, max_candidates))
+
+
+def parse_structured(value: Any, schema: Type[_M]) -> Tuple[_M, bool]:
+    """Coerce a plan output (model, dict or text) into `schema`; returns `(model, repaired)`.
+
+    Text is tried candidate by candidate until one validates, so a bracketed
+    citation in prose ("Per rule [1], ...") doesn't shadow the real object.
+
+    Raises:
+        JSONRepairError: If the value can't be parsed or doesn't validate.
+    """
+    if isinstance(value, schema):
+        return value, False
+    adapter = type_adapter(schema)
+    try:
+        if isinstance(value, str):
+            result, repaired = _first_valid(iter_json(value), adapter)
+        else:
+            if isinstance(value, BaseModel):
+                value = value.model_dump()
+            result, repaired = adapter.validate_python(value), False
+    except (JSONRepairError, ValidationError) as e:
+        json_repair_total.inc(schema=schema.__name__, outcome="failed")
+        raise JSONRepairError(str(e)) from e
+    json_repair_total.inc(schema=schema.__name__, outcome="repaired" if repaired else "clean")
+    return result, repaired
+
+
+def _first_valid(candidates: Iterator[Tuple[Any, bool]], adapter: TypeAdapter) -> Tuple[Any, bool]:
+    error: Optional[ValidationError] = None
+    for candidate, repaired in candidates:
+        try:
+            return adapter.validate_python(candidate), repaired
+        except ValidationError as e:
+            error = error or e
+    # Every candidate parsed but none fit; report the first one's problems
+    raise error
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+
+class LLMBusy(Exception):
+    """Raised when a plan run is not admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    def __init__(self, user_id: str, tokens: int) -> None:
+        self.user_id = user_id
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class LLMGovernor:
+    """Admission control for plan runs against the shared LLM provider.
+
+    A run holds one of `max_concurrent` slots and spends its estimated tokens from a
+    bucket refilled at `tokens_per_minute`. Waiting runs are queued per user and
+    granted round-robin across users, so one user's burst can't starve the others.
+    Runs are rejected with `LLMBusy` straight away when `max_queue` runs are already
+    waiting (or a user already has `max_queue_per_user`) or the bucket can't refill in
+    time for them, and after `max_wait` seconds in the queue, instead of piling up until the provider starts returning 429s.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        tokens_per_minute: int = 1_000_000,
+        max_queue: int = 32,
+        max_queue_per_user: int = 4,
+        max_wait: float = 30.0,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._queued = 0
+        self._queued_tokens = 0
+        self._in_flight = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            float(self.tokens_per_minute),
+            self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60,
+        )
+        self._refilled_at = now
+
+    def _dispatch(self) -> None:
+        """Grant queued tickets round-robin by user while slots and tokens allow."""
+        self._refill(time.monotonic())
+        while self._queues and self._in_flight < self.max_concurrent:
+            user_id, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            if ticket.tokens > self._tokens:
+                return
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._queued -= 1
+            self._queued_tokens -= ticket.tokens
+            self._tokens -= ticket.tokens
+            self._in_flight += 1
+            ticket.granted = True
+        self._cond.notify_all()
+
+    def _retry_after(self) -> int:
+        avg_run = self.run_seconds / self.admitted if self.admitted else 10.0
+        return max(1, int(avg_run * (self._queued + 1) / self.max_concurrent))
+
+    @contextmanager
+    def admit(self, user_id: str, tokens: int) -> Iterator[None]:
+        """Hold an LLM slot and `tokens` of budget for the duration of one plan run."""
+        ticket = _Ticket(user_id, min(tokens, self.tokens_per_minute))
+        with self._cond:
+            user_queue = self._queues.get(user_id)
+            if self._queued >= self.max_queue or (user_queue and len(user_queue) >= self.max_queue_per_user):
+                self.rejected_full += 1
+                raise LLMBusy("LLM queue full", self._retry_after())
+            # Reject now if the token bucket can't cover this run and those ahead of it in time
+            self._refill(time.monotonic())
+            deficit = ticket.tokens + self._queued_tokens - self._tokens
+            token_wait = deficit * 60 / self.tokens_per_minute
+            if token_wait > self.max_wait:
+                self.rejected_full += 1
+                raise LLMBusy("LLM token budget exhausted", max(1, int(token_wait)))
+            self._queues.setdefault(user_id, deque()).append(ticket)
+            self._queued += 1
+            self._queued_tokens += ticket.tokens
+            self._dispatch()
+
+            deadline = ticket.enqueued_at + self.max_wait
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[user_id].remove(ticket)
+                    if not self._queues[user_id]:
+                        del self._queues[user_id]
+                    self._queued -= 1
+                    self._queued_tokens -= ticket.tokens
+                    self.rejected_timeout += 1
+                    self._dispatch()
+                    raise LLMBusy("Timed out waiting for LLM capacity", self._retry_after())
+                # Wake periodically so the token bucket refill is noticed
+                self._cond.wait(timeout=min(remaining, 0.25))
+                if not ticket.granted:
+                    self._dispatch()
+
+            waited = time.monotonic() - ticket.enqueued_at
+            self.admitted += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self.run_seconds += time.monotonic() - started_at
+                self._dispatch()
+
+    def has_idle_capacity(self) -> bool:
+        """True when a run would be admitted straight away without anyone waiting."""
+        with self._cond:
+            return self._in_flight < self.max_concurrent and self._queued == 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "queued_users": len(self._queues),
+                "tokens_available": int(self._tokens),
+                "admitted": self.admitted,
+                "rejected_full": self.rejected_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_wait_ms": self.wait_seconds / self.admitted * 1000 if self.admitted else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+
+_governor: Optional[LLMGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_llm_governor() -> LLMGovernor:
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = LLMGovernor(
+                    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "4")),
+                    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000")),
+                    max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+                    max_queue_per_user=int(os.getenv("LLM_MAX_QUEUE_PER_USER", "4")),
+                    max_wait=float(os.getenv("LLM_MAX_WAIT", "30")),
+                )
+    return _governor
@@ -0,0 +1,80 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from portia import logger
+from portia.model import GenerativeModel, Message
+from pydantic import BaseModel
+
+from helpers.json_repair import parse_structured
+from helpers.model_router import RoutedModel
+from helpers.step_cache import StepCache, cache_key, canonical_json
+
+
+class CachedLLMStep:
+    """An LLM plan step whose result is served from `StepCache` when its inputs repeat.
+
+    Used as a `PlanBuilderV2.function_step` in place of `llm_step`: Portia resolves
+    the `args` references and calls `run(**inputs)`, which builds the prompt from the
+    task and inputs, checks the cache and only then calls the model. With an
+    `output_schema` the model is asked for a structured response (falling back to
+    repairing a text response) and the cached value is re-validated into the schema
+    on a hit. Latency and token counts are recorded by the model, a
+    `helpers.model_router.RoutedModel`. The cache key names the route's primary
+    model, so an answer from its fallback is returned but not cached.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        model: Union[GenerativeModel, RoutedModel],
+        cache: Optional[StepCache] = None,
+        output_schema: Optional[Type[BaseModel]] = None,
+    ) -> None:
+        self.task = task
+        self.model = model
+        self.cache = cache
+        self.output_schema = output_schema
+
+    def prompt(self, inputs: Dict[str, Any]) -> str:
+        lines = [self.task.strip(), "", "Inputs:"]
+        for name, value in inputs.items():
+            text = value if isinstance(value, str) else canonical_json(value)
+            lines.append(f"{name}: {text}")
+        return "\n".join(lines)
+
+    def run(self, **inputs: Any) -> Any:
+        key = cache_key(self.task, str(self.model), inputs)
+        if self.cache is not None:
+            hit, value = self.cache.get(key)
+            if hit:
+                logger().info("LLM step served from cache")
+                return self.output_schema.model_validate(value) if self.output_schema else value
+
+        start = time.perf_counter()
+        prompt = self.prompt(inputs)
+        messages = [Message(role="user", content=prompt)]
+        if self.output_schema is not None:
+            try:
+                result, answered_by = self._call("get_structured_response", messages, self.output_schema)
+            except Exception as e:
+                # Provider-side parsing failed: ask for plain text and repair it locally
+                logger().warning(f"Structured response failed, repairing text response: {e}")
+                response, answered_by = self._call("get_response", messages)
+                result, _ = parse_structured(response.content, self.output_schema)
+            stored = result.model_dump(mode="json")
+        else:
+            response, answered_by = self._call("get_response", messages)
+            result = stored = response.content
+        elapsed = time.perf_counter() - start
+
+        if self.cache is not None:
+            if answered_by == str(self.model):
+                self.cache.set(key, stored, compute_seconds=elapsed)
+            else:
+                logger().info(f"Not caching LLM step answered by fallback model {answered_by}")
+        return result
+
+    def _call(self, method: str, messages: List[Message], *args: Any) -> Tuple[Any, str]:
+        if isinstance(self.model, RoutedModel):
+            return self.model.call(method, messages, *args)
+        return getattr(self.model, method)(messages, *args), str(self.model)
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, List, Optional
+
+from portia import logger
+
+from helpers.supabase_helper import SupabaseHelper
+
+# Terms that make a mail a collaboration candidate; the LLM filter decides the rest.
+COLAB_SEARCH_TERMS = [
+    "collaboration",
+    "collab",
+    "partnership",
+    "sponsorship",
+    "sponsored",
+    "\"brand deal\"",
+    "influencer",
+    "ambassador",
+]
+
+SEARCH_WINDOW = timedelta(days=30)
+# Re-read a little before the watermark so mail delivered late by Gmail isn't missed;
+# anything already stored is dropped before classification anyway.
+WATERMARK_OVERLAP = timedelta(hours=1)
+
+
+def sync_window_start(synced_until: Optional[datetime], rescan: bool, now: Optional[datetime] = None) -> datetime:
+    """Earliest receive time the next sync has to cover.
+
+    A full window on the first sync or when `rescan` is set, otherwise from the stored
+    watermark (minus a small overlap), never further back than the full window.
+    """
+    now = now or datetime.now(timezone.utc)
+    window_start = now - SEARCH_WINDOW
+    if rescan or synced_until is None:
+        return window_start
+    return max(window_start, synced_until - WATERMARK_OVERLAP)
+
+
+def build_search_query(since: datetime) -> str:
+    """Deterministic Gmail query for collaboration mail received after `since`."""
+    terms = " OR ".join(COLAB_SEARCH_TERMS)
+    return f"({terms}) after:{int(since.timestamp())} -in:spam -in:sent -category:promotions"
+
+
+def load_sync_state(supabase: SupabaseHelper, user_id: str) -> Optional[dict]:
+    resp = supabase.client.table("mailbox_sync_state").select(
+        "synced_until, last_received_at"
+    ).eq("user_id", user_id).execute()
+    return resp.data[0] if resp.data else None
+
+
+def save_sync_state(
+    supabase: SupabaseHelper,
+    user_id: str,
+    synced_until: datetime,
+    emails: List[dict],
+) -> None:
+    received = [e.get("received_at") for e in emails if e.get("received_at")]
+    state = {
+        "user_id": user_id,
+        "synced_until": synced_until.isoformat(),
+        "emails_found": len(emails),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if received:
+        state["last_received_at"] = max(received)
+    supabase.client.table("mailbox_sync_state").upsert(state).execute()
+
+
+def load_known_email_ids(supabase: SupabaseHelper, user_id: str, since: datetime) -> List[str]:
+    """Ids of emails already stored for the user that the sync window overlaps."""
+    resp = supabase.client.table("emails").select("email_id").eq(
+        "user_id", user_id
+    ).gte("received_at", since.isoformat()).execute()
+    return [row["email_id"] for row in resp.data or []]
+
+
+# Stored columns `/search-emails` returns; `summary` is served as the item's `snippet`
+STORED_EMAIL_COLUMNS = (
+    "email_id, from_name, from_email, subject, summary, received_at, thread_link, labels, tags, "
+    "relevance_score, confidence, first_received, last_received, ui_actions, notes"
+)
+
+
+def load_stored_emails(supabase: SupabaseHelper, user_id: str, limit: int = 200) -> List[dict]:
+    """Emails of the search window already stored for the user, shaped like search results."""
+    since = datetime.now(timezone.utc) - SEARCH_WINDOW
+    rows = supabase.client.table("emails").select(STORED_EMAIL_COLUMNS).eq(
+        "user_id", user_id
+    ).gte("received_at", since.isoformat()).order("received_at", desc=True).limit(limit).execute().data or []
+    for row in rows:
+        row["snippet"] = row.pop("summary", None) or ""
+    return rows
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _message_id(message: Any) -> Optional[str]:
+    if isinstance(message, dict):
+        for key in ("id", "message_id", "email_id"):
+            if message.get(key):
+                return str(message[key])
+    return None
+
+
+def drop_known_emails(search_results: Any, known_email_ids: Optional[Iterable[str]] = None) -> Any:
+    """Plan function step: remove search hits that are already stored in `emails`.
+
+    The Gmail tool may return a list of message dicts or the same list as JSON text;
+    anything else is passed through untouched so the LLM step still sees it.
+    """
+    known = set(known_email_ids or [])
+    if not known:
+        return search_results
+
+    results = search_results
+    if isinstance(results, str):
+        try:
+            results = json.loads(results)
+        except ValueError:
+            return search_results
+    if not isinstance(results, list):
+        return search_results
+
+    fresh = [m for m in results if _message_id(m) not in known]
+    logger().info(f"Dropped {len(results) - len(fresh)} already stored emails, {len(fresh)} new")
+    return fresh
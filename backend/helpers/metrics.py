@@ -0,0 +1,237 @@
+import bisect
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+
+# Seconds; spans a cached lookup (~1ms) to a slow LLM step (~1min)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_LabelKey = Tuple[str, ...]
+_M = TypeVar("_M", bound="_Metric")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> _LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._series: Dict[_LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _M) -> _M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+plan_step_seconds = registry.register(Histogram(
+    "kyodo_plan_step_seconds", "Plan step latency in seconds.", ("plan", "step")
+))
+plan_run_seconds = registry.register(Histogram(
+    "kyodo_plan_run_seconds", "Whole plan run latency in seconds.", ("plan",)
+))
+runs_in_flight = registry.register(Gauge(
+    "kyodo_runs_in_flight", "Plan runs currently executing.", ("plan",)
+))
+supabase_request_seconds = registry.register(Histogram(
+    "kyodo_supabase_request_seconds", "Supabase PostgREST request latency in seconds.", ("table", "operation", "status")
+))
+auth_seconds = registry.register(Histogram(
+    "kyodo_auth_seconds", "AuthMiddleware token verification latency in seconds.", ("result",)
+))
+llm_tokens = registry.register(Counter(
+    "kyodo_llm_tokens_total", "Estimated LLM tokens sent and received, per model.", ("model", "direction")
+))
+
+
+_REST_PATH = re.compile(r"/rest/v1/(?:rpc/)?([^/?]+)")
+
+
+def _operation(request: httpx.Request) -> str:
+    if request.method == "GET" or request.method == "HEAD":
+        return "select"
+    if request.method == "POST":
+        if "/rpc/" in request.url.path:
+            return "rpc"
+        return "upsert" if "resolution=" in request.headers.get("prefer", "") else "insert"
+    return {"PATCH": "update", "DELETE": "delete"}.get(request.method, request.method.lower())
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """httpx transport wrapper that times every PostgREST call by table and operation.
+
+    Latency is measured to response headers; bodies are still streamed by the caller.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        match = _REST_PATH.search(request.url.path)
+        table = match.group(1) if match else "other"
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self._transport.handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            supabase_request_seconds.observe(
+                time.perf_counter() - start, table=table, operation=_operation(request), status=status
+            )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def step_label(step: object, default: Optional[str] = None) -> str:
+    """Stable label for a plan step: its output or step name, else `default`."""
+    for attr in ("output", "step_name"):
+        value = getattr(step, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return default or type(step).__name__
+
+
+def track_run(plan: str) -> "_RunTracker":
+    return _RunTracker(plan)
+
+
+class _RunTracker:
+    def __init__(self, plan: str) -> None:
+        self.plan = plan
+
+    def __enter__(self) -> "_RunTracker":
+        runs_in_flight.inc(plan=self.plan)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        runs_in_flight.dec(plan=self.plan)
+        plan_run_seconds.observe(time.perf_counter() - self.start, plan=self.plan)
+
+
+def record_tokens(model: Optional[str], sent: int, received: int) -> None:
+    model = model or "unknown"
+    llm_tokens.inc(sent, model=model, direction="prompt")
+    llm_tokens.inc(received, model=model, direction="completion")
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from portia import Config, logger
+from portia.model import GenerativeModel, Message
+from pydantic import BaseModel
+
+from helpers.metrics import Counter, Histogram, record_tokens, registry
+from helpers.tokens import estimate_tokens
+
+model_call_seconds = registry.register(Histogram(
+    "kyodo_model_call_seconds", "Routed LLM call latency in seconds.", ("route", "model", "outcome")
+))
+model_route_tokens = registry.register(Counter(
+    "kyodo_model_route_tokens_total", "Estimated LLM tokens sent and received, per route.", ("route", "model", "direction")
+))
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    model: str
+    fallback: Optional[str] = None
+
+
+DEFAULT_TIERS: Dict[str, ModelTier] = {
+    "fast": ModelTier("google/gemini-2.0-flash-lite", fallback="google/gemini-2.0-flash"),
+    "standard": ModelTier("google/gemini-2.0-flash", fallback="google/gemini-2.0-flash-lite"),
+    "quality": ModelTier("google/gemini-2.5-pro", fallback="google/gemini-2.0-flash"),
+}
+DEFAULT_TIER = "standard"
+
+# Route names are "<plan>.<step>" for plan steps and "task.<PortiaTask name>" for
+# `run_task`. A suggested split, opt-in through MODEL_ROUTES: classification,
+# parsing and bookkeeping steps on the fast tier, and the contract/reply drafting
+# step (the one the creator actually reads) on the quality tier.
+TIERED_ROUTES: Dict[str, str] = {
+    "search_colab_emails.filter": "fast",
+    "search_colab_emails.structure": "standard",
+    "start_colab_process.parse": "fast",
+    "start_colab_process.analyze": "standard",
+    "start_colab_process.decide": "standard",
+    "start_colab_process.calendar": "fast",
+    "start_colab_process.workflow": "quality",
+    "start_colab_process.structure": "standard",
+    "start_colab_process.summary": "fast",
+    "task.SEARCH_COLAB_EMAILS": "standard",
+    "task.START_COLAB_PROCESS": "quality",
+}
+# Every route stays on the standard tier (gemini-2.0-flash) unless MODEL_ROUTES says otherwise
+DEFAULT_ROUTES: Dict[str, str] = {route: DEFAULT_TIER for route in TIERED_ROUTES}
+
+
+def resolve_portia_model(name: str) -> GenerativeModel:
+    """Portia's model for a "provider/model" id, with the provider keys from the environment."""
+    return Config.from_default(default_model=name).get_default_model()
+
+
+@dataclass
+class _RouteStats:
+    calls: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class RoutedModel:
+    """`GenerativeModel` stand-in for one route: the route's model, then its fallback.
+
+    A call that raises on the primary model is retried once on the fallback. Every
+    attempt is timed into `kyodo_model_call_seconds` and the answering model's
+    estimated tokens are recorded, so per-step cost and latency can be compared
+    across tiers. `str()` is the primary model, which is what step cache keys use;
+    `call` also says which model answered, so fallback answers can stay uncached.
+    """
+
+    def __init__(self, router: "ModelRouter", route: str, models: List[Tuple[str, GenerativeModel]]) -> None:
+        self.router = router
+        self.route = route
+        self.models = models
+
+    def __str__(self) -> str:
+        return self.models[0][0]
+
+    def call(self, method: str, messages: List[Message], *args: Any) -> Tuple[Any, str]:
+        """Run `method` ("get_response" or "get_structured_response"); returns `(result, model name)`."""
+        last_error: Optional[Exception] = None
+        for attempt, (name, model) in enumerate(self.models):
+            start = time.perf_counter()
+            try:
+                result = getattr(model, method)(messages, *args)
+            except Exception as e:
+                self.router.record(self.route, name, time.perf_counter() - start, "error")
+                if attempt + 1 < len(self.models):
+                    logger().warning(f"Model {name} failed on {self.route}, falling back to {self.models[attempt + 1][0]}: {e}")
+                last_error = e
+                continue
+            answer = result.model_dump(mode="json") if isinstance(result, BaseModel) else result.content
+            self.router.record(
+                self.route,
+                name,
+                time.perf_counter() - start,
+                "fallback" if attempt else "ok",
+                sent=estimate_tokens([m.content for m in messages]),
+                received=estimate_tokens(answer),
+            )
+            return result, name
+        raise last_error
+
+    def get_response(self, messages: List[Message]) -> Message:
+        return self.call("get_response", messages)[0]
+
+    def get_structured_response(self, messages: List[Message], schema: Type[BaseModel]) -> BaseModel:
+        return self.call("get_structured_response", messages, schema)[0]
+
+
+class ModelRouter:
+    """Maps plan steps and tasks to model tiers.
+
+    `routes` maps a route name to a tier name or directly to a "provider/model" id;
+    unknown routes use `default_tier`. Resolved models are shared by every engine,
+    and `resolve` is the only place a provider is touched, so tests and benchmarks
+    pass stub models with their own latencies.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, ModelTier]] = None,
+        routes: Optional[Dict[str, str]] = None,
+        resolve: Callable[[str], GenerativeModel] = resolve_portia_model,
+        default_tier: str = DEFAULT_TIER,
+    ) -> None:
+        self.tiers = dict(tiers or DEFAULT_TIERS)
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.resolve = resolve
+        self.default_tier = default_tier
+        self._models: Dict[str, GenerativeModel] = {}
+        self._stats: Dict[Tuple[str, str], _RouteStats] = {}
+        self._lock = threading.Lock()
+        for route, target in self.routes.items():
+            if target not in self.tiers and "/" not in target:
+                logger().warning(f"Route {route} names unknown tier {target!r}, using {self.default_tier}")
+
+    def tier(self, route: str) -> ModelTier:
+        target = self.routes.get(route, self.default_tier)
+        if target in self.tiers:
+            return self.tiers[target]
+        if "/" in target:
+            return ModelTier(target, fallback=self.tiers[self.default_tier].model)
+        return self.tiers[self.default_tier]
+
+    def model_names(self, route: str) -> List[str]:
+        tier = self.tier(route)
+        return [tier.model] + ([tier.fallback] if tier.fallback and tier.fallback != tier.model else [])
+
+    def _resolved(self, name: str) -> GenerativeModel:
+        with self._lock:
+            model = self._models.get(name)
+        if model is None:
+            model = self.resolve(name)
+            with self._lock:
+                model = self._models.setdefault(name, model)
+        return model
+
+    def model(self, route: str) -> RoutedModel:
+        return RoutedModel(self, route, [(name, self._resolved(name)) for name in self.model_names(route)])
+
+    def record(
+        self, route: str, model: str, seconds: float, outcome: str, sent: int = 0, received: int = 0
+    ) -> None:
+        """Account one call; `run_task` uses this directly for whole Portia runs."""
+        model_call_seconds.observe(seconds, route=route, model=model, outcome=outcome)
+        if outcome != "error":
+            record_tokens(model, sent, received)
+            model_route_tokens.inc(sent, route=route, model=model, direction="prompt")
+            model_route_tokens.inc(received, route=route, model=model, direction="completion")
+        with self._lock:
+            stats = self._stats.setdefault((route, model), _RouteStats())
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.errors += outcome == "error"
+            stats.fallbacks += outcome == "fallback"
+            stats.prompt_tokens += sent
+            stats.completion_tokens += received
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = [
+                {
+                    "route": route,
+                    "model": model,
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "fallbacks": s.fallbacks,
+                    "avg_seconds": round(s.seconds / s.calls, 3) if s.calls else None,
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                }
+                for (route, model), s in sorted(self._stats.items())
+            ]
+        return {
+            "tiers": {name: {"model": t.model, "fallback": t.fallback} for name, t in self.tiers.items()},
+            "routes": {route: self.model_names(route) for route in sorted(self.routes)},
+            "calls": calls,
+        }
+
+
+def tiers_from_env(tiers: Optional[Dict[str, ModelTier]] = None) -> Dict[str, ModelTier]:
+    """Tiers with MODEL_TIER_<NAME>="model[,fallback]" overrides applied (new names add tiers)."""
+    tiers = dict(tiers or DEFAULT_TIERS)
+    for key, value in os.environ.items():
+        if key.startswith("MODEL_TIER_") and value.strip():
+            model, _, fallback = value.partition(",")
+            tiers[key[len("MODEL_TIER_"):].lower()] = ModelTier(model.strip(), fallback.strip() or None)
+    return tiers
+
+
+def routes_from_env(routes: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Routes with the MODEL_ROUTES JSON object (route name -> tier or model id) merged over them."""
+    routes = dict(DEFAULT_ROUTES if routes is None else routes)
+    raw = os.getenv("MODEL_ROUTES")
+    if raw:
+        try:
+            routes.update(json.loads(raw))
+        except (TypeError, ValueError) as e:
+            logger().warning(f"Ignoring invalid MODEL_ROUTES: {e}")
+    return routes
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide router, configured by MODEL_TIER_* and MODEL_ROUTES."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(tiers=tiers_from_env(), routes=routes_from_env())
+    return _router
@@ -0,0 +1,148 @@
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from portia import Input, StepOutput, logger
+
+from helpers.metrics import plan_step_seconds, step_label
+
+
+class PlanRunner:
+    """Runs `PlanBuilderV2` plans of function steps as a dependency graph.
+
+    Dependencies come from the `Input`/`StepOutput` references in each step's `args`
+    (or `inputs` for builder steps that declare them), so steps that don't read each
+    other run concurrently, up to `max_concurrency` at a time. Every step receives
+    exactly the values it declared, so results match sequential execution and wall
+    time tracks the plan's critical path rather than the sum of its steps.
+
+    Only plans whose steps are all function steps are supported (`supports()`); tool
+    and agent steps still need `Portia.run_plan`.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None) -> None:
+        self.max_concurrency = max_concurrency or int(os.getenv("PLAN_STEP_CONCURRENCY", "3"))
+
+    @staticmethod
+    def supports(plan: Any) -> bool:
+        return all(callable(getattr(step, "function", None)) for step in plan.steps)
+
+    @staticmethod
+    def _references(value: Any) -> List[Any]:
+        if isinstance(value, (StepOutput, Input)):
+            return [value]
+        if isinstance(value, dict):
+            return [ref for v in value.values() for ref in PlanRunner._references(v)]
+        if isinstance(value, (list, tuple)):
+            return [ref for v in value for ref in PlanRunner._references(v)]
+        return []
+
+    @staticmethod
+    def _step_index(plan: Any, step_ref: Any) -> int:
+        if isinstance(step_ref, int):
+            return step_ref if step_ref >= 0 else len(plan.steps) + step_ref
+        for index, step in enumerate(plan.steps):
+            if getattr(step, "step_name", None) == step_ref:
+                return index
+        raise ValueError(f"Unknown step reference: {step_ref}")
+
+    @classmethod
+    def dependencies(cls, plan: Any) -> List[Set[int]]:
+        """For each step, the indexes of the steps whose outputs it reads."""
+        deps: List[Set[int]] = []
+        for index, step in enumerate(plan.steps):
+            declared = getattr(step, "args", None) or getattr(step, "inputs", None) or {}
+            step_deps = {
+                cls._step_index(plan, ref.step)
+                for ref in cls._references(declared)
+                if isinstance(ref, StepOutput)
+            }
+            if any(dep >= index for dep in step_deps):
+                raise ValueError(f"Step {index} depends on a later step")
+            deps.append(step_deps)
+        return deps
+
+    def _resolve(self, plan: Any, value: Any, inputs: Dict[str, Any], outputs: Dict[int, Any]) -> Any:
+        if isinstance(value, StepOutput):
+            return outputs[self._step_index(plan, value.step)]
+        if isinstance(value, Input):
+            return inputs[value.name]
+        if isinstance(value, dict):
+            return {k: self._resolve(plan, v, inputs, outputs) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(plan, v, inputs, outputs) for v in value]
+        return value
+
+    @staticmethod
+    def _timed(name: str, index: int, step: Any, args: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return step.function(**args)
+        finally:
+            plan_step_seconds.observe(
+                time.perf_counter() - start, plan=name, step=step_label(step, f"step_{index}")
+            )
+
+    def run(
+        self,
+        plan: Any,
+        plan_run_inputs: Dict[str, Any],
+        on_step: Optional[Callable[[int, Any, Any], None]] = None,
+        completed: Optional[Dict[int, Any]] = None,
+        name: str = "plan",
+    ) -> Dict[int, Any]:
+        """Execute the plan and return every step's output keyed by step index.
+
+        `on_step(index, step, output)` is called on the calling thread as each step
+        finishes. Outputs in `completed` are taken as already produced and those
+        steps are not run. Step latencies are recorded under the plan `name`.
+        """
+        if not self.supports(plan):
+            raise ValueError("PlanRunner only runs plans made of function steps")
+
+        inputs = {
+            plan_input.name: getattr(plan_input, "default_value", None)
+            for plan_input in getattr(plan, "plan_inputs", [])
+        }
+        inputs.update(plan_run_inputs)
+        deps = self.dependencies(plan)
+        outputs: Dict[int, Any] = dict(completed or {})
+        pending = [i for i in range(len(plan.steps)) if i not in outputs]
+        running: Dict[Future, int] = {}
+        started_at = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="kyodo-step") as executor:
+            while pending or running:
+                for index in [i for i in pending if deps[i].issubset(outputs)]:
+                    if len(running) >= self.max_concurrency:
+                        break
+                    pending.remove(index)
+                    step = plan.steps[index]
+                    args = self._resolve(plan, getattr(step, "args", None) or {}, inputs, outputs)
+                    # Each step gets its own copy of the caller's context so run-scoped
+                    # ContextVars (msg_id, supabase client) are visible in worker threads
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, self._timed, name, index, step, args)] = index
+
+                if not running:
+                    raise ValueError("Plan has unsatisfiable step dependencies")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        outputs[index] = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    if on_step is not None:
+                        on_step(index, plan.steps[index], outputs[index])
+
+        logger().info(
+            f"Plan finished {len(plan.steps) - len(completed or {})} steps in "
+            f"{time.perf_counter() - started_at:.2f}s"
+        )
+        return outputs
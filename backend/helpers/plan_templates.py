@@ -0,0 +1,148 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from portia import Input, StepOutput, logger
+
+from helpers.step_cache import canonical_json
+
+
+@dataclass(frozen=True)
+class PlanTemplate:
+    """A plan built once and shared by every run; runs only bring `plan_run_inputs`.
+
+    `version` is "<name>@<revision>.<fingerprint>": the revision is bumped by hand
+    when a plan changes meaning, the fingerprint changes with any prompt, schema,
+    step wiring or routed model, so a stored version identifies exactly what ran.
+    """
+
+    name: str
+    version: str
+    plan: Any
+    build_seconds: float
+
+
+def _reference_json(value: Any) -> Any:
+    if isinstance(value, StepOutput):
+        return {"step_output": value.step}
+    if isinstance(value, Input):
+        return {"input": value.name}
+    if isinstance(value, dict):
+        return {k: _reference_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_reference_json(v) for v in value]
+    return value
+
+
+def _schema_json(schema: Any) -> Any:
+    return schema.model_json_schema() if hasattr(schema, "model_json_schema") else None
+
+
+def _describe_step(step: Any) -> Dict[str, Any]:
+    function = getattr(step, "function", None)
+    # Cached LLM steps are bound `CachedLLMStep.run` methods
+    owner = getattr(function, "__self__", None)
+    return {
+        "type": type(step).__name__,
+        "function": getattr(function, "__qualname__", None),
+        "task": getattr(owner, "task", None) or getattr(step, "task", None),
+        "model": str(owner.model) if hasattr(owner, "model") else None,
+        "output_schema": _schema_json(getattr(owner, "output_schema", None) or getattr(step, "output_schema", None)),
+        "tool": getattr(step, "tool", None),
+        "args": _reference_json(getattr(step, "args", None) or getattr(step, "inputs", None)),
+    }
+
+
+def plan_fingerprint(plan: Any) -> str:
+    """Hash of everything that decides what a plan does, independent of object identity."""
+    description = {
+        "inputs": [getattr(p, "name", None) for p in getattr(plan, "plan_inputs", [])],
+        "steps": [_describe_step(step) for step in plan.steps],
+        "final_output_schema": _schema_json(getattr(plan, "final_output_schema", None)),
+        "summarize": getattr(plan, "summarize", False),
+    }
+    return hashlib.sha256(canonical_json(description).encode()).hexdigest()
+
+
+class PlanTemplateRegistry:
+    """Named plan builders, each built once into a versioned `PlanTemplate`.
+
+    Builders are registered at import by the modules that own the plans and built
+    at startup (`build_all()`) or on first `get()`. `reset()` drops the built
+    templates so the next `get()` rebuilds them, e.g. after the model routes change.
+    """
+
+    def __init__(self) -> None:
+        self._builders: Dict[str, Tuple[int, Callable[[], Any]]] = {}
+        self._templates: Dict[str, PlanTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, revision: int, build: Callable[[], Any]) -> None:
+        with self._lock:
+            self._builders[name] = (revision, build)
+            self._templates.pop(name, None)
+
+    def _build(self, name: str) -> PlanTemplate:
+        revision, build = self._builders[name]
+        start = time.perf_counter()
+        plan = build()
+        template = PlanTemplate(
+            name=name,
+            version=f"{name}@{revision}.{plan_fingerprint(plan)[:12]}",
+            plan=plan,
+            build_seconds=time.perf_counter() - start,
+        )
+        logger().info(f"Built plan template {template.version} in {template.build_seconds * 1000:.1f}ms")
+        return template
+
+    def get(self, name: str) -> PlanTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None:
+                    if name not in self._builders:
+                        raise KeyError(f"No plan template registered as {name!r}")
+                    template = self._templates[name] = self._build(name)
+        return template
+
+    def build_all(self) -> int:
+        """Build every registered template not built yet. Returns the number built."""
+        with self._lock:
+            missing = [name for name in self._builders if name not in self._templates]
+        for name in missing:
+            self.get(name)
+        return len(missing)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            templates = dict(self._templates)
+            names = list(self._builders)
+        return {
+            name: {
+                "version": templates[name].version,
+                "steps": len(templates[name].plan.steps),
+                "build_ms": round(templates[name].build_seconds * 1000, 2),
+            } if name in templates else None
+            for name in names
+        }
+
+
+_registry: Optional[PlanTemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_plan_templates() -> PlanTemplateRegistry:
+    """Return the process-wide plan template registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PlanTemplateRegistry()
+    return _registry
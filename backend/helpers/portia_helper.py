@@ -1,7 +1,12 @@
+import time
 import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from enum import Enum
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Type, Union
 
 from portia import (
     Config,
@@ -21,10 +26,26 @@ from portia import (
 )
 from portia.cli import CLIExecutionHooks
 from portia.end_user import EndUser
+from pydantic import BaseModel
 from supabase_auth import User
 
+from helpers.action_writer import get_action_writer
+from helpers.compaction import CompactionStats, get_compactor, record_compaction
+from helpers.email_prefilter import EmailPrefilter
+from helpers.json_repair import JSONRepairError, json_repair_total
+from helpers.llm_step import CachedLLMStep
+from helpers.mailbox_sync import drop_known_emails
+from helpers.metrics import plan_step_seconds, step_label, track_run
+from helpers.model_router import get_model_router
+from helpers.plan_runner import PlanRunner
+from helpers.plan_templates import PlanTemplate, get_plan_templates
+from helpers.run_checkpoints import RunCheckpoint, restore_outputs, save_checkpoint, save_run_inputs
+from helpers.run_events import get_run_event_broker
 from helpers.schemas import SearchColabEmailsResponse, StartColabProcessResponse
+from helpers.step_cache import get_step_cache
 from helpers.supabase_helper import SupabaseHelper
+from helpers.thread_state import ThreadState, start_process_inputs
+from helpers.tokens import estimate_tokens
 
 
 class PortiaTask(Enum):
@@ -146,6 +167,298 @@ class PortiaTask(Enum):
     )
 
 
+@dataclass
+class RunContext:
+    """Per-run state read by the execution hooks.
+
+    Engines are shared between requests (see `helpers.portia_pool`), so anything that
+    belongs to a single plan run lives here instead of on the helper instance.
+    """
+
+    msg_id: Optional[str] = None
+    save_actions: bool = False
+    supabase_helper: Optional[SupabaseHelper] = None
+    plan: str = "task"
+    # When the previous step finished; Portia's hooks only fire after a step
+    last_step_at: float = field(default_factory=time.perf_counter)
+    compaction: CompactionStats = field(default_factory=CompactionStats)
+    prefilter: Optional[EmailPrefilter] = None
+
+
+_current_run: ContextVar[Optional[RunContext]] = ContextVar("portia_run_context", default=None)
+
+
+def cached_llm_step(task: str, route: str, output_schema: Optional[Type[BaseModel]] = None) -> CachedLLMStep:
+    """LLM step for `PlanBuilderV2.function_step` whose results go through the step cache.
+
+    `route` ("<plan>.<step>") picks the model tier from the routing table.
+    """
+    return CachedLLMStep(
+        task=task,
+        model=get_model_router().model(route),
+        cache=get_step_cache(),
+        output_schema=output_schema,
+    )
+
+
+def compact_llm_input(value: Any) -> Any:
+    """Plan function step: strip quoted history, signatures, boilerplate and long URLs
+    from email content before any LLM step reads it; savings go to the run's stats."""
+    run = _current_run.get()
+    return get_compactor().compact(value, run.compaction if run else None)
+
+
+def prefilter_split(messages: Any) -> Dict[str, Any]:
+    """Plan function step: score search hits with the run's `EmailPrefilter`."""
+    run = _current_run.get()
+    prefilter = run.prefilter if run and run.prefilter else EmailPrefilter()
+    return prefilter.split(messages)
+
+
+# Plans are built once into `helpers.plan_templates` and shared by every engine and
+# run, so steps may only close over process-wide objects; per-run state is read
+# from the run context. Bump a template's revision when its behaviour changes.
+def build_search_colab_emails_plan() -> Any:
+    """Search plan: Gmail search, known-email and prefilter steps, then the routed LLM filter and structuring."""
+    return (
+        PlanBuilderV2("Search collaboration emails since the last sync")
+        .input(
+            name="context", 
+            description="End user details and preferences and other context"
+        )
+        .input(
+            name="query",
+            description="Gmail search query covering the mail received since the last sync"
+        )
+        .input(
+            name="known_email_ids",
+            description="Ids of emails already classified and stored for the user"
+        )
+        .invoke_tool_step(
+            tool="portia:google:gmail:search_email",
+            args={
+                "query": Input("query")
+            }
+        )
+        .function_step(
+            function=drop_known_emails,
+            args={
+                "search_results": StepOutput(0),
+                "known_email_ids": Input("known_email_ids")
+            }
+        )
+        .function_step(
+            function=compact_llm_input,
+            args={
+                "value": StepOutput(1)
+            }
+        )
+        .function_step(
+            function=prefilter_split,
+            args={
+                "messages": StepOutput(2)
+            }
+        )
+        .function_step(
+            function=EmailPrefilter.uncertain,
+            args={
+                "split_result": StepOutput(3)
+            }
+        )
+        .function_step(
+            function=EmailPrefilter.fast_tracked,
+            args={
+                "split_result": StepOutput(3)
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="Analyze the email search results and filter out only genuine collaboration, brand deal, or partnership requests. Exclude newsletters, automated emails, and emails where the user is the sender. Focus on emails with explicit intent to propose deals or collaborations. PERSIST THE INFORMATION ABOUT THE EMAILS.",
+                route="search_colab_emails.filter"
+            ).run,
+            args={
+                "search_results": StepOutput(4),
+                "context": Input("context")
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="""Structure the filtered collaboration emails, plus every fast-tracked email (already confirmed as collaboration requests, include them all), into the required JSON schema with all fields: email_id, from_name, from_email, subject, snippet, received_at, thread_link, labels, tags, relevance_score, confidence, first_received, last_received, ui_actions, notes, and summary statistics. Structure the output as a list of email items like this: {
+                "emails": [
+                    {
+                        "email_id": "string", # unique id of the email received from google's search email tool
+                        "from_name": "string",
+                        "from_email": "string",
+                        "subject": "string",
+                        "snippet": "string", # short text preview (1-2 lines)
+                        "received_at": "ISO8601 string",
+                        "thread_link": "string (permalink)",
+                        "labels": ["brand","offer","sponsored","negotiation"],
+                        "tags": ["optional category tags"],
+                        "relevance_score": 0-1, # how likely this is a colab offer
+                        "confidence": 0-1, # model confidence in parsing
+                        "first_received": "ISO8601 string",
+                        "last_received": "ISO8601 string",
+                        "ui_actions": ["start_colab_process"],
+                        "notes": "string (optional parsed notes)"
+                    }
+                ],
+                "summary": {
+                    "total_found": 0,
+                    "by_label": { "brand": 0, "offer": 0, "sponsored": 0 },
+                    "top_senders": [{ "email": "", "count": 0 }]
+                }
+            }""",
+                route="search_colab_emails.structure",
+                output_schema=SearchColabEmailsResponse
+            ).run,
+            args={
+                "search_results": StepOutput(4),
+                "filtered_emails": StepOutput(6),
+                "fast_tracked_emails": StepOutput(5),
+                "context": Input("context")
+            }
+        )
+        .final_output(
+            output_schema=SearchColabEmailsResponse,
+            summarize=True
+        )
+        .build()
+    )
+
+
+def build_start_colab_process_plan(follow_up: bool) -> Any:
+    """Start-process plan; the follow-up variant updates the previous run's outputs from new thread messages."""
+    builder = PlanBuilderV2("Analyze collaboration email and decide on next actions").input(
+        name="user_preferences",
+        description="User preferences including budget, terms, and collaboration requirements"
+    )
+    if follow_up:
+        builder = (
+            builder
+            .input(
+                name="previous_email_parsed",
+                description="Collaboration details parsed by the previous run on this thread"
+            )
+            .input(
+                name="previous_analysis",
+                description="Preference analysis from the previous run on this thread"
+            )
+            .input(
+                name="new_messages",
+                description="Thread messages received since the previous run"
+            )
+        )
+        source_args = {
+            "previous_email_parsed": Input("previous_email_parsed"),
+            "new_messages": Input("new_messages")
+        }
+        parse_task = "Update the previously parsed collaboration details with the new messages in the thread: keep what still holds, apply changed or added terms (compensation, deliverables, exclusivity, deadlines, attachments) and return the full parsed details: sender info, brand, subject, offer summary, proposed deliverables, compensation terms, exclusivity, deadlines, attachments, thread link, and received timestamp."
+        analysis_args = {"previous_analysis": Input("previous_analysis")}
+    else:
+        builder = builder.input(
+            name="email_data",
+            description="Selected email data with content, metadata, and thread information"
+        )
+        source_args = {"email_data": Input("email_data")}
+        parse_task = "Parse the email content and extract key collaboration details: sender info, brand, subject, offer summary, proposed deliverables, compensation terms, exclusivity, deadlines, attachments, thread link, and received timestamp."
+        analysis_args = {}
+
+    return (
+        builder
+        .function_step(
+            function=cached_llm_step(task=parse_task, route="start_colab_process.parse").run,
+            args=source_args
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="Analyze the parsed email against user preferences. Compare budget requirements, exclusivity terms, timeline limits, and deliverable formats. Determine fit level (high/medium/low), note relevance, identify missing information, and flag any risks. If a previous analysis is given, note what changed and why.",
+                route="start_colab_process.analyze"
+            ).run,
+            args={
+                "email_parsed": StepOutput(0),
+                "user_preferences": Input("user_preferences"),
+                **analysis_args
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="Based on the analysis, decide the next action: 'ready_to_proceed' if all requirements match well, 'need_clarification' if missing key info, or 'reject' if poor fit. Provide confidence score and rationale.",
+                route="start_colab_process.decide"
+            ).run,
+            args={
+                "email_parsed": StepOutput(0),
+                "analysis": StepOutput(1)
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="Create calendar event for collaboration follow-up using Google Calendar. Schedule a 30-minute meeting for tomorrow at 2pm to discuss the collaboration opportunity.",
+                route="start_colab_process.calendar"
+            ).run,
+            args={
+                "email_parsed": StepOutput(0)
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="""Based on the decision from step 2, handle the appropriate workflow:
+
+            IF next_action is 'ready_to_proceed':
+            - Draft a comprehensive contract including summary terms, payment terms, deliverables, milestones, timeline, acceptance criteria, and basic clauses (IP, termination, exclusivity)
+            - Draft a professional reply email suggesting the contract
+            - Set UI actions: ["preview_contract", "send_contract_and_email", "save_draft", "schedule_meeting", "edit_terms"]
+
+            IF next_action is 'need_clarification':
+            - Generate specific clarifying questions targeting missing or ambiguous information
+            - Draft a professional reply requesting clarifications and propose provisional terms if appropriate
+            - Create a contract draft skeleton for iteration
+            - Set UI actions: ["send_questions", "save_draft", "escalate_to_human"]
+
+            IF next_action is 'reject':
+            - Draft a polite, professional decline email explaining reasons for rejection
+            - Optionally suggest alternatives or future opportunities
+            - Set UI actions: ["send_decline", "save_note"]
+
+            Include autonomous actions list (calendar event creation) and clear assumptions for all cases.""",
+                route="start_colab_process.workflow"
+            ).run,
+            args={
+                "email_parsed": StepOutput(0),
+                "analysis": StepOutput(1),
+                "decision": StepOutput(2),
+                "calendar_event": StepOutput(3)
+            }
+        )
+        .function_step(
+            function=cached_llm_step(
+                task="Structure all outputs into the final JSON schema including email_parsed, analysis, next_action, confidence_score, suggested_reply, contract details, clarifying questions, autonomous actions (calendar event), assumptions, and next steps.",
+                route="start_colab_process.structure",
+                output_schema=StartColabProcessResponse
+            ).run,
+            args={
+                "email_parsed": StepOutput(0),
+                "analysis": StepOutput(1),
+                "decision": StepOutput(2),
+                "calendar_event": StepOutput(3),
+                "workflow": StepOutput(4),
+                "user_preferences": Input("user_preferences"),
+                **source_args
+            }
+        )
+        .final_output(
+            output_schema=StartColabProcessResponse,
+            summarize=True
+        )
+        .build()
+    )
+
+
+get_plan_templates().register("search_colab_emails", 1, build_search_colab_emails_plan)
+get_plan_templates().register("start_colab_process", 1, lambda: build_start_colab_process_plan(follow_up=False))
+get_plan_templates().register("start_colab_process.follow_up", 1, lambda: build_start_colab_process_plan(follow_up=True))
+
+
 class PortiaHelper:
     """Thin helper around Portia SDK to run common tasks used by the backend.
 
@@ -163,37 +476,116 @@ class PortiaHelper:
     ) -> None:
         load_dotenv(override=True)
 
-        self._save_actions = False
-        self._msg_id = None
+        # Routed steps pick their own model (see `helpers.model_router`); the default
+        # tier covers what Portia runs itself, like final output summaries
+        router = get_model_router()
+        default_model = router.tiers[router.default_tier].model
+        self.storage_class = storage_class
         self.config = Config.from_default(
-            default_model="google/gemini-2.0-flash", 
+            default_model=default_model,
             storage_class=storage_class
         )
-        self.supabase_helper = supabase_helper or SupabaseHelper()
-        self.current_msg_id = None  # TODO: Will be set when running tasks
+        self.plan_runner = PlanRunner()
+        # Default client for runs that don't bring their own; created lazily so pooled
+        # engines don't each open a Supabase client they never use.
+        self.supabase_helper = supabase_helper
+        self.tools = PortiaToolRegistry(config=self.config)
         self.portia = Portia(
             config=self.config,
-            tools=PortiaToolRegistry(config=self.config),
+            tools=self.tools,
             execution_hooks=CLIExecutionHooks(
                 after_step_execution=self.log_after_step_in_db
             ),
         )
+        # Portia instances per model for routed `run_task` calls, built on first use
+        self._task_engines: Dict[str, Portia] = {default_model: self.portia}
+
+    def _task_engine(self, model: str) -> Portia:
+        """Portia instance whose default model is `model`, sharing this engine's tools and hooks."""
+        engine = self._task_engines.get(model)
+        if engine is None:
+            config = Config.from_default(default_model=model, storage_class=self.storage_class)
+            engine = self._task_engines[model] = Portia(
+                config=config,
+                tools=self.tools,
+                execution_hooks=CLIExecutionHooks(
+                    after_step_execution=self.log_after_step_in_db
+                ),
+            )
+        return engine
+
+    @contextmanager
+    def run_context(
+        self,
+        msg_id: Optional[str] = None,
+        save_actions: bool = False,
+        supabase_helper: Optional[SupabaseHelper] = None,
+        plan: str = "task",
+        prefilter: Optional[EmailPrefilter] = None,
+    ) -> Iterator[RunContext]:
+        """Bind per-run state for the duration of a plan run."""
+        run = RunContext(
+            msg_id=msg_id,
+            save_actions=save_actions,
+            supabase_helper=supabase_helper,
+            plan=plan,
+            prefilter=prefilter,
+        )
+        token = _current_run.set(run)
+        try:
+            with track_run(plan):
+                yield run
+        finally:
+            _current_run.reset(token)
+            if run.compaction.fields:
+                stats = run.compaction
+                logger().info(
+                    f"Compaction saved {stats.bytes_saved} bytes / ~{stats.tokens_saved} tokens "
+                    f"across {stats.fields} fields ({stats.tokens_before} -> {stats.tokens_after} tokens)"
+                )
+                record_compaction(plan, stats)
+
+    def _supabase_for_run(self, run: Optional[RunContext]) -> SupabaseHelper:
+        if run and run.supabase_helper:
+            return run.supabase_helper
+        if self.supabase_helper is None:
+            self.supabase_helper = SupabaseHelper()
+        return self.supabase_helper
 
     def log_after_step_in_db(self, plan: Plan, plan_run: PlanRun, step: Step, output: Output) -> None:
         """Log the output of a step in the plan."""
         logger().info(f"Running step with task {step.task} using tool {step.tool_id}")
         logger().info(f"Step output: {output}")
-        if self._save_actions:
+        run = _current_run.get()
+        if run:
+            now = time.perf_counter()
+            plan_step_seconds.observe(now - run.last_step_at, plan=run.plan, step=step_label(step))
+            run.last_step_at = now
+        self.record_step_output(
+            output.get_summary() if output.get_summary() else output.get_value(),
+            output.get_value(),
+        )
+
+    def record_step_output(self, summary: Any, value: Any) -> None:
+        """Save a step output as an action of the current run and push it to SSE viewers."""
+        run = _current_run.get()
+        if run and run.save_actions:
             action_data = {
                 "action_id": str(uuid.uuid4()),
-                "msg_id": self._msg_id,
-                "action_summary": str(output.get_summary() if output.get_summary() else output.get_value()),
+                "msg_id": run.msg_id,
+                "action_summary": str(summary),
                 "actor": "agent",
-                "details": output.get_value(),
+                "details": value.model_dump(mode="json") if isinstance(value, BaseModel) else value,
                 "action_type": "step_output"
             }
-            self.supabase_helper.client.table("actions").insert(action_data).execute()
-            logger().info("Successfully saved error action to database")
+            # Push to SSE subscribers first so viewers see the step without waiting on the insert
+            get_run_event_broker().publish(
+                run.msg_id,
+                "step_output",
+                {**action_data, "created_at": datetime.now(timezone.utc).isoformat()},
+            )
+            get_action_writer().enqueue(self._supabase_for_run(run), "actions", action_data)
+            logger().info("Queued step action for database")
 
     def run_task(
         self,
@@ -208,34 +600,50 @@ class PortiaHelper:
         relevant email text or metadata.
         """
         logger().info(f"Starting run_task with task: {type(task).__name__ if isinstance(task, PortiaTask) else 'string'}")
-        # Set message ID for logging context
-        self.current_msg_id = msg_id
-        
         if isinstance(task, PortiaTask):
             prompt = task.value
+            route = f"task.{task.name}"
             logger().info(f"Using PortiaTask enum: {task.name}")
         else:
             prompt = str(task)
+            route = "task"
             logger().info("Using string task prompt")
 
         if context:
             prompt = f"{prompt}\n\nContext (User details & preferences):\n{context}"
             logger().info("Added context to prompt")
 
-        try:
-            logger().info("Executing Portia plan")
-            plan = self.portia.run(
-                prompt,
-                end_user=EndUser(external_id=str(end_user.id), email=str(end_user.email)) if end_user else EndUser(external_id="anonymous", email="anonymous@example.com")
+        router = get_model_router()
+        models = router.model_names(route)
+        for attempt, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                logger().info(f"Executing Portia plan on {model}")
+                with self.run_context(msg_id=msg_id):
+                    plan = self._task_engine(model).run(
+                        prompt,
+                        end_user=EndUser(external_id=str(end_user.id), email=str(end_user.email)) if end_user else EndUser(external_id="anonymous", email="anonymous@example.com")
+                    )
+                logger().info("Portia plan execution completed successfully")
+            except Exception as exc:  # keep broad to capture SDK/runtime errors
+                router.record(route, model, time.perf_counter() - start, "error")
+                if attempt + 1 < len(models):
+                    logger().warning(f"Portia run on {model} failed, retrying on {models[attempt + 1]}: {exc}")
+                    continue
+                logger().exception("Portia run failed")
+                return {"error": "portia_run_failed", "details": str(exc)}
+            # Portia plans and executes with several calls; the estimate covers the
+            # task prompt and the final answer only
+            final_output = getattr(plan.outputs, "final_output", None)
+            router.record(
+                route,
+                model,
+                time.perf_counter() - start,
+                "fallback" if attempt else "ok",
+                sent=estimate_tokens(prompt),
+                received=estimate_tokens(getattr(final_output, "value", None)),
             )
-            logger().info("Portia plan execution completed successfully")
-        except Exception as exc:  # keep broad to capture SDK/runtime errors
-            logger().exception("Portia run failed")
-            return {"error": "portia_run_failed", "details": str(exc)}
-        finally:
-            # Clear message ID after task completion
-            self.current_msg_id = None
-            logger().info("Cleared message ID context")
+            break
 
         # Attempt to extract model output in a safe way
         try:
@@ -256,74 +664,40 @@ class PortiaHelper:
             logger().warning(f"Failed to extract plan output: {e}")
             return {"value": "", "summary": ""}
 
-    def run_search_colab_emails(self, end_user: User, context: dict) -> Dict[str, Any]:
-        """Search collaboration emails using manual plan with Gmail integration."""
+    def run_search_colab_emails(
+        self,
+        end_user: User,
+        context: dict,
+        query: str,
+        known_email_ids: Optional[List[str]] = None,
+        supabase_helper: Optional[SupabaseHelper] = None,
+        prefilter: Optional[EmailPrefilter] = None,
+    ) -> Dict[str, Any]:
+        """Search collaboration emails using manual plan with Gmail integration.
+
+        `query` is the Gmail search (see `helpers.mailbox_sync.build_search_query`);
+        hits whose id is in `known_email_ids` are dropped before any LLM step, and
+        `prefilter` decides which of the rest the LLM filter step has to look at.
+        The plan is the shared `search_colab_emails` template; the result carries its
+        `plan_version`.
+        """
         logger().info("Starting manual plan for search collaboration emails")
+        prefilter = prefilter or EmailPrefilter(own_email=context.get("email"))
         
         try:
-            # Build manual plan for searching collaboration emails
-            plan = (
-                PlanBuilderV2("Search collaboration emails from last 30 days")
-                .input(
-                    name="context", 
-                    description="End user details and preferences and other context"
-                )
-                .llm_step(
-                    task="Generate an optimized Gmail search query for collaboration emails from the last 30 days. Focus on terms like collaboration, partnership, sponsorship, brand deal, influencer. Include date filter for last 30 days (after:2025/07/25) and exclude spam/promotional emails.",
-                    inputs=[Input("context")]
-                )
-                .invoke_tool_step(
-                    tool="portia:google:gmail:search_email",
-                    args={
-                        "query": StepOutput(0)
-                    }
-                )
-                .llm_step(
-                    task="Analyze the email search results and filter out only genuine collaboration, brand deal, or partnership requests. Exclude newsletters, automated emails, and emails where the user is the sender. Focus on emails with explicit intent to propose deals or collaborations. PERSIST THE INFORMATION ABOUT THE EMAILS.",
-                    inputs=[StepOutput(1), Input("context")]
-                )
-                .llm_step(
-                    task="""Structure the filtered collaboration emails into the required JSON schema with all fields: email_id, from_name, from_email, subject, snippet, received_at, thread_link, labels, tags, relevance_score, confidence, first_received, last_received, ui_actions, notes, and summary statistics. Structure the output as a list of email items like this: {
-                        "emails": [
-                            {
-                                "email_id": "string", # unique id of the email received from google's search email tool
-                                "from_name": "string",
-                                "from_email": "string",
-                                "subject": "string",
-                                "snippet": "string", # short text preview (1-2 lines)
-                                "received_at": "ISO8601 string",
-                                "thread_link": "string (permalink)",
-                                "labels": ["brand","offer","sponsored","negotiation"],
-                                "tags": ["optional category tags"],
-                                "relevance_score": 0-1, # how likely this is a colab offer
-                                "confidence": 0-1, # model confidence in parsing
-                                "first_received": "ISO8601 string",
-                                "last_received": "ISO8601 string",
-                                "ui_actions": ["start_colab_process"],
-                                "notes": "string (optional parsed notes)"
-                            }
-                        ],
-                        "summary": {
-                            "total_found": 0,
-                            "by_label": { "brand": 0, "offer": 0, "sponsored": 0 },
-                            "top_senders": [{ "email": "", "count": 0 }]
-                        }
-                    }""",
-                    inputs=[StepOutput(1), StepOutput(2), Input("context")],
-                )
-                .final_output(
-                    output_schema=SearchColabEmailsResponse,
-                    summarize=True
-                )
-                .build()
-            )
+            template = get_plan_templates().get("search_colab_emails")
             
             logger().info("Executing manual plan for collaboration email search")
-            plan_run = self.portia.run_plan(
-                plan,
-                plan_run_inputs={"context": context},
-                end_user=EndUser(external_id=str(end_user.id), email=str(end_user.email)) if end_user else EndUser(external_id="anonymous", email="anonymous@example.com")
-            )
+            with self.run_context(supabase_helper=supabase_helper, plan="search_colab_emails", prefilter=prefilter):
+                plan_run = self.portia.run_plan(
+                    template.plan,
+                    plan_run_inputs={
+                        "context": context,
+                        "query": query,
+                        "known_email_ids": known_email_ids or []
+                    },
+                    end_user=EndUser(external_id=str(end_user.id), email=str(end_user.email)) if end_user else EndUser(external_id="anonymous", email="anonymous@example.com")
+                )
             
             logger().info("Manual plan execution completed successfully")
             
@@ -336,14 +710,15 @@ class PortiaHelper:
                     
                     return {
                         "value": value if value is not None else "",
-                        "summary": str(summary) if summary is not None else ""
+                        "summary": str(summary) if summary is not None else "",
+                        "plan_version": template.version
                     }
                 else:
                     logger().warning("No final output found in plan results")
-                    return {"value": "", "summary": ""}
+                    return {"value": "", "summary": "", "plan_version": template.version}
             except Exception as extract_error:
                 logger().warning(f"Failed to extract plan output: {extract_error}")
-                return {"value": "", "summary": ""}
+                return {"value": "", "summary": "", "plan_version": template.version}
             
         except Exception as exc:
             logger().exception("Manual plan execution failed")
@@ -354,104 +729,130 @@ class PortiaHelper:
         end_user: Optional[User], 
         email_data: dict, 
         user_preferences: dict, 
-        msg_id: str
+        msg_id: str,
+        supabase_helper: Optional[SupabaseHelper] = None,
+        thread_state: Optional[ThreadState] = None,
+        replies: Optional[List[dict]] = None,
     ) -> Dict[str, Any]:
-        """Start collaboration analysis process using manual plan with conditional logic."""
+        """Start collaboration analysis process using manual plan with conditional logic.
+
+        With a `thread_state` from an earlier run (the partner replied), the parse and
+        analysis steps update the previous structured outputs from the unseen
+        `replies` only, instead of re-reading the whole thread. The result carries the
+        `plan_version` of the template that ran.
+
+        The run's inputs and every step output are checkpointed under `msg_id`, so a
+        failed run can be continued with `resume_start_colab_process`.
+        """
         logger().info("Starting manual plan for collaboration analysis process")
-        
+        plan_run_inputs = start_process_inputs(email_data, user_preferences, thread_state, replies)
+        follow_up = "new_messages" in plan_run_inputs
+
         try:
-            self._msg_id = msg_id
-            self._save_actions = True
-            # Build manual plan for collaboration analysis
-            plan = (
-                PlanBuilderV2("Analyze collaboration email and decide on next actions")
-                .input(
-                    name="email_data", 
-                    description="Selected email data with content, metadata, and thread information"
-                )
-                .input(
-                    name="user_preferences",
-                    description="User preferences including budget, terms, and collaboration requirements"
-                )
-                .llm_step(
-                    task="Parse the email content and extract key collaboration details: sender info, brand, subject, offer summary, proposed deliverables, compensation terms, exclusivity, deadlines, attachments, thread link, and received timestamp.",
-                    inputs=[Input("email_data")]
-                )
-                .llm_step(
-                    task="Analyze the parsed email against user preferences. Compare budget requirements, exclusivity terms, timeline limits, and deliverable formats. Determine fit level (high/medium/low), note relevance, identify missing information, and flag any risks.",
-                    inputs=[StepOutput(0), Input("user_preferences")]
-                )
-                .llm_step(
-                    task="Based on the analysis, decide the next action: 'ready_to_proceed' if all requirements match well, 'need_clarification' if missing key info, or 'reject' if poor fit. Provide confidence score and rationale.",
-                    inputs=[StepOutput(0), StepOutput(1)]
-                )
-                .llm_step(
-                    task="Create calendar event for collaboration follow-up using Google Calendar. Schedule a 30-minute meeting for tomorrow at 2pm to discuss the collaboration opportunity.",
-                    inputs=[StepOutput(0)]
-                )
-                .llm_step(
-                    task="""Based on the decision from step 2, handle the appropriate workflow:
-                    
-                    IF next_action is 'ready_to_proceed':
-                    - Draft a comprehensive contract including summary terms, payment terms, deliverables, milestones, timeline, acceptance criteria, and basic clauses (IP, termination, exclusivity)
-                    - Draft a professional reply email suggesting the contract
-                    - Set UI actions: ["preview_contract", "send_contract_and_email", "save_draft", "schedule_meeting", "edit_terms"]
-                    
-                    IF next_action is 'need_clarification':
-                    - Generate specific clarifying questions targeting missing or ambiguous information
-                    - Draft a professional reply requesting clarifications and propose provisional terms if appropriate
-                    - Create a contract draft skeleton for iteration
-                    - Set UI actions: ["send_questions", "save_draft", "escalate_to_human"]
-                    
-                    IF next_action is 'reject':
-                    - Draft a polite, professional decline email explaining reasons for rejection
-                    - Optionally suggest alternatives or future opportunities
-                    - Set UI actions: ["send_decline", "save_note"]
-                    
-                    Include autonomous actions list (calendar event creation) and clear assumptions for all cases.""",
-                    inputs=[StepOutput(0), StepOutput(1), StepOutput(2), StepOutput(3)]
-                )
-                .llm_step(
-                    task="Structure all outputs into the final JSON schema including email_parsed, analysis, next_action, confidence_score, suggested_reply, contract details, clarifying questions, autonomous actions (calendar event), assumptions, and next steps.",
-                    inputs=[StepOutput(0), StepOutput(1), StepOutput(2), StepOutput(3), StepOutput(4), Input("user_preferences"), Input("email_data")]
-                )
-                .final_output(
-                    output_schema=StartColabProcessResponse,
-                    summarize=True
-                )
-                .build()
+            template = get_plan_templates().get(
+                "start_colab_process.follow_up" if follow_up else "start_colab_process"
             )
-            
-            logger().info("Executing manual plan for collaboration analysis")
-            plan_run = self.portia.run_plan(
-                plan,
-                plan_run_inputs={
-                    "email_data": email_data,
-                    "user_preferences": user_preferences
-                },
-                end_user=EndUser(external_id=str(end_user.id), email=str(end_user.email)) if end_user else EndUser(external_id="anonymous", email="anonymous@example.com")
+            logger().info(
+                "Executing manual plan for collaboration analysis"
+                + (f" (follow-up with {len(plan_run_inputs['new_messages'])} new messages)" if follow_up else "")
             )
-            
-            logger().info("Manual plan execution completed successfully")
-            
-            # Try to extract the output safely
-            try:
-                if hasattr(plan_run.outputs, 'final_output') and plan_run.outputs.final_output:
-                    final_output = plan_run.outputs.final_output
-                    value = getattr(final_output, 'value', None)
-                    summary = getattr(final_output, 'summary', None)
-                    
-                    return {
-                        "value": value if value is not None else "",
-                        "summary": str(summary) if summary is not None else ""
-                    }
-                else:
-                    logger().warning("No final output found in plan results")
-                    return {"value": "", "summary": ""}
-            except Exception as extract_error:
-                logger().warning(f"Failed to extract plan output: {extract_error}")
-                return {"value": "", "summary": ""}
-            
+            with self.run_context(
+                msg_id=msg_id, save_actions=True, supabase_helper=supabase_helper, plan="start_colab_process"
+            ) as run:
+                # Email content is compacted once here; every LLM step reads these inputs
+                for name in ("email_data", "new_messages"):
+                    if name in plan_run_inputs:
+                        plan_run_inputs[name] = compact_llm_input(plan_run_inputs[name])
+                save_run_inputs(self._supabase_for_run(run), msg_id, template.version, plan_run_inputs, replies or [])
+                return self._execute_start_plan(template, plan_run_inputs, {})
         except Exception as exc:
             logger().exception("Manual plan execution failed")
-            return {"error": "manual_plan_failed", "details": str(exc)}
+            return {"error": "manual_plan_failed", "details": str(exc), "resumable": True}
+
+    def resume_start_colab_process(
+        self,
+        checkpoint: RunCheckpoint,
+        supabase_helper: Optional[SupabaseHelper] = None,
+    ) -> Dict[str, Any]:
+        """Continue a stopped start-process run from its checkpoints.
+
+        Steps with a checkpointed output are not run again; their outputs are
+        restored and the plan re-enters at the first step without one (and any
+        later steps that never finished). A run recorded under a different template
+        version can't be resumed, since its outputs may not fit the current plan.
+        """
+        try:
+            template = get_plan_templates().get(checkpoint.template_name)
+        except KeyError:
+            template = None
+        if template is None or template.version != checkpoint.plan_version:
+            return {
+                "error": "plan_changed",
+                "details": f"Run used {checkpoint.plan_version}, current plan is {template.version if template else 'gone'}",
+            }
+        completed = restore_outputs(template.plan, checkpoint.outputs)
+        remaining = [i for i in range(len(template.plan.steps)) if i not in completed]
+        logger().info(
+            f"Resuming run {checkpoint.msg_id} at step {remaining[0] if remaining else len(template.plan.steps)} "
+            f"({len(completed)} of {len(template.plan.steps)} steps restored)"
+        )
+        try:
+            with self.run_context(
+                msg_id=checkpoint.msg_id, save_actions=True, supabase_helper=supabase_helper, plan="start_colab_process"
+            ):
+                result = self._execute_start_plan(template, checkpoint.inputs, completed)
+        except Exception as exc:
+            logger().exception("Resumed plan execution failed")
+            return {"error": "manual_plan_failed", "details": str(exc), "resumable": True}
+        return {**result, "resumed_steps": remaining}
+
+    def _execute_start_plan(
+        self, template: PlanTemplate, plan_run_inputs: Dict[str, Any], completed: Dict[int, Any]
+    ) -> Dict[str, Any]:
+        """Run the start-process plan (inside a run context) from `completed` on."""
+        plan = template.plan
+        run = _current_run.get()
+        supabase = self._supabase_for_run(run)
+        produced: Dict[int, Any] = dict(completed)
+
+        def on_step(index: int, step: Any, output: Any) -> None:
+            produced[index] = output
+            self.record_step_output(output, output)
+            save_checkpoint(supabase, run.msg_id, template.version, index, output)
+
+        # Every step is a function step, so the plan runs on PlanRunner: steps that
+        # don't depend on each other (e.g. the calendar step) run concurrently
+        try:
+            outputs = self.plan_runner.run(
+                plan, plan_run_inputs, on_step=on_step, completed=completed, name="start_colab_process"
+            )
+        except JSONRepairError as e:
+            if len(produced) != len(plan.steps) - 1:
+                raise
+            # Only the structuring step failed: re-run it on the outputs we
+            # already have instead of failing (and re-paying for) the whole plan
+            logger().warning(f"Structuring step output unusable, re-running it: {e}")
+            json_repair_total.inc(schema=StartColabProcessResponse.__name__, outcome="rerun")
+            outputs = self.plan_runner.run(
+                plan, plan_run_inputs, on_step=on_step, completed=produced, name="start_colab_process"
+            )
+        
+        logger().info("Manual plan execution completed successfully")
+        
+        # Try to extract the output safely
+        try:
+            value = outputs.get(len(plan.steps) - 1)
+            summary = None
+            if value is not None and getattr(plan, "summarize", False):
+                summary = cached_llm_step(
+                    task="Summarize this collaboration analysis for the creator in 2-3 sentences: the offer, the recommended next action and why.",
+                    route="start_colab_process.summary"
+                ).run(analysis=value)
+            return {
+                "value": value if value is not None else "",
+                "summary": str(summary) if summary is not None else "",
+                "plan_version": template.version
+            }
+        except Exception as extract_error:
+            logger().warning(f"Failed to extract plan output: {extract_error}")
+            return {"value": "", "summary": "", "plan_version": template.version}
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from portia import logger
+
+from helpers.portia_helper import PortiaHelper
+
+
+class PortiaPool:
+    """Thread-safe pool of pre-warmed PortiaHelper engines.
+
+    Building a PortiaHelper loads config, fetches the tool registry and constructs a
+    Portia instance. The pool pays that cost once (at startup via `warm()`, or lazily up
+    to `size`) and hands engines out per request with `lease()`. Per-run state lives in
+    `helpers.portia_helper.RunContext`, so an engine carries nothing between leases.
+
+    Engines use in-memory storage which keeps every plan run, so an engine is
+    discarded and rebuilt after `max_runs` leases to bound memory.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        factory: Optional[Callable[[], PortiaHelper]] = None,
+        lease_timeout: float = 30.0,
+        max_runs: int = 200,
+    ) -> None:
+        if size < 1:
+            raise ValueError("PortiaPool size must be at least 1")
+        self.size = size
+        self.factory = factory or PortiaHelper
+        self.lease_timeout = lease_timeout
+        self.max_runs = max_runs
+
+        self._idle: "queue.LifoQueue[PortiaHelper]" = queue.LifoQueue()
+        self._runs: dict[int, int] = {}
+        self._created = 0
+        self._leased = 0
+        self._lock = threading.Lock()
+
+    def warm(self) -> int:
+        """Build engines until the pool is full. Returns the number built."""
+        built = 0
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return built
+                self._created += 1
+            try:
+                engine = self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._runs[id(engine)] = 0
+            self._idle.put(engine)
+            built += 1
+
+    def _acquire(self, timeout: float) -> PortiaHelper:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_build = self._created < self.size
+            if can_build:
+                self._created += 1
+        if can_build:
+            try:
+                engine = self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._runs[id(engine)] = 0
+            return engine
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No Portia engine available after {timeout}s")
+
+    def _release(self, engine: PortiaHelper) -> None:
+        with self._lock:
+            runs = self._runs.get(id(engine), 0) + 1
+            recycle = runs >= self.max_runs
+            if recycle:
+                self._runs.pop(id(engine), None)
+                self._created -= 1
+            else:
+                self._runs[id(engine)] = runs
+        if recycle:
+            logger().info(f"Recycling Portia engine after {runs} runs")
+            return
+        self._idle.put(engine)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[PortiaHelper]:
+        """Borrow an engine for the duration of one plan run.
+
+        Raises:
+            TimeoutError: If every engine stays busy for `timeout` seconds.
+        """
+        engine = self._acquire(self.lease_timeout if timeout is None else timeout)
+        with self._lock:
+            self._leased += 1
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._leased -= 1
+            self._release(engine)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "leased": self._leased,
+                "idle": self._idle.qsize(),
+            }
+
+
+_pool: Optional[PortiaPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_portia_pool() -> PortiaPool:
+    """Return the process-wide pool, sized by PORTIA_POOL_SIZE (default 4)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PortiaPool(
+                    size=int(os.getenv("PORTIA_POOL_SIZE", "4")),
+                    lease_timeout=float(os.getenv("PORTIA_POOL_LEASE_TIMEOUT", "30")),
+                )
+    return _pool
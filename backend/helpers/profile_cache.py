@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from portia import logger
+from postgrest.exceptions import APIError
+
+from helpers.supabase_helper import SupabaseHelper
+
+PROFILE_COLUMNS = "email, min_budget, max_budget, content_niche, auto_generate_invoice, guidelines"
+# Postgres undefined_column, as reported by PostgREST
+UNDEFINED_COLUMN = "42703"
+
+
+class _Entry:
+    def __init__(self, profile: Optional[dict], updated_at: Optional[str]) -> None:
+        self.profile = profile
+        self.updated_at = updated_at
+        self.fetched_at = time.monotonic()
+        self.checked_at = self.fetched_at
+
+
+class ProfileCache:
+    """Per-user cache of the `profiles` row used by /search-emails and /start-process.
+
+    Entries live for `ttl_seconds`. Once an entry is older than `revalidate_seconds`
+    the next read compares the row's `updated_at` with the cached one (a single-column
+    select) and refetches only when it moved, so edits made outside the backend are
+    picked up within `revalidate_seconds`. Updates made through the backend call
+    `invalidate()`. Concurrent reads of the same user share one fetch via a per-user
+    lock. Missing profiles are cached too, so a burst of 404s costs one query.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, revalidate_seconds: float = 30) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Flipped off if the profiles table has no updated_at column
+        self._versioned = True
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.fetches = 0
+        self.invalidations = 0
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def get(self, supabase: SupabaseHelper, user_id: str) -> Optional[dict]:
+        """The user's profile dict, or None if they have no profile."""
+        with self._user_lock(user_id):
+            entry = self._entries.get(user_id)
+            now = time.monotonic()
+            if entry is not None and now - entry.fetched_at < self.ttl_seconds:
+                if now - entry.checked_at < self.revalidate_seconds or self._still_current(supabase, user_id, entry):
+                    self.hits += 1
+                    return dict(entry.profile) if entry.profile is not None else None
+
+            self.misses += 1
+            entry = self._fetch(supabase, user_id)
+            self._entries[user_id] = entry
+            return dict(entry.profile) if entry.profile is not None else None
+
+    def invalidate(self, user_id: str) -> None:
+        # Under the user's lock so a fetch already in flight can't re-store the old row
+        with self._user_lock(user_id):
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def _still_current(self, supabase: SupabaseHelper, user_id: str, entry: _Entry) -> bool:
+        if not self._versioned or entry.updated_at is None:
+            return False
+        self.revalidations += 1
+        try:
+            rows = supabase.client.table("profiles").select("updated_at").eq("id", user_id).execute().data
+        except Exception as e:
+            logger().warning(f"Profile revalidation failed, refetching: {e}")
+            return False
+        if rows and rows[0].get("updated_at") == entry.updated_at:
+            entry.checked_at = time.monotonic()
+            return True
+        return False
+
+    def _fetch(self, supabase: SupabaseHelper, user_id: str) -> _Entry:
+        self.fetches += 1
+        if self._versioned:
+            try:
+                rows = supabase.client.table("profiles").select(
+                    f"{PROFILE_COLUMNS}, updated_at"
+                ).eq("id", user_id).execute().data
+                if not rows:
+                    return _Entry(None, None)
+                profile = dict(rows[0])
+                return _Entry(profile, profile.pop("updated_at", None))
+            except APIError as e:
+                # Only a missing column turns revalidation off; timeouts and 5xx just fail this fetch
+                if e.code != UNDEFINED_COLUMN:
+                    raise
+                logger().warning(f"Profiles has no updated_at column, caching by TTL only: {e}")
+                self._versioned = False
+
+        rows = supabase.client.table("profiles").select(PROFILE_COLUMNS).eq("id", user_id).execute().data
+        return _Entry(dict(rows[0]) if rows else None, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "revalidations": self.revalidations,
+            "fetches": self.fetches,
+            "invalidations": self.invalidations,
+            "versioned": self._versioned,
+        }
+
+
+_cache: Optional[ProfileCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProfileCache(
+                    ttl_seconds=float(os.getenv("PROFILE_CACHE_TTL", "300")),
+                    revalidate_seconds=float(os.getenv("PROFILE_REVALIDATE_SECONDS", "30")),
+                )
+    return _cache
@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from portia import logger
+from pydantic import BaseModel
+
+from helpers.action_writer import get_action_writer
+from helpers.supabase_helper import SupabaseHelper
+
+# Checkpoint row holding what a resume needs besides step outputs
+INPUTS_STEP = -1
+
+
+def _jsonable(value: Any) -> Any:
+    return value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+
+
+@dataclass
+class RunCheckpoint:
+    """What a start-process run had produced when it stopped.
+
+    `inputs` are the (already compacted) plan inputs, `replies` the raw thread
+    replies the run was given (the thread state is advanced from those on success),
+    and `outputs` the JSON outputs of the steps that finished, by step index.
+    """
+
+    msg_id: str
+    plan_version: str
+    inputs: Dict[str, Any]
+    replies: List[dict] = field(default_factory=list)
+    outputs: Dict[int, Any] = field(default_factory=dict)
+
+    @property
+    def template_name(self) -> str:
+        return self.plan_version.split("@", 1)[0]
+
+
+def save_checkpoint(supabase: SupabaseHelper, msg_id: str, plan_version: str, step_index: int, output: Any) -> None:
+    """Queue one step output behind the run's step actions (see `helpers.action_writer`)."""
+    get_action_writer().enqueue(supabase, "run_checkpoints", {
+        "msg_id": msg_id,
+        "step_index": step_index,
+        "plan_version": plan_version,
+        "output": _jsonable(output),
+    })
+
+
+def save_run_inputs(
+    supabase: SupabaseHelper, msg_id: str, plan_version: str, inputs: Dict[str, Any], replies: List[dict]
+) -> None:
+    save_checkpoint(supabase, msg_id, plan_version, INPUTS_STEP, {
+        "inputs": {name: _jsonable(value) for name, value in inputs.items()},
+        "replies": replies,
+    })
+
+
+def load_checkpoint(supabase: SupabaseHelper, msg_id: str) -> Optional[RunCheckpoint]:
+    """The run's checkpoints, or None if its inputs were never recorded."""
+    rows = supabase.client.table("run_checkpoints").select(
+        "step_index, plan_version, output"
+    ).eq("msg_id", msg_id).execute().data or []
+    by_step = {int(row["step_index"]): row for row in rows}
+    start = by_step.pop(INPUTS_STEP, None)
+    if start is None:
+        return None
+    return RunCheckpoint(
+        msg_id=msg_id,
+        plan_version=start["plan_version"],
+        inputs=(start["output"] or {}).get("inputs") or {},
+        replies=(start["output"] or {}).get("replies") or [],
+        outputs={
+            index: row["output"] for index, row in by_step.items()
+            if row["plan_version"] == start["plan_version"]
+        },
+    )
+
+
+def delete_checkpoints(supabase: SupabaseHelper, msg_id: str) -> None:
+    """Drop a finished run's checkpoints; they hold its compacted email and profile.
+
+    Checkpoints of runs that are never resumed expire with the retention job in
+    db/create_run_checkpoints_table.sql.
+    """
+    # The run's checkpoints are queued in the writer behind its step actions
+    if not get_action_writer().flush(wait=True):
+        logger().warning(f"Checkpoints of run {msg_id} still buffered, leaving them to retention")
+        return
+    try:
+        supabase.client.table("run_checkpoints").delete().eq("msg_id", msg_id).execute()
+    except Exception as e:
+        logger().warning(f"Failed to delete checkpoints of run {msg_id}: {e}")
+
+
+def restore_outputs(plan: Any, outputs: Dict[int, Any]) -> Dict[int, Any]:
+    """Checkpointed JSON outputs as the step values downstream steps expect.
+
+    Steps with an `output_schema` (cached LLM steps' `run` methods) get their
+    pydantic model back; everything else was stored as-is.
+    """
+    restored: Dict[int, Any] = {}
+    for index, value in outputs.items():
+        if not 0 <= index < len(plan.steps):
+            continue
+        owner = getattr(getattr(plan.steps[index], "function", None), "__self__", None)
+        schema = getattr(owner, "output_schema", None)
+        restored[index] = schema.model_validate(value) if schema is not None and value is not None else value
+    return restored
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from portia import logger
+
+
+class RunEvent:
+    """One Server-Sent Event for a plan run. `id` increases per run from 1."""
+
+    def __init__(self, event_id: int, event: str, data: Dict[str, Any]) -> None:
+        self.id = event_id
+        self.event = event
+        self.data = data
+
+    def encode(self) -> str:
+        payload = json.dumps(
+            self.data,
+            default=lambda o: o.model_dump() if hasattr(o, "model_dump") else str(o),
+        )
+        return f"id: {self.id}\nevent: {self.event}\ndata: {payload}\n\n"
+
+
+class _RunChannel:
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.events: List[RunEvent] = []
+        self.next_id = 1
+        self.closed_at: Optional[float] = None
+        self.subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+
+class RunEventBroker:
+    """Fan-out of plan step outputs to SSE subscribers.
+
+    Plan runs publish from worker threads; subscribers are async generators on the
+    event loop, so delivery goes through `loop.call_soon_threadsafe`. Each run keeps a
+    bounded history so a reconnecting client can resume from `Last-Event-ID`, and closed
+    runs are dropped after `retention_seconds`.
+    """
+
+    def __init__(self, max_events: int = 200, retention_seconds: float = 600) -> None:
+        self.max_events = max_events
+        self.retention_seconds = retention_seconds
+        self._channels: Dict[str, _RunChannel] = {}
+        self._lock = threading.Lock()
+
+    def open(self, msg_id: str, user_id: str) -> None:
+        """Register a run. A closed run is reopened (it is being resumed) and keeps its event ids."""
+        with self._lock:
+            self._prune()
+            channel = self._channels.setdefault(msg_id, _RunChannel(user_id))
+            channel.closed_at = None
+
+    def owner(self, msg_id: str) -> Optional[str]:
+        with self._lock:
+            channel = self._channels.get(msg_id)
+            return channel.user_id if channel else None
+
+    def publish(self, msg_id: str, event: str, data: Dict[str, Any], final: bool = False) -> None:
+        """Record an event and push it to live subscribers. `final` closes the run."""
+        with self._lock:
+            channel = self._channels.get(msg_id)
+            if channel is None or channel.closed_at is not None:
+                return
+            run_event = RunEvent(channel.next_id, event, data)
+            channel.next_id += 1
+            channel.events.append(run_event)
+            if len(channel.events) > self.max_events:
+                del channel.events[0]
+            if final:
+                channel.closed_at = time.time()
+            subscribers = list(channel.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, run_event)
+                if final:
+                    loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                # Subscriber's loop already closed; it unregisters itself on exit.
+                pass
+
+    def close(self, msg_id: str) -> None:
+        """Close a run without a final event, e.g. when it failed before starting."""
+        self.publish(msg_id, "closed", {"msg_id": msg_id}, final=True)
+
+    async def subscribe(
+        self,
+        msg_id: str,
+        last_event_id: int = 0,
+        keepalive_seconds: float = 15,
+    ) -> AsyncIterator[Optional[RunEvent]]:
+        """Yield events after `last_event_id` until the run closes.
+
+        Yields `None` every `keepalive_seconds` without events so the caller can send
+        an SSE comment and notice disconnected clients.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (loop, queue)
+        with self._lock:
+            channel = self._channels.get(msg_id)
+            if channel is None:
+                return
+            backlog = [e for e in channel.events if e.id > last_event_id]
+            closed = channel.closed_at is not None
+            if not closed:
+                channel.subscribers.add(subscriber)
+
+        try:
+            for run_event in backlog:
+                yield run_event
+            if closed:
+                return
+            while True:
+                try:
+                    run_event = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if run_event is None:
+                    return
+                if run_event.id > last_event_id:
+                    yield run_event
+        finally:
+            with self._lock:
+                channel = self._channels.get(msg_id)
+                if channel is not None:
+                    channel.subscribers.discard(subscriber)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            msg_id for msg_id, channel in self._channels.items()
+            if channel.closed_at is not None and channel.closed_at < cutoff
+        ]
+        for msg_id in expired:
+            del self._channels[msg_id]
+        if expired:
+            logger().info(f"Dropped {len(expired)} expired run event channels")
+
+
+_broker: Optional[RunEventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_run_event_broker() -> RunEventBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = RunEventBroker()
+    return _broker
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key runs `fn` on its own thread; callers arriving while it
+    is in flight wait on the same future and get the same result (or exception).
+    Results accepted by `cacheable` are then served for `result_ttl` seconds, which
+    absorbs the immediate repeats from double clicks and auto-triggers.
+    """
+
+    def __init__(self, result_ttl: float = 10, cacheable: Optional[Callable[[Any], bool]] = None) -> None:
+        self.result_ttl = result_ttl
+        self.cacheable = cacheable or (lambda result: True)
+        self._inflight: Dict[str, Future] = {}
+        self._results: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached[1] > time.monotonic():
+                    self.cache_hits += 1
+                    return cached[0]
+                del self._results[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if self.result_ttl > 0 and self.cacheable(result):
+                self._results[key] = (result, time.monotonic() + self.result_ttl)
+        future.set_result(result)
+        return result
+
+    def forget(self, key: str) -> None:
+        """Drop a cached result so the next call runs again."""
+        with self._lock:
+            self._results.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "cached": len(self._results),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+            }
+
+
+_search_flights: Optional[SingleFlight] = None
+_search_flights_lock = threading.Lock()
+
+
+def get_search_flights() -> SingleFlight:
+    """Per-user coalescing of /search-emails; only successful responses are cached."""
+    global _search_flights
+    if _search_flights is None:
+        with _search_flights_lock:
+            if _search_flights is None:
+                _search_flights = SingleFlight(
+                    result_ttl=float(os.getenv("SEARCH_RESULT_TTL", "15")),
+                    cacheable=lambda result: result[0] == 200,
+                )
+    return _search_flights
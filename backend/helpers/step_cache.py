@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from portia import logger
+
+
+def _canonical(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def canonical_json(value: Any) -> str:
+    """Stable JSON text: sorted keys, no whitespace, pydantic models dumped."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=_canonical)
+
+
+def cache_key(task: str, model: str, inputs: Dict[str, Any]) -> str:
+    """Content address of one LLM step: hash of task text, model and resolved inputs.
+
+    Inputs are the step's own arguments, so a step is only invalidated when something
+    it actually reads changes (e.g. a profile field only misses the steps fed
+    `user_preferences` and the steps downstream of them).
+    """
+    payload = canonical_json({"task": task, "model": model, "inputs": inputs})
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StepCache:
+    """Two-tier cache of LLM step results.
+
+    An in-memory LRU with TTL serves repeat runs in-process; an optional SQLite file
+    keeps results across restarts. Values must be JSON-serialisable. Counters cover
+    hit rate per tier and the time spent on lookups and on the LLM calls behind misses.
+
+    The SQLite tier is off unless `sqlite_path` is given. Its values are step outputs
+    derived from users' emails and profiles, stored unencrypted until they expire, so
+    the file is created readable by the server's user only and should live on a
+    private volume.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 86400, sqlite_path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            os.makedirs(os.path.dirname(sqlite_path) or ".", mode=0o700, exist_ok=True)
+            # Create the file owner-only before sqlite opens it
+            os.close(os.open(sqlite_path, os.O_CREAT | os.O_RDWR, 0o600))
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "create table if not exists step_cache (key text primary key, value text not null, expires_at real not null)"
+            )
+            self._db.execute("delete from step_cache where expires_at < ?", (time.time(),))
+            self._db.commit()
+            logger().info(f"Persisting LLM step results to {os.path.abspath(sqlite_path)}")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return `(hit, value)`."""
+        start = time.perf_counter()
+        now = time.time()
+        try:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    if entry[1] > now:
+                        self._memory.move_to_end(key)
+                        self.memory_hits += 1
+                        return True, entry[0]
+                    del self._memory[key]
+
+                if self._db is not None:
+                    row = self._db.execute(
+                        "select value, expires_at from step_cache where key = ?", (key,)
+                    ).fetchone()
+                    if row and row[1] > now:
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self.disk_hits += 1
+                        return True, value
+
+                self.misses += 1
+                return False, None
+        finally:
+            self.lookup_seconds += time.perf_counter() - start
+
+    def set(self, key: str, value: Any, compute_seconds: float = 0.0) -> None:
+        """Store a value; `compute_seconds` is the LLM time it took, for the miss counters."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self.miss_seconds += compute_seconds
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "insert or replace into step_cache (key, value, expires_at) values (?, ?, ?)",
+                        (key, canonical_json(value), expires_at),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger().warning(f"Failed to persist step cache entry: {e}")
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "avg_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+                "avg_miss_llm_ms": self.miss_seconds / self.misses * 1000 if self.misses else 0.0,
+            }
+
+
+_cache: Optional[StepCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_step_cache() -> StepCache:
+    """Process-wide cache, in memory only unless STEP_CACHE_SQLITE names a file for the on-disk tier."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StepCache(
+                    max_entries=int(os.getenv("STEP_CACHE_SIZE", "2048")),
+                    ttl_seconds=float(os.getenv("STEP_CACHE_TTL", "86400")),
+                    sqlite_path=os.getenv("STEP_CACHE_SQLITE") or None,
+                )
+    return _cache
@@ -1,16 +1,25 @@
 import os
+import threading
 from typing import Optional
 from dotenv import load_dotenv
+import httpx
+from postgrest import SyncPostgrestClient, SyncRequestBuilder
 from supabase import Client, create_client
 
+from helpers.metrics import InstrumentedTransport
+
 
 class SupabaseHelper:
-    """Simple Supabase helper that only initializes the Supabase client.
+    """Simple Supabase helper that initializes the Supabase client.
 
-    The helper intentionally contains only a constructor. Add methods on-demand
-    in the calling code or request specific helpers to be added.
+    Request handlers should not use `client` directly for user data: call
+    `scoped(access_token)` to get a per-request helper that acts as the caller
+    so row level security applies.
     """
 
+    _transport: Optional[httpx.BaseTransport] = None
+    _transport_lock = threading.Lock()
+
     def __init__(
         self,
         url: Optional[str] = None,
@@ -34,3 +43,77 @@ class SupabaseHelper:
 
         self.client: Client = create_client(self.url, self.key)
 
+    @classmethod
+    def shared_transport(cls) -> httpx.BaseTransport:
+        """Connection pool shared by every scoped client in the process."""
+        if cls._transport is None:
+            with cls._transport_lock:
+                if cls._transport is None:
+                    # Wrapped so every table operation lands in the /metrics latency histograms
+                    cls._transport = InstrumentedTransport(httpx.HTTPTransport(
+                        limits=httpx.Limits(
+                            max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100")),
+                            max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "20")),
+                        ),
+                        retries=1,
+                    ))
+        return cls._transport
+
+    def scoped(self, access_token: str) -> "ScopedSupabaseHelper":
+        """Return a helper whose queries run as the owner of `access_token`."""
+        return ScopedSupabaseHelper(self.url, self.key, access_token, self.shared_transport())
+
+
+class ScopedSupabaseClient:
+    """Table access for one caller.
+
+    The caller's access token is sent as the Authorization header on every
+    query, so there is no `set_session` round-trip and no shared auth state
+    between concurrent requests. Each client has its own httpx client, because
+    postgrest 1.x writes its headers into the `http_client` it is given; only
+    the transport (connection pool and SSL context) is shared, so building one
+    per request is cheap. Never close it, as that would close the shared
+    transport.
+    """
+
+    def __init__(self, rest_url: str, key: str, access_token: str, transport: httpx.BaseTransport, timeout: float) -> None:
+        headers = {"apikey": key, "Authorization": f"Bearer {access_token}"}
+        self.postgrest = SyncPostgrestClient(
+            rest_url,
+            headers=headers,
+            http_client=httpx.Client(
+                base_url=rest_url,
+                headers=headers,
+                transport=transport,
+                timeout=timeout,
+                follow_redirects=True,
+            ),
+        )
+
+    def table(self, table_name: str) -> SyncRequestBuilder:
+        return self.postgrest.from_(table_name)
+
+    from_ = table
+
+
+class ScopedSupabaseHelper(SupabaseHelper):
+    """SupabaseHelper bound to one caller's access token (see `SupabaseHelper.scoped`)."""
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        access_token: str,
+        transport: httpx.BaseTransport,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.url = url
+        self.key = key
+        self.access_token = access_token
+        self.client = ScopedSupabaseClient(
+            f"{url.rstrip('/')}/rest/v1",
+            key,
+            access_token,
+            transport,
+            timeout if timeout is not None else float(os.getenv("SUPABASE_TIMEOUT", "30")),
+        )
@@ -0,0 +1,276 @@
+import base64
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from portia import logger
+from supabase_auth import User
+
+from helpers.metrics import Counter, Histogram, registry
+from helpers.supabase_helper import SupabaseHelper
+
+sync_runs = registry.register(Counter(
+    "kyodo_sync_runs_total", "Background mailbox syncs by outcome.", ("status",)
+))
+sync_run_seconds = registry.register(Histogram(
+    "kyodo_sync_run_seconds", "Background mailbox sync latency in seconds."
+))
+
+SyncFn = Callable[[User, SupabaseHelper], Tuple[int, dict]]
+
+
+def token_expiry(access_token: Optional[str]) -> Optional[float]:
+    """`exp` claim of a JWT, read without verification (the token was verified on the request)."""
+    if not access_token:
+        return None
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+@dataclass
+class _UserSchedule:
+    user: User
+    supabase: SupabaseHelper
+    token_expires_at: Optional[float]
+    last_seen: float
+    next_run_at: float
+    state: str = "scheduled"
+    runs: int = 0
+    failures: int = 0
+    last_run_at: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_status: Optional[int] = None
+    last_new_emails: Optional[int] = None
+    last_error: Optional[str] = None
+
+    def describe(self, now: float) -> Dict[str, Any]:
+        return {
+            "user_id": str(self.user.id),
+            "state": self.state,
+            "next_run_in_s": round(max(0.0, self.next_run_at - now), 1),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": _iso(self.last_run_at),
+            "last_duration_s": round(self.last_duration, 2) if self.last_duration is not None else None,
+            "last_status": self.last_status,
+            "last_new_emails": self.last_new_emails,
+            "last_error": self.last_error,
+            "token_expires_at": _iso(self.token_expires_at),
+        }
+
+
+class SyncScheduler:
+    """Runs incremental mailbox syncs for recently active users in the background.
+
+    Users are registered by `touch()` on their requests, with the scoped Supabase
+    helper of that request, so a sync writes `emails` as the user and row level
+    security applies. Each user is synced every `interval` seconds (jittered so
+    users who arrived together don't sync together) until they have been inactive
+    for `active_seconds`, or their access token expires; the next request
+    re-arms them with a fresh token.
+
+    At most `max_concurrent` syncs run at once, and a sync only starts while
+    `can_start()` allows it (the app passes a check that the LLM governor has idle
+    capacity), so background work uses what interactive requests leave over.
+    """
+
+    def __init__(
+        self,
+        interval: float = 900,
+        jitter: float = 0.2,
+        max_concurrent: int = 2,
+        active_seconds: float = 86400,
+        tick_seconds: float = 5,
+        token_margin: float = 120,
+    ) -> None:
+        self.interval = interval
+        self.jitter = jitter
+        self.max_concurrent = max_concurrent
+        self.active_seconds = active_seconds
+        self.tick_seconds = tick_seconds
+        self.token_margin = token_margin
+        self._users: Dict[str, _UserSchedule] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sync: Optional[SyncFn] = None
+        self._can_start: Callable[[], bool] = lambda: True
+        self._running = 0
+        self.started = 0
+        self.deferred = 0
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def start(self, sync: SyncFn, can_start: Optional[Callable[[], bool]] = None) -> None:
+        if self._thread is not None:
+            return
+        self._sync = sync
+        self._can_start = can_start or (lambda: True)
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="kyodo-sync")
+        self._thread = threading.Thread(target=self._loop, name="kyodo-sync-scheduler", daemon=True)
+        self._thread.start()
+        logger().info(f"Sync scheduler started (interval {self.interval:.0f}s, {self.max_concurrent} concurrent)")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick_seconds + 1)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def touch(self, user: User, supabase: SupabaseHelper) -> None:
+        """Mark the user active and keep the credentials of their latest request."""
+        now = time.time()
+        user_id = str(user.id)
+        expires_at = token_expiry(getattr(supabase, "access_token", None))
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                self._users[user_id] = _UserSchedule(
+                    user=user,
+                    supabase=supabase,
+                    token_expires_at=expires_at,
+                    last_seen=now,
+                    next_run_at=now + self._jittered(self.interval),
+                )
+                return
+            entry.user = user
+            entry.supabase = supabase
+            entry.token_expires_at = expires_at
+            entry.last_seen = now
+            if entry.state == "token_expired":
+                entry.state = "scheduled"
+
+    def request_refresh(self, user_id: str) -> bool:
+        """Sync the user on the next tick; False if they aren't registered or the scheduler is stopped."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or self._thread is None:
+                return False
+            if entry.state != "running":
+                entry.next_run_at = time.time()
+                entry.state = "scheduled"
+            return True
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self._tick()
+            except Exception as e:
+                logger().warning(f"Sync scheduler tick failed: {e}")
+
+    def _tick(self) -> None:
+        now = time.time()
+        with self._lock:
+            for user_id in [u for u, e in self._users.items() if now - e.last_seen > self.active_seconds and e.state != "running"]:
+                del self._users[user_id]
+            due = sorted(
+                (e for e in self._users.values() if e.state == "scheduled" and e.next_run_at <= now),
+                key=lambda e: e.next_run_at,
+            )
+            for entry in due:
+                if self._running >= self.max_concurrent:
+                    break
+                if entry.token_expires_at is not None and entry.token_expires_at - self.token_margin < now:
+                    entry.state = "token_expired"
+                    continue
+                if not self._can_start():
+                    self.deferred += 1
+                    break
+                entry.state = "running"
+                self._running += 1
+                self.started += 1
+                self._executor.submit(self._run, entry)
+
+    def _run(self, entry: _UserSchedule) -> None:
+        start = time.time()
+        retry_after: Optional[float] = None
+        try:
+            status_code, content = self._sync(entry.user, entry.supabase)
+            entry.last_status = status_code
+            entry.last_error = content.get("detail") if status_code != 200 else None
+            emails = (content.get("value") or {}).get("emails") if status_code == 200 else None
+            entry.last_new_emails = len(emails) if isinstance(emails, list) else None
+            if status_code == 429:
+                retry_after = float(content.get("retry_after") or self.tick_seconds)
+            if status_code not in (200, 404):
+                entry.failures += 1
+            sync_runs.inc(status=str(status_code))
+        except Exception as e:
+            logger().warning(f"Background sync for {entry.user.id} failed: {e}")
+            entry.last_status = None
+            entry.last_error = str(e)
+            entry.failures += 1
+            sync_runs.inc(status="error")
+        finally:
+            now = time.time()
+            sync_run_seconds.observe(now - start)
+            with self._lock:
+                self._running -= 1
+                entry.runs += 1
+                entry.last_run_at = start
+                entry.last_duration = now - start
+                entry.state = "scheduled"
+                entry.next_run_at = now + (retry_after if retry_after is not None else self._jittered(self.interval))
+
+    def status(self, user_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._users.get(user_id)
+            return entry.describe(now) if entry else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate counts only; a user's own schedule is served by `status` (/sync/status)."""
+        with self._lock:
+            states: Dict[str, int] = {}
+            for entry in self._users.values():
+                states[entry.state] = states.get(entry.state, 0) + 1
+            return {
+                "enabled": self._thread is not None,
+                "interval_s": self.interval,
+                "max_concurrent": self.max_concurrent,
+                "running": self._running,
+                "active_users": len(self._users),
+                "started": self.started,
+                "deferred": self.deferred,
+                "states": states,
+                "failing_users": sum(1 for e in self._users.values() if e.failures),
+            }
+
+
+_scheduler: Optional[SyncScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_sync_scheduler() -> SyncScheduler:
+    """Return the process-wide scheduler, configured by SYNC_INTERVAL_SECONDS and SYNC_MAX_CONCURRENT."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SyncScheduler(
+                    interval=float(os.getenv("SYNC_INTERVAL_SECONDS", "900")),
+                    jitter=float(os.getenv("SYNC_JITTER", "0.2")),
+                    max_concurrent=int(os.getenv("SYNC_MAX_CONCURRENT", "2")),
+                    active_seconds=float(os.getenv("SYNC_ACTIVE_SECONDS", "86400")),
+                )
+    return _scheduler
@@ -0,0 +1,124 @@
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from helpers.supabase_helper import SupabaseHelper
+
+# Digests kept per thread; older ones only matter if a client re-sends ancient replies
+MAX_SEEN_DIGESTS = 200
+
+
+def message_digest(message: dict) -> str:
+    """Stable id for a thread message from its sender, send time and whitespace-normalised body."""
+    normalised = "\n".join([
+        str(message.get("from_email") or message.get("from") or "").strip().lower(),
+        str(message.get("sent_at") or ""),
+        " ".join(str(message.get("body") or "").split()),
+    ])
+    return hashlib.sha256(normalised.encode()).hexdigest()[:32]
+
+
+@dataclass
+class ThreadState:
+    """What earlier start-process runs already learnt about one collaboration thread.
+
+    The last validated `email_parsed`/`analysis` and digests of the messages they
+    were derived from; a follow-up run feeds the model only unseen messages plus
+    this state, so its prompt size doesn't grow with the thread.
+    """
+
+    user_id: str
+    email_id: str
+    email_parsed: Optional[Dict[str, Any]] = None
+    analysis: Optional[Dict[str, Any]] = None
+    seen_digests: List[str] = field(default_factory=list)
+    iteration: int = 0
+
+    @property
+    def is_follow_up(self) -> bool:
+        return self.email_parsed is not None
+
+    def unseen(self, messages: List[dict]) -> List[dict]:
+        seen = set(self.seen_digests)
+        return [m for m in messages if message_digest(m) not in seen]
+
+    def advance(self, messages: List[dict], email_parsed: Dict[str, Any], analysis: Dict[str, Any]) -> None:
+        """Record a successful run over `messages`."""
+        seen = set(self.seen_digests)
+        for digest in map(message_digest, messages):
+            if digest not in seen:
+                seen.add(digest)
+                self.seen_digests.append(digest)
+        self.seen_digests = self.seen_digests[-MAX_SEEN_DIGESTS:]
+        self.email_parsed = email_parsed
+        self.analysis = analysis
+        self.iteration += 1
+
+
+def start_process_inputs(
+    email: dict,
+    user_preferences: dict,
+    state: Optional[ThreadState] = None,
+    replies: Optional[List[dict]] = None,
+) -> Dict[str, Any]:
+    """Plan inputs for a start-process run.
+
+    The first run parses the stored email (with any replies the caller sent); a
+    follow-up gets the previous structured outputs and only the replies not seen yet.
+    With nothing new (a retry, or a client that doesn't send replies) the run
+    starts over from the email: a follow-up would only re-derive the previous
+    outputs from an empty delta.
+    """
+    replies = replies or []
+    new_messages = state.unseen(replies) if state is not None and state.is_follow_up else []
+    if new_messages:
+        return {
+            "user_preferences": user_preferences,
+            "previous_email_parsed": state.email_parsed,
+            "previous_analysis": state.analysis,
+            "new_messages": new_messages,
+        }
+    return {
+        "user_preferences": user_preferences,
+        "email_data": {**email, "replies": replies} if replies else email,
+    }
+
+
+def _from_row(user_id: str, email_id: str, row: dict) -> ThreadState:
+    return ThreadState(
+        user_id=user_id,
+        email_id=email_id,
+        email_parsed=row.get("email_parsed"),
+        analysis=row.get("analysis"),
+        seen_digests=list(row.get("seen_digests") or []),
+        iteration=row.get("iteration") or 0,
+    )
+
+
+def load_thread_state(supabase: SupabaseHelper, user_id: str, email_id: str) -> ThreadState:
+    resp = supabase.client.table("colab_threads").select(
+        "email_parsed, analysis, seen_digests, iteration"
+    ).eq("user_id", user_id).eq("email_id", email_id).execute()
+    return _from_row(user_id, email_id, resp.data[0] if resp.data else {})
+
+
+def load_thread_states(supabase: SupabaseHelper, user_id: str, email_ids: List[str]) -> Dict[str, ThreadState]:
+    """Thread state for several emails in one query; emails without a row get fresh state."""
+    resp = supabase.client.table("colab_threads").select(
+        "email_id, email_parsed, analysis, seen_digests, iteration"
+    ).eq("user_id", user_id).in_("email_id", email_ids).execute()
+    rows = {row["email_id"]: row for row in resp.data or []}
+    return {email_id: _from_row(user_id, email_id, rows.get(email_id, {})) for email_id in email_ids}
+
+
+def save_thread_state(supabase: SupabaseHelper, state: ThreadState) -> None:
+    supabase.client.table("colab_threads").upsert({
+        "user_id": state.user_id,
+        "email_id": state.email_id,
+        "email_parsed": state.email_parsed,
+        "analysis": state.analysis,
+        "seen_digests": state.seen_digests,
+        "iteration": state.iteration,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }).execute()
@@ -0,0 +1,27 @@
+import json
+from typing import Any
+
+# Rough chars-per-token for English prose and JSON with Gemini/GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+# Task text and instructions each plan step adds around its inputs
+STEP_PROMPT_TOKENS = 400
+# Allowance for the Gmail search page the search plan feeds its LLM steps
+SEARCH_RESULTS_TOKENS = 8000
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "model_dump_json"):
+        return value.model_dump_json()
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+def estimate_tokens(value: Any) -> int:
+    """Cheap token estimate from serialised size; good enough for rate budgeting."""
+    return max(1, len(_text(value)) // CHARS_PER_TOKEN)
+
+
+def estimate_plan_tokens(inputs: Any, llm_steps: int) -> int:
+    """Tokens a plan is expected to send when every LLM step reads `inputs`."""
+    return (estimate_tokens(inputs) + STEP_PROMPT_TOKENS) * llm_steps
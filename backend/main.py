@@ -1,20 +1,53 @@
+import json
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager
+from typing import List, Optional
 import uuid
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from supabase_auth import User
 from helpers.schemas import SearchColabEmailsResponse, StartColabProcessResponse
 from helpers.supabase_helper import SupabaseHelper
+from helpers.thread_state import (
+    ThreadState,
+    load_thread_state,
+    load_thread_states,
+    save_thread_state,
+    start_process_inputs,
+)
 from middleware.auth_middleware import AuthMiddleware
 from dotenv import load_dotenv
-from helpers.portia_helper import PortiaHelper
-import json
-import re
+from helpers.action_writer import get_action_writer
+from helpers.email_listing import InvalidListingRequest, list_emails, page_etag
+from helpers.email_prefilter import EmailPrefilter, relevance_models
+from helpers.job_queue import JobQueueFull, get_job_queue
+from helpers.json_repair import JSONRepairError, parse_structured
+from helpers.llm_governor import LLMBusy, get_llm_governor
+from helpers.mailbox_sync import (
+    build_search_query,
+    load_known_email_ids,
+    load_stored_emails,
+    load_sync_state,
+    parse_datetime,
+    save_sync_state,
+    sync_window_start,
+)
+from helpers.metrics import registry
+from helpers.model_router import get_model_router
+from helpers.plan_templates import get_plan_templates
+from helpers.portia_pool import get_portia_pool
+from helpers.profile_cache import get_profile_cache
+from helpers.run_checkpoints import RunCheckpoint, delete_checkpoints, load_checkpoint
+from helpers.run_events import get_run_event_broker
+from helpers.single_flight import get_search_flights
+from helpers.step_cache import get_step_cache
+from helpers.sync_scheduler import get_sync_scheduler
+from helpers.tokens import SEARCH_RESULTS_TOKENS, estimate_plan_tokens
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +55,33 @@ logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the plan templates once; runs only bring their inputs
+    try:
+        built = get_plan_templates().build_all()
+        logger.info(f"Built {built} plan templates")
+    except Exception as e:
+        logger.warning(f"Failed to build plan templates, they will be built on first use: {e}")
+    # Pre-warm Portia engines so the first requests don't pay for config,
+    # tool registry and Portia construction.
+    try:
+        built = get_portia_pool().warm()
+        logger.info(f"Warmed {built} Portia engines")
+    except Exception as e:
+        logger.warning(f"Failed to warm Portia pool, engines will be built on demand: {e}")
+    if os.getenv("SYNC_SCHEDULER_ENABLED", "1") != "0":
+        get_sync_scheduler().start(background_sync, can_start=get_llm_governor().has_idle_capacity)
+    yield
+    get_sync_scheduler().shutdown()
+    # Queued runs are closed with an error action; running ones get JOB_DRAIN_SECONDS
+    get_job_queue().shutdown(timeout=float(os.getenv("JOB_DRAIN_SECONDS", "30")))
+    # After the job queue, so actions from drained and cancelled jobs are still written
+    get_action_writer().shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 origins = [
@@ -41,13 +100,23 @@ app.add_middleware(AuthMiddleware)
 
 print("FastAPI application started")
 
+def plan_response(status_code: int, content: dict) -> JSONResponse:
+    """Respond with a plan result, turning a governor rejection into `Retry-After`."""
+    headers = {"Retry-After": str(content["retry_after"])} if status_code == 429 else None
+    return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+
+# Stored search results younger than this are served without running the plan
+SEARCH_FRESH_SECONDS = float(os.getenv("SEARCH_FRESH_SECONDS", os.getenv("SYNC_INTERVAL_SECONDS", "900")))
+
+
 # Models
 class EmailSearchRequest(BaseModel):
     user_id: Optional[str] = None
     rescan: Optional[bool] = False
 
 @app.post("/search-emails")
-def search_emails(request: Request):
+def search_emails(request: Request, body: Optional[EmailSearchRequest] = None):
     logger.info("Starting search-emails endpoint")
     user: Optional[User] = getattr(request.state, "user", None)
     if not user or not getattr(user, "id", None):
@@ -59,37 +128,163 @@ def search_emails(request: Request):
         return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
     
     user_id = str(user.id)  # Use actual authenticated user ID
+    rescan = bool(body and body.rescan)
+    get_sync_scheduler().touch(user, supabase)
+    if not rescan:
+        stored = stored_search_response(supabase, user_id)
+        if stored is not None:
+            return JSONResponse(status_code=200, content=stored)
+    # Concurrent searches for one user (double clicks, several tabs, the dashboard
+    # auto-trigger) share a single plan run, and its result is reused briefly
+    status_code, content = get_search_flights().run(
+        f"{user_id}:{'rescan' if rescan else 'sync'}",
+        lambda: process_search_emails(user, supabase, rescan)
+    )
+    return plan_response(status_code, content)
+
+
+def stored_search_response(supabase: SupabaseHelper, user_id: str) -> Optional[dict]:
+    """Serve `/search-emails` from the stored emails when the background sync keeps them current.
+
+    Fresh data (synced within SEARCH_FRESH_SECONDS) is returned as is; stale data is
+    returned too while the scheduler is asked to refresh it. Returns None when the
+    mailbox was never synced, or is stale and no background sync can refresh it, so
+    the caller runs the search inline.
+    """
+    try:
+        sync_state = load_sync_state(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load mailbox sync state: {e}")
+        return None
+    synced_until = parse_datetime(sync_state.get("synced_until")) if sync_state else None
+    if synced_until is None:
+        return None
+
+    age = (datetime.now(timezone.utc) - synced_until).total_seconds()
+    stale = age > SEARCH_FRESH_SECONDS
+    refreshing = stale and get_sync_scheduler().request_refresh(user_id)
+    if stale and not refreshing:
+        return None
+
+    try:
+        emails = load_stored_emails(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load stored emails: {e}")
+        return None
+    logger.info(f"Serving {len(emails)} stored emails synced {age:.0f}s ago (refreshing={refreshing})")
+    return {
+        "value": {"emails": emails},
+        "summary": "",
+        "source": "stored",
+        "synced_at": synced_until.isoformat(),
+        "stale": stale,
+        "refreshing": refreshing,
+    }
+
+
+def background_sync(user: User, supabase: SupabaseHelper) -> tuple[int, dict]:
+    """Scheduler job: an incremental sync that shares the plan run with any concurrent request."""
+    return get_search_flights().run(
+        f"{user.id}:sync",
+        lambda: process_search_emails(user, supabase, False)
+    )
+
+
+@app.get("/sync/status")
+def get_sync_status(request: Request):
+    """The caller's background sync schedule, last run and stored watermark."""
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+    supabase: Optional[SupabaseHelper] = getattr(request.state, "supabase_helper", None)
+    if not supabase:
+        return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
+
+    user_id = str(user.id)
+    try:
+        sync_state = load_sync_state(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load mailbox sync state: {e}")
+        sync_state = None
+    return JSONResponse(content={
+        "schedule": get_sync_scheduler().status(user_id),
+        "sync_state": sync_state,
+        "fresh_seconds": SEARCH_FRESH_SECONDS,
+    })
+
+
+def process_search_emails(user: User, supabase: SupabaseHelper, rescan: bool) -> tuple[int, dict]:
+    """Run the search plan, store new emails and advance the sync watermark.
+
+    Returns the `(status_code, content)` the endpoint responds with.
+    """
+    user_id = str(user.id)
     logger.info(f"Fetching profile for user_id: {user_id}")
-    profile_resp = supabase.client.table("profiles").select(
-        "email, min_budget, max_budget, content_niche, auto_generate_invoice, guidelines"
-    ).eq("id", user_id).execute()
-    logger.info(f"Profile response: {profile_resp}")
-    profiles = profile_resp.data
-    if not profiles:
+    profile = get_profile_cache().get(supabase, user_id)
+    if not profile:
         logger.warning("No profile found for user")
-        return JSONResponse(status_code=404, content={"detail": "Profile not found"})
-    profile = profiles[0]
-    logger.info("Successfully fetched user profile from Supabase")
+        return 404, {"detail": "Profile not found"}
+    logger.info("Successfully fetched user profile")
 
     profile_dict = dict(profile) if profile else {}
     logger.info(f"Profile dictionary: {profile_dict}")
 
-    logger.info("Initializing Portia helper with authenticated supabase session")
-    portia_helper = PortiaHelper(supabase_helper=supabase)
-    logger.info("Running search collaboration emails task")
-    result = portia_helper.run_search_colab_emails(
-        end_user=user,
-        context=profile_dict
+    # Incremental sync: only search mail received since the stored watermark and
+    # skip emails that are already classified, unless a full rescan is requested
+    sync_started_at = datetime.now(timezone.utc)
+    try:
+        sync_state = load_sync_state(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load mailbox sync state, scanning full window: {e}")
+        sync_state = None
+    since = sync_window_start(
+        parse_datetime(sync_state.get("synced_until")) if sync_state else None,
+        rescan,
+        now=sync_started_at
     )
+    known_email_ids = [] if rescan else load_known_email_ids(supabase, user_id, since)
+    query = build_search_query(since)
+    logger.info(f"Syncing mailbox since {since.isoformat()} (rescan={rescan}, {len(known_email_ids)} known emails)")
+
+    logger.info("Leasing Portia engine for search collaboration emails task")
+    # Filter and structure steps both read the profile plus the mailbox page
+    tokens = estimate_plan_tokens({"context": profile_dict, "query": query}, llm_steps=2) + SEARCH_RESULTS_TOKENS
+    try:
+        with get_llm_governor().admit(user_id, tokens), get_portia_pool().lease() as portia_helper:
+            result = portia_helper.run_search_colab_emails(
+                end_user=user,
+                context=profile_dict,
+                query=query,
+                known_email_ids=known_email_ids,
+                supabase_helper=supabase,
+                prefilter=EmailPrefilter(
+                    own_email=profile_dict.get("email"),
+                    model=relevance_models.get(supabase, user_id)
+                )
+            )
+    except LLMBusy as e:
+        logger.warning(f"LLM governor rejected search-emails: {e.reason}")
+        return 429, {"detail": e.reason, "retry_after": e.retry_after}
+    except TimeoutError:
+        logger.warning("No Portia engine available for search-emails")
+        return 503, {"detail": "Server busy, please retry"}
     logger.info(f"Portia helper returned result: {result}")
     _value: Optional[SearchColabEmailsResponse] = result.get("value")
     _summary = result.get("summary") or ""
+    # Which search plan classified the emails
+    plan_version = result.get("plan_version")
     _status = "success"
+    if _value and not isinstance(_value, SearchColabEmailsResponse):
+        try:
+            _value, _ = parse_structured(_value, SearchColabEmailsResponse)
+        except JSONRepairError as e:
+            logger.error(f"Failed to parse email search output: {e}")
+            _value = None
 
     if not _value:
         logger.warning("No valid emails data found")
         _status = "error"
-        return JSONResponse(status_code=404, content={"detail": "No valid emails data found", "status": _status})
+        return 404, {"detail": "No valid emails data found", "status": _status}
 
     try:
         value_json = _value.model_dump()
@@ -116,13 +311,17 @@ def search_emails(request: Request):
                     "last_received": email_data.get("last_received"),
                     "ui_actions": email_data.get("ui_actions", ["start_colab_process"]),
                     "notes": email_data.get("notes"),
-                    "user_id": user_id
+                    "user_id": user_id,
+                    "plan_version": plan_version
                 }
                 emails_to_insert.append(insert_data)
             try:
                 # Batch insert all emails with upsert (on conflict update)
-                result = supabase.client.table("emails").upsert(emails_to_insert).execute()
-                logger.info(f"Successfully upserted {len(emails_to_insert)} emails")
+                if emails_to_insert:
+                    supabase.client.table("emails").upsert(emails_to_insert).execute()
+                    logger.info(f"Successfully upserted {len(emails_to_insert)} emails")
+                # Advance the watermark only once the new emails are stored
+                save_sync_state(supabase, user_id, sync_started_at, emails_to_insert)
             except Exception as e:
                 logger.error(f"Failed to upsert emails: {e}")
         else:
@@ -131,15 +330,42 @@ def search_emails(request: Request):
     except Exception as e:
         logger.warning("Failed to parse JSON")
         _status = "error"
-        return JSONResponse(status_code=404, content={"detail": "No valid emails data found", "status": _status})
+        return 404, {"detail": "No valid emails data found", "status": _status}
+
+    # An incremental sync only finds mail since the watermark; respond with the whole
+    # stored window so clients that replace their list don't lose older emails
+    try:
+        stored = load_stored_emails(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Failed to load stored emails, returning new ones only: {e}")
+        stored = []
+    new_emails = value_json.get("emails") if isinstance(value_json, dict) else None
+    if isinstance(new_emails, list):
+        found = {email.get("email_id") for email in new_emails if isinstance(email, dict)}
+        value_json["emails"] = new_emails + [row for row in stored if row.get("email_id") not in found]
 
     logger.info("Returning response from search-emails endpoint")
-    return JSONResponse(content={"value": value_json, "summary": _summary})
+    return 200, {
+        "value": value_json,
+        "summary": _summary,
+        "plan_version": plan_version,
+        "new_emails": len(new_emails) if isinstance(new_emails, list) else 0
+    }
+
+
+class ThreadReply(BaseModel):
+    from_email: str
+    body: str
+    sent_at: Optional[str] = None
 
 
 # Pydantic model for request body
 class StartProcessRequest(BaseModel):
     email_id: str
+    # Partner replies on the thread; a re-run only feeds the ones not seen before
+    replies: Optional[List[ThreadReply]] = None
+    # Opt-in: enqueue the plan run and return 202 with the msg_id instead of waiting
+    background: Optional[bool] = False
 
 @app.post("/start-process")
 def start_colab_process(request: Request, body: StartProcessRequest):
@@ -168,6 +394,7 @@ def start_colab_process(request: Request, body: StartProcessRequest):
             "processed": False
         }
         supabase.client.table("messages").insert(message_data).execute()
+        get_run_event_broker().open(msg_id, user_id)
         logger.info("Successfully saved initial message to database")
     except Exception as e:
         logger.error(f"Failed to save initial message: {e}")
@@ -181,61 +408,274 @@ def start_colab_process(request: Request, body: StartProcessRequest):
     emails = email_resp.data
     if not emails:
         logger.warning(f"No email found with id: {body.email_id}")
+        get_run_event_broker().close(msg_id)
         return JSONResponse(status_code=404, content={"detail": "Email not found"})
     email = emails[0]
     logger.info(f"Successfully fetched email: {email.get('subject', 'No subject')}")
 
     # Fetch user profile
     logger.info(f"Fetching profile for user_id: {user_id}")
-    profile_resp = supabase.client.table("profiles").select(
-        "email, min_budget, max_budget, content_niche, auto_generate_invoice, guidelines"
-    ).eq("id", user_id).execute()
-    profiles = profile_resp.data
-    if not profiles:
+    profile = get_profile_cache().get(supabase, user_id)
+    if not profile:
         logger.warning("No profile found for user in start-process")
+        get_run_event_broker().close(msg_id)
         return JSONResponse(status_code=404, content={"detail": "Profile not found"})
-    profile = profiles[0]
     profile_dict = dict(profile) if profile else {}
     logger.info("Successfully fetched user profile")
 
-    # Run PortiaHelper.start_colab_process with email text/context
-    logger.info("Initializing Portia helper for start_colab_process with authenticated supabase session")
-    portia_helper = PortiaHelper(supabase_helper=supabase)
-    logger.info("Running start collaboration process task")
-    
-    # Use the updated method signature with user preferences
-    result = portia_helper.run_start_colab_process(
-        end_user=user,  # Use actual authenticated user object
-        email_data=email,
-        user_preferences=profile_dict,
-        msg_id=msg_id
+    replies = [reply.model_dump() for reply in body.replies or []]
+    try:
+        thread_state = load_thread_state(supabase, user_id, body.email_id)
+    except Exception as e:
+        # Without stored state the run just parses the thread from scratch
+        logger.warning(f"Failed to load thread state: {e}")
+        thread_state = ThreadState(user_id=user_id, email_id=body.email_id)
+
+    if body.background:
+        try:
+            get_job_queue().submit(
+                msg_id,
+                user_id,
+                lambda: process_start_colab(user, supabase, email, profile_dict, msg_id, thread_state, replies),
+                on_cancelled=lambda: close_cancelled_run(supabase, msg_id),
+            )
+        except JobQueueFull:
+            logger.warning("Job queue full, rejecting background start-process")
+            get_run_event_broker().close(msg_id)
+            return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"})
+        return JSONResponse(status_code=202, content={
+            "msg_id": msg_id,
+            "status": "queued",
+            "status_url": f"/start-process/{msg_id}"
+        })
+
+    status_code, content = process_start_colab(user, supabase, email, profile_dict, msg_id, thread_state, replies)
+    return plan_response(status_code, content)
+
+
+# Emails one batch request may start; larger selections are split by the client
+START_BATCH_MAX_EMAILS = int(os.getenv("START_BATCH_MAX_EMAILS", "50"))
+START_BATCH_CONCURRENCY = int(os.getenv("START_BATCH_CONCURRENCY", "3"))
+
+
+class BatchStartProcessRequest(BaseModel):
+    email_ids: List[str]
+    # Plan runs at a time for this batch, capped by START_BATCH_CONCURRENCY
+    concurrency: Optional[int] = None
+
+
+@app.post("/start-process/batch")
+def start_colab_process_batch(request: Request, body: BatchStartProcessRequest):
+    """Start the collaboration process for several emails in one request.
+
+    The profile and thread states are loaded once and the email rows fetched with a
+    single `in` query; the runs share a bounded worker pool and each result is
+    streamed back as one NDJSON line as soon as it finishes, followed by a summary.
+    """
+    logger.info("Starting start-process batch endpoint")
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    supabase: Optional[SupabaseHelper] = getattr(request.state, "supabase_helper", None)
+    if not supabase:
+        return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
+
+    user_id = str(user.id)
+    email_ids = list(dict.fromkeys(body.email_ids))
+    if not email_ids:
+        return JSONResponse(status_code=400, content={"detail": "No email_ids given"})
+    if len(email_ids) > START_BATCH_MAX_EMAILS:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"At most {START_BATCH_MAX_EMAILS} emails per batch"}
+        )
+
+    profile = get_profile_cache().get(supabase, user_id)
+    if not profile:
+        logger.warning("No profile found for user in start-process batch")
+        return JSONResponse(status_code=404, content={"detail": "Profile not found"})
+    profile_dict = dict(profile)
+
+    try:
+        rows = supabase.client.table("emails").select("*").eq(
+            "user_id", user_id
+        ).in_("email_id", email_ids).execute().data or []
+    except Exception as e:
+        logger.error(f"Failed to fetch batch emails: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to fetch emails"})
+    emails = {row["email_id"]: row for row in rows}
+
+    try:
+        thread_states = load_thread_states(supabase, user_id, list(emails))
+    except Exception as e:
+        logger.warning(f"Failed to load thread states: {e}")
+        thread_states = {email_id: ThreadState(user_id=user_id, email_id=email_id) for email_id in emails}
+
+    # One insert for every run's initial message
+    runs = {email_id: str(uuid.uuid4()) for email_id in emails}
+    if runs:
+        try:
+            supabase.client.table("messages").insert([
+                {
+                    "msg_id": msg_id,
+                    "user_id": user_id,
+                    "message": "Starting colab processing",
+                    "chat_id": email_id,
+                    "email_id": email_id,
+                    "processed": False
+                }
+                for email_id, msg_id in runs.items()
+            ]).execute()
+        except Exception as e:
+            logger.error(f"Failed to save initial batch messages: {e}")
+            return JSONResponse(status_code=500, content={"detail": "Failed to initialize processing"})
+        for msg_id in runs.values():
+            get_run_event_broker().open(msg_id, user_id)
+
+    concurrency = max(1, min(body.concurrency or START_BATCH_CONCURRENCY, START_BATCH_CONCURRENCY))
+
+    def results():
+        counts = {"succeeded": 0, "failed": 0}
+
+        def line(email_id: str, msg_id: Optional[str], status_code: int, content: dict) -> str:
+            counts["succeeded" if status_code == 200 else "failed"] += 1
+            return json.dumps({"email_id": email_id, "msg_id": msg_id, "status_code": status_code, **content}, default=str) + "\n"
+
+        for email_id in email_ids:
+            if email_id not in emails:
+                yield line(email_id, None, 404, {"detail": "Email not found"})
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kyodo-batch")
+        futures = {}
+        try:
+            futures = {
+                executor.submit(
+                    process_start_colab, user, supabase, emails[email_id], profile_dict, msg_id,
+                    thread_states.get(email_id)
+                ): (email_id, msg_id)
+                for email_id, msg_id in runs.items()
+            }
+            for future in as_completed(futures):
+                email_id, msg_id = futures[future]
+                try:
+                    status_code, content = future.result()
+                except Exception as e:
+                    logger.error(f"Batch run for {email_id} failed: {e}")
+                    get_run_event_broker().close(msg_id)
+                    status_code, content = 500, {"detail": "Failed to process collaboration analysis"}
+                yield line(email_id, msg_id, status_code, content)
+        finally:
+            # The client went away: runs already started finish and record their
+            # actions, the rest are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future, (_, msg_id) in futures.items():
+                if future.cancelled():
+                    get_run_event_broker().close(msg_id)
+
+        yield json.dumps({"done": True, "total": len(email_ids), **counts}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def publish_final_action(action_data: dict) -> None:
+    """Push a run's closing action to SSE subscribers and end the stream."""
+    get_run_event_broker().publish(
+        action_data["msg_id"],
+        action_data["action_type"],
+        {**action_data, "created_at": datetime.now(timezone.utc).isoformat()},
+        final=True
     )
 
+
+def save_final_action(supabase: SupabaseHelper, action_data: dict) -> None:
+    """Queue a run's closing action behind its step actions and flush the run."""
+    writer = get_action_writer()
+    writer.enqueue(supabase, "actions", action_data)
+    writer.flush(wait=False)
+
+
+def close_cancelled_run(supabase: SupabaseHelper, msg_id: str) -> None:
+    """Record a background run cancelled before it started, so clients stop waiting for it."""
+    action_data = {
+        "action_id": str(uuid.uuid4()),
+        "msg_id": msg_id,
+        "action_summary": "Collaboration analysis cancelled before it started",
+        "actor": "agent",
+        "details": {"error": "cancelled", "status": "error"},
+        "action_type": "error"
+    }
+    publish_final_action(action_data)
+    save_final_action(supabase, action_data)
+
+
+def process_start_colab(
+    user: User,
+    supabase: SupabaseHelper,
+    email: dict,
+    profile_dict: dict,
+    msg_id: str,
+    thread_state: Optional[ThreadState] = None,
+    replies: Optional[List[dict]] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> tuple[int, dict]:
+    """Run the start-process plan and record its final action.
+
+    Shared by the synchronous endpoint and background jobs; returns the
+    `(status_code, content)` the endpoint responds with. On success the thread
+    state is advanced so the next run on this email only reads new replies.
+    With a `checkpoint`, the stopped run `msg_id` is resumed instead: only its
+    unfinished steps run, on the inputs it was started with.
+    """
+    # Run PortiaHelper.start_colab_process with email text/context
+    logger.info("Leasing Portia engine for start collaboration process task")
+    # Six plan steps plus the summary each read the email (or thread delta) and/or the profile
+    if checkpoint is not None:
+        tokens = estimate_plan_tokens(checkpoint.inputs, llm_steps=max(1, 7 - len(checkpoint.outputs)))
+    else:
+        tokens = estimate_plan_tokens(start_process_inputs(email, profile_dict, thread_state, replies), llm_steps=7)
+    try:
+        with get_llm_governor().admit(str(user.id), tokens), get_portia_pool().lease() as portia_helper:
+            if checkpoint is not None:
+                result = portia_helper.resume_start_colab_process(checkpoint, supabase_helper=supabase)
+            else:
+                result = portia_helper.run_start_colab_process(
+                    end_user=user,  # Use actual authenticated user object
+                    email_data=email,
+                    user_preferences=profile_dict,
+                    msg_id=msg_id,
+                    supabase_helper=supabase,
+                    thread_state=thread_state,
+                    replies=replies
+                )
+    except TimeoutError:
+        logger.warning("No Portia engine available for start-process")
+        get_run_event_broker().close(msg_id)
+        return 503, {"detail": "Server busy, please retry"}
+    except LLMBusy as e:
+        logger.warning(f"LLM governor rejected start-process: {e.reason}")
+        get_run_event_broker().close(msg_id)
+        return 429, {"detail": e.reason, "retry_after": e.retry_after}
+
     logger.info(f"Portia helper returned result: {result}")
+    if result.get("error") == "plan_changed":
+        logger.warning(f"Can't resume run {msg_id}: {result.get('details')}")
+        get_run_event_broker().close(msg_id)
+        return 409, {"detail": "The plan changed since this run started, start a new run", "status": "error"}
     _value: Optional[StartColabProcessResponse] = result.get("value")
     _summary = result.get("summary") or ""
     _status = "success"
     action_type = "final_start_colab_process"
 
-    # Handle case where value is a string (fallback parsing)
-    if isinstance(_value, str):
-        logger.info("Value is string, attempting to parse JSON from markdown")
+    # Plan output may arrive as text (prose, fenced or truncated JSON): extract and
+    # validate it instead of failing the whole run
+    if _value is not None and not isinstance(_value, StartColabProcessResponse):
         try:
-            # Try to extract JSON from markdown code blocks
-            match = re.search(r"```json\s*([\s\S]*?)\s*```", _value.strip())
-            if match:
-                value_clean = match.group(1).strip()
-                logger.info("Found JSON code block, extracted content")
-            else:
-                value_clean = _value.strip()
-                logger.info("No JSON code block found, using raw value")
-            
-            # Parse the JSON string
-            parsed_json = json.loads(value_clean)
-            logger.info("Successfully parsed JSON from string value")
-            _value = parsed_json  # Use the parsed JSON directly
-        except Exception as e:
-            logger.error(f"Failed to parse JSON from string value: {e}")
+            _value, repaired = parse_structured(_value, StartColabProcessResponse)
+            if repaired:
+                logger.info("Repaired malformed collaboration analysis JSON")
+        except JSONRepairError as e:
+            logger.error(f"Failed to parse collaboration analysis output: {e}")
             _value = None
 
     if not _value:
@@ -255,25 +695,24 @@ def start_colab_process(request: Request, body: StartProcessRequest):
                 "action_summary": "Initial collaboration analysis failed",
                 "actor": "agent",
                 "details": {"error": "No valid collaboration analysis data found", "status": _status},
-                "action_type": action_type
+                "action_type": action_type,
+                "plan_version": result.get("plan_version")
             }
-            supabase.client.table("actions").insert(action_data).execute()
+            publish_final_action(action_data)
+            save_final_action(supabase, action_data)
             logger.info("Successfully saved error action to database")
         except Exception as e:
             logger.error(f"Failed to save error action: {e}")
         
-        return JSONResponse(status_code=404, content={"detail": "No valid collaboration analysis data found", "status": _status})
+        content = {"detail": "No valid collaboration analysis data found", "status": _status}
+        if result.get("resumable"):
+            # The finished steps are checkpointed; a resume only re-runs the rest
+            content["resume_url"] = f"/start-process/{msg_id}/resume"
+        return 404, content
 
     try:
-        # Handle both structured response and parsed JSON
-        if isinstance(_value, dict):
-            # If it's already a dict (from fallback parsing), use it directly
-            value_json = _value
-            logger.info("Using parsed JSON dictionary directly")
-        else:
-            # If it's a structured response object, dump it
-            value_json = _value.model_dump()
-            logger.info("Successfully extracted structured collaboration analysis response")
+        value_json = _value.model_dump()
+        logger.info("Successfully extracted structured collaboration analysis response")
         
         # Save successful action to database
         logger.info("Saving successful action to database")
@@ -284,12 +723,25 @@ def start_colab_process(request: Request, body: StartProcessRequest):
                 "action_summary": "Initial collaboration analysis completed",
                 "actor": "agent", 
                 "details": value_json,
-                "action_type": action_type
+                "action_type": action_type,
+                "plan_version": result.get("plan_version")
             }
-            supabase.client.table("actions").insert(action_data).execute()
+            publish_final_action(action_data)
+            save_final_action(supabase, action_data)
             logger.info("Successfully saved successful action to database")
         except Exception as e:
             logger.error(f"Failed to save successful action: {e}")
+
+        if thread_state is not None:
+            try:
+                thread_state.advance(
+                    replies or [],
+                    _value.email_parsed.model_dump(mode="json"),
+                    _value.analysis.model_dump(mode="json"),
+                )
+                save_thread_state(supabase, thread_state)
+            except Exception as e:
+                logger.error(f"Failed to save thread state: {e}")
             
     except Exception as e:
         logger.error(f"Failed to extract structured response: {e}")
@@ -305,18 +757,272 @@ def start_colab_process(request: Request, body: StartProcessRequest):
                 "action_summary": "Initial collaboration analysis failed",
                 "actor": "agent",
                 "details": {"error": f"Failed to extract structured response: {e}", "status": _status},
-                "action_type": action_type
+                "action_type": action_type,
+                "plan_version": result.get("plan_version")
             }
-            supabase.client.table("actions").insert(action_data).execute()
+            publish_final_action(action_data)
+            save_final_action(supabase, action_data)
             logger.info("Successfully saved error action to database")
         except Exception as e:
             logger.error(f"Failed to save error action: {e}")
             
-        return JSONResponse(status_code=500, content={"detail": "Failed to process collaboration analysis", "status": _status})
+        return 500, {"detail": "Failed to process collaboration analysis", "status": _status}
+
+    # The run finished: nothing left to resume
+    delete_checkpoints(supabase, msg_id)
 
     logger.info("Returning response from start-process endpoint")
+    content = {
+        "value": value_json,
+        "summary": _summary,
+        "status": _status,
+        "plan_version": result.get("plan_version")
+    }
+    if "resumed_steps" in result:
+        content["resumed_steps"] = result["resumed_steps"]
+    return 200, content
+
+
+@app.get("/emails")
+def get_emails(
+    request: Request,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    labels: Optional[str] = Query(None, description="Comma separated; emails must carry all of them"),
+    min_relevance: Optional[float] = None,
+    max_relevance: Optional[float] = None,
+):
+    """Page through the user's stored emails, newest first, with a keyset cursor."""
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    supabase: Optional[SupabaseHelper] = getattr(request.state, "supabase_helper", None)
+    if not supabase:
+        return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
+
+    try:
+        page = list_emails(
+            supabase,
+            str(user.id),
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+            labels=[label.strip() for label in labels.split(",") if label.strip()] if labels else None,
+            min_relevance=min_relevance,
+            max_relevance=max_relevance,
+        )
+    except InvalidListingRequest as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        logger.error(f"Failed to list emails: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to list emails"})
+
+    etag = page_etag(page)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=page, headers=headers)
+
+
+class ProfileUpdateRequest(BaseModel):
+    min_budget: Optional[float] = None
+    max_budget: Optional[float] = None
+    content_niche: Optional[str] = None
+    auto_generate_invoice: Optional[bool] = None
+    guidelines: Optional[str] = None
+
+@app.patch("/profile")
+def update_profile(request: Request, body: ProfileUpdateRequest):
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    supabase: Optional[SupabaseHelper] = getattr(request.state, "supabase_helper", None)
+    if not supabase:
+        return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
+
+    changes = body.model_dump(exclude_unset=True)
+    if not changes:
+        return JSONResponse(status_code=400, content={"detail": "No profile fields to update"})
+
+    user_id = str(user.id)
+    try:
+        resp = supabase.client.table("profiles").update(changes).eq("id", user_id).execute()
+    except Exception as e:
+        logger.error(f"Failed to update profile: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to update profile"})
+    finally:
+        get_profile_cache().invalidate(user_id)
+
+    if not resp.data:
+        return JSONResponse(status_code=404, content={"detail": "Profile not found"})
+    return JSONResponse(content={"status": "updated", "fields": sorted(changes)})
+
+
+@app.get("/start-process/{msg_id}")
+def get_start_process_status(request: Request, msg_id: str):
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    job = get_job_queue().get(msg_id)
+    if not job or job.user_id != str(user.id):
+        return JSONResponse(status_code=404, content={"detail": "Job not found"})
+    return JSONResponse(content=job.to_dict())
+
+
+class ResumeProcessRequest(BaseModel):
+    # Opt-in: enqueue the resumed run and return 202, as for /start-process
+    background: Optional[bool] = False
+
+
+@app.post("/start-process/{msg_id}/resume")
+def resume_start_process(request: Request, msg_id: str, body: Optional[ResumeProcessRequest] = None):
+    """Continue a failed start-process run: steps with a checkpointed output are
+    restored, and the plan re-enters at the first step without one."""
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+    supabase: Optional[SupabaseHelper] = getattr(request.state, "supabase_helper", None)
+    if not supabase:
+        return JSONResponse(status_code=500, content={"detail": "Database connection not available"})
+
+    user_id = str(user.id)
+    job = get_job_queue().get(msg_id)
+    if job and job.status in ("queued", "running"):
+        return JSONResponse(status_code=409, content={"detail": "Run is still in progress"})
+    try:
+        messages = supabase.client.table("messages").select("email_id").eq(
+            "msg_id", msg_id
+        ).eq("user_id", user_id).execute().data
+    except Exception as e:
+        logger.error(f"Failed to fetch run {msg_id}: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to fetch run"})
+    if not messages:
+        return JSONResponse(status_code=404, content={"detail": "Run not found"})
+    email_id = messages[0]["email_id"]
+
+    # A run that just failed may still have checkpoints buffered in the writer
+    get_action_writer().flush(wait=True)
+    try:
+        finished = supabase.client.table("actions").select("action_id").eq(
+            "msg_id", msg_id
+        ).eq("action_type", "final_start_colab_process").limit(1).execute().data
+    except Exception as e:
+        logger.error(f"Failed to fetch actions of run {msg_id}: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to fetch run"})
+    if finished:
+        # Resuming would re-run the summary, record a second result and advance the thread again
+        return JSONResponse(status_code=409, content={"detail": "Run already finished"})
+    try:
+        checkpoint = load_checkpoint(supabase, msg_id)
+    except Exception as e:
+        logger.error(f"Failed to load checkpoints for run {msg_id}: {e}")
+        return JSONResponse(status_code=500, content={"detail": "Failed to load run checkpoints"})
+    if checkpoint is None:
+        return JSONResponse(status_code=404, content={"detail": "No checkpoints for this run"})
+
+    try:
+        thread_state = load_thread_state(supabase, user_id, email_id)
+    except Exception as e:
+        logger.warning(f"Failed to load thread state: {e}")
+        thread_state = ThreadState(user_id=user_id, email_id=email_id)
+
+    logger.info(f"Resuming run {msg_id} with {len(checkpoint.outputs)} checkpointed steps")
+    get_run_event_broker().open(msg_id, user_id)
+
+    def resume() -> tuple[int, dict]:
+        return process_start_colab(
+            user, supabase, {}, {}, msg_id, thread_state, checkpoint.replies, checkpoint=checkpoint
+        )
+
+    if body and body.background:
+        try:
+            get_job_queue().submit(
+                msg_id, user_id, resume, on_cancelled=lambda: close_cancelled_run(supabase, msg_id)
+            )
+        except JobQueueFull:
+            logger.warning("Job queue full, rejecting background resume")
+            get_run_event_broker().close(msg_id)
+            return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"})
+        return JSONResponse(status_code=202, content={
+            "msg_id": msg_id,
+            "status": "queued",
+            "status_url": f"/start-process/{msg_id}"
+        })
+    status_code, content = resume()
+    return plan_response(status_code, content)
+
+
+@app.post("/start-process/{msg_id}/cancel")
+def cancel_start_process(request: Request, msg_id: str):
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    job = get_job_queue().get(msg_id)
+    if not job or job.user_id != str(user.id):
+        return JSONResponse(status_code=404, content={"detail": "Job not found"})
+    job = get_job_queue().cancel(msg_id)
+    logger.info(f"Cancel requested for job {msg_id}, status: {job.status}")
+    return JSONResponse(content=job.to_dict())
+
+
+@app.get("/runs/{msg_id}/events")
+async def stream_run_events(request: Request, msg_id: str):
+    """Server-Sent Events stream of a run's step outputs and its final action.
+
+    Resumes after the `Last-Event-ID` header (or `last_event_id` query param) when a
+    client reconnects. The stream ends after the final action.
+    """
+    user: Optional[User] = getattr(request.state, "user", None)
+    if not user or not getattr(user, "id", None):
+        return JSONResponse(status_code=401, content={"detail": "User not authenticated"})
+
+    broker = get_run_event_broker()
+    if broker.owner(msg_id) != str(user.id):
+        return JSONResponse(status_code=404, content={"detail": "Run not found"})
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id") or "0"
+    try:
+        after_id = int(last_event_id)
+    except ValueError:
+        after_id = 0
+
+    async def event_stream():
+        async for event in broker.subscribe(msg_id, after_id):
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from run {msg_id} events")
+                break
+            yield ": keepalive\n\n" if event is None else event.encode()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/stats")
+def get_stats():
+    """In-process counters for the engine pool, LLM governor, background jobs, caches, action writer, sync scheduler, model routes and plan templates."""
     return JSONResponse(content={
-        "value": value_json, 
-        "summary": _summary, 
-        "status": _status
+        "portia_pool": get_portia_pool().stats(),
+        "jobs": get_job_queue().stats(),
+        "llm_governor": get_llm_governor().stats(),
+        "step_cache": get_step_cache().stats(),
+        "profile_cache": get_profile_cache().stats(),
+        "search_flights": get_search_flights().stats(),
+        "action_writer": get_action_writer().stats(),
+        "sync_scheduler": get_sync_scheduler().stats(),
+        "model_router": get_model_router().stats(),
+        "plan_templates": get_plan_templates().stats()
     })
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of latency histograms, in-flight runs and token counts."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
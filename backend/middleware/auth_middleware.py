@@ -4,14 +4,24 @@ from fastapi.responses import JSONResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from typing import Optional
 from datetime import datetime
+import hmac
+import os
+import time
 
 from supabase_auth import User
+from helpers.metrics import auth_seconds
 from helpers.supabase_helper import SupabaseHelper
+from middleware.token_verifier import TokenVerifier
 
 class AuthMiddleware(BaseHTTPMiddleware):
+    # Scraped with METRICS_TOKEN instead of a user session; not served when it is unset
+    METRICS_PATH = "/metrics"
+
     def __init__(self, app):
         super().__init__(app)
         self.supabase_helper = SupabaseHelper()
+        self.metrics_token = os.getenv("METRICS_TOKEN") or None
+        self.token_verifier = TokenVerifier.from_env(get_user=self.get_remote_user)
         self.cors_headers = {
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
@@ -21,6 +31,13 @@ class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
         if request.method == "OPTIONS":
             return JSONResponse(status_code=200, content={"detail": "OK"}, headers=self.cors_headers)
+        if request.url.path == self.METRICS_PATH:
+            if not self.metrics_token:
+                return JSONResponse(status_code=404, content={"detail": "Not Found"})
+            scheme, _, token = (request.headers.get("Authorization") or "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), self.metrics_token.encode()):
+                return JSONResponse(status_code=401, content={"detail": "Invalid metrics token"})
+            return await call_next(request)
 
         auth_header = request.headers.get("Authorization")
         refresh_token = request.headers.get("X-Refresh-Token")
@@ -30,35 +47,44 @@ class AuthMiddleware(BaseHTTPMiddleware):
             scheme, _, token = auth_header.partition(" ")
             if scheme.lower() != "bearer" or not token:
                 raise ValueError("Invalid auth header format")
-            user = self.verify_token(token, refresh_token)
+            started_at = time.perf_counter()
+            result = "error"
+            try:
+                user = self.verify_token(token, refresh_token)
+                result = "ok" if user else "invalid"
+            finally:
+                auth_seconds.observe(time.perf_counter() - started_at, result=result)
             if not user:
                 return JSONResponse(status_code=401, content={"detail": "Invalid or expired token", "refresh_token": refresh_token})
 
-            # this line authenticates user so we can use the supabase client
-            # without breaking RLS
-            _session = self.supabase_helper.client.auth.set_session(token, refresh_token)
-
             request.state.user = user
-            request.state.supabase_helper = self.supabase_helper
+            # Per-request client that sends the caller's token on every query so
+            # RLS applies, without mutating a session shared across requests
+            request.state.supabase_helper = self.supabase_helper.scoped(token)
         except Exception as e:
             return JSONResponse(status_code=401, content={"detail": f"Invalid token: {str(e)}"})
         return await call_next(request)
 
     def verify_token(self, jwt_token: str, refresh_token: str) -> Optional[User]:
         """
-        Verify JWT token validity and return user information using Supabase SDK.
+        Verify JWT token validity and return user information.
+
+        Tokens are verified locally and served from a TTL cache; Supabase is only
+        asked (`get_remote_user`) on a cache miss or when the entry is due for
+        revalidation. See `TokenVerifier`.
         Args:
             jwt_token (str): JWT token to verify
         Returns:
-            dict: User information if token is valid
+            User: User information if token is valid
         """
-        # try:
         if not jwt_token:
             return None
+        return self.token_verifier.verify(jwt_token)
+
+    def get_remote_user(self, jwt_token: str) -> Optional[User]:
+        """Fetch the token's user from Supabase Auth."""
         db_user = self.supabase_helper.client.auth.get_user(jwt_token)
         if not db_user or not db_user.user:
             return None
         
         return db_user.user if db_user else None
-        # except Exception:
-        #     return None
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import jwt
+from portia import logger
+from supabase_auth import User
+
+
+class _CachedToken:
+    __slots__ = ("user", "expires_at", "checked_at")
+
+    def __init__(self, user: User, expires_at: float, checked_at: float) -> None:
+        self.user = user
+        self.expires_at = expires_at
+        self.checked_at = checked_at
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens with a bounded LRU+TTL cache.
+
+    Tokens are checked locally first: HS256 tokens against the project's JWT secret,
+    asymmetric ones against the project's JWKS. A token that fails local verification
+    is rejected without a remote call. Verified users are cached by token hash until
+    the token's `exp`, and `get_user` (the remote Supabase check) only runs on a cache
+    miss or once an entry is older than `revalidate_seconds`, which bounds how long a
+    revoked session keeps working.
+
+    The JWKS client is only built when `jwks_url` is given. If the key set can't be
+    fetched or parsed (including RS/ES keys without `cryptography` installed), the
+    token falls back to the remote check rather than being rejected.
+
+    When neither a secret nor a JWKS URL is configured, every miss goes to
+    `get_user`, but hits are still served from the cache.
+    """
+
+    def __init__(
+        self,
+        get_user: Callable[[str], Optional[User]],
+        jwt_secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: str = "authenticated",
+        max_entries: int = 10000,
+        revalidate_seconds: float = 300,
+    ) -> None:
+        self.get_user = get_user
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._jwks: Optional[jwt.PyJWKClient] = None
+        if jwks_url:
+            try:
+                self._jwks = jwt.PyJWKClient(jwks_url, cache_keys=True)
+            except jwt.PyJWTError as e:
+                logger().warning(f"JWKS verification disabled, using remote checks: {e}")
+
+        self._cache: "OrderedDict[str, _CachedToken]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.remote_calls = 0
+        self.local_rejects = 0
+
+    @classmethod
+    def from_env(cls, get_user: Callable[[str], Optional[User]]) -> "TokenVerifier":
+        """Build a verifier from SUPABASE_JWT_SECRET / SUPABASE_JWKS_URL and AUTH_* settings.
+
+        JWKS verification is opt-in: set SUPABASE_JWKS_URL (for Supabase projects,
+        `<SUPABASE_URL>/auth/v1/.well-known/jwks.json`) to enable it.
+        """
+        return cls(
+            get_user=get_user,
+            jwt_secret=os.getenv("SUPABASE_JWT_SECRET") or None,
+            jwks_url=os.getenv("SUPABASE_JWKS_URL") or None,
+            max_entries=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+            revalidate_seconds=float(os.getenv("AUTH_REVALIDATE_SECONDS", "300")),
+        )
+
+    def verify(self, token: str) -> Optional[User]:
+        """Return the token's user, or None if the token is invalid or expired."""
+        if not token:
+            return None
+        key = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if now >= entry.expires_at:
+                    del self._cache[key]
+                    entry = None
+                elif now - entry.checked_at < self.revalidate_seconds:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return entry.user
+            self.misses += 1
+
+        claims = self._decode(token)
+        if claims is None:
+            return None
+        expires_at = float(claims.get("exp", 0))
+        if expires_at and now >= expires_at:
+            return None
+
+        with self._lock:
+            self.remote_calls += 1
+        user = self.get_user(token)
+        if not user:
+            with self._lock:
+                self._cache.pop(key, None)
+            return None
+
+        with self._lock:
+            self._cache[key] = _CachedToken(user, expires_at or now + self.revalidate_seconds, now)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return user
+
+    def _decode(self, token: str) -> Optional[dict]:
+        """Decode claims, verifying the signature when a key is available."""
+        try:
+            alg = jwt.get_unverified_header(token).get("alg", "")
+            if alg.startswith("HS") and self.jwt_secret:
+                return jwt.decode(token, self.jwt_secret, algorithms=[alg], audience=self.audience)
+            if not alg.startswith("HS") and self._jwks is not None:
+                signing_key = self._signing_key(token)
+                if signing_key is not None:
+                    return jwt.decode(token, signing_key, algorithms=[alg], audience=self.audience)
+            # No local key for this algorithm: read exp only and leave the
+            # signature check to the remote call.
+            return jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError as e:
+            with self._lock:
+                self.local_rejects += 1
+            logger().info(f"Rejected token locally: {e}")
+            return None
+
+    def _signing_key(self, token: str) -> Optional[object]:
+        """The token's key from the JWKS, or None if it can't be fetched or parsed."""
+        try:
+            return self._jwks.get_signing_key_from_jwt(token).key
+        except jwt.PyJWTError as e:
+            # Covers PyJWKClientError and key parsing errors (PyJWKError, PyJWKSetError)
+            logger().warning(f"JWKS lookup failed, falling back to remote check: {e}")
+            return None
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._cache.pop(hashlib.sha256(token.encode()).hexdigest(), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._cache)
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_calls": self.remote_calls,
+            "local_rejects": self.local_rejects,
+        }
@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useRef } from "react";
 import { useParams } from "react-router-dom";
 import { supabase } from "../lib/supabaseClient";
+import { streamRunEvents } from "../lib/runEvents";
 import {
   Timeline,
   TimelineItem,
@@ -58,7 +59,7 @@ interface Action {
   details?: any;
   created_at: string;
   updated_at: string;
-  action_type: "step_output" | "final_start_colab_process";
+  action_type: "step_output" | "final_start_colab_process" | "error";
 }
 
 interface MessageWithActions {
@@ -66,6 +67,10 @@ interface MessageWithActions {
   actions: Action[];
 }
 
+// Slow poll that picks up runs started from other tabs or devices, and runs whose
+// event stream is unavailable; live runs still stream their step outputs
+const POLL_MS = 15000;
+
 const ChatRooms: React.FC<ChatRoomsProps> = ({ onNavigate }) => {
   const { email_id } = useParams<{ email_id: string }>();
   const [emails, setEmails] = useState<Email[]>([]);
@@ -80,7 +85,7 @@ const ChatRooms: React.FC<ChatRoomsProps> = ({ onNavigate }) => {
   const [user, setUser] = useState<any>(null);
 
   const chatAreaRef = useRef<HTMLDivElement>(null);
-  const pollingRef = useRef<NodeJS.Timeout | null>(null);
+  const streamsRef = useRef<Map<string, AbortController>>(new Map());
 
   // Fetch user and AI-activated emails
   useEffect(() => {
@@ -205,27 +210,61 @@ const ChatRooms: React.FC<ChatRoomsProps> = ({ onNavigate }) => {
     }
   };
 
-  // Set up polling for messages and actions
+  // Load messages, poll slowly for new runs, and stream step outputs for runs in progress
   useEffect(() => {
     if (!currentEmail) return;
 
-    // Initial fetch
     fetchMessagesWithActions(currentEmail.email_id);
-
-    // Set up polling every 5 seconds
-    pollingRef.current = setInterval(() => {
-      console.log("Polling for messages and actions...");
+    const polling = setInterval(() => {
       fetchMessagesWithActions(currentEmail.email_id);
-    }, 5000);
+    }, POLL_MS);
 
-    // Cleanup
     return () => {
-      if (pollingRef.current) {
-        clearInterval(pollingRef.current);
-      }
+      streamsRef.current.forEach((controller) => controller.abort());
+      streamsRef.current.clear();
+      clearInterval(polling);
     };
   }, [currentEmail]);
 
+  useEffect(() => {
+    const running = messagesWithActions.filter(
+      ({ actions }) =>
+        !actions.some(
+          (action) =>
+            action.action_type === "final_start_colab_process" ||
+            action.action_type === "error",
+        ),
+    );
+
+    running.forEach(({ message }) => {
+      if (streamsRef.current.has(message.msg_id)) return;
+
+      const controller = new AbortController();
+      streamsRef.current.set(message.msg_id, controller);
+      streamRunEvents(
+        message.msg_id,
+        ({ data }) => {
+          if (!data?.action_id) return;
+          setMessagesWithActions((prev) =>
+            prev.map((entry) =>
+              entry.message.msg_id === message.msg_id &&
+              !entry.actions.some((a) => a.action_id === data.action_id)
+                ? { ...entry, actions: [...entry.actions, data as Action] }
+                : entry,
+            ),
+          );
+        },
+        controller.signal,
+      ).then((end) => {
+        // A run that closed without a final action (or can't be streamed) may have
+        // written an error action or nothing at all: read what was stored
+        if (end !== "final" && !controller.signal.aborted) {
+          fetchMessagesWithActions(message.email_id);
+        }
+      });
+    });
+  }, [messagesWithActions]);
+
   // Auto-scroll to bottom when messages change
   useEffect(() => {
     if (chatAreaRef.current) {
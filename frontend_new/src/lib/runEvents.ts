@@ -0,0 +1,89 @@
+import { supabase } from "./supabaseClient";
+
+export interface RunEvent {
+  id: number;
+  event: string;
+  data: any;
+}
+
+// How a run's event stream ended: "final" once the run's final action arrived,
+// "closed" when the run ended without one (e.g. no free engine, rate limited, or
+// the email or plan changed), "unavailable" when the stream couldn't be read (the
+// run lives on another worker, the backend restarted, or the broker dropped it).
+export type RunStreamEnd = "final" | "closed" | "unavailable";
+
+// Streams GET /runs/{msg_id}/events. EventSource can't send the auth headers the
+// backend requires, so this reads the SSE body through fetch instead. Reconnects
+// with Last-Event-ID until the run's final or closed event or until `signal`
+// aborts. Anything but "final" means the caller should refetch the run's actions.
+export const streamRunEvents = async (
+  msgId: string,
+  onEvent: (event: RunEvent) => void,
+  signal: AbortSignal,
+): Promise<RunStreamEnd> => {
+  let lastEventId = 0;
+  let ended: RunStreamEnd | null = null;
+
+  while (!ended && !signal.aborted) {
+    const { data: session } = await supabase.auth.getSession();
+    if (!session?.session) return "unavailable";
+
+    let response: Response;
+    try {
+      response = await fetch(
+        `${import.meta.env.VITE_BACKEND_URL}/runs/${msgId}/events`,
+        {
+          headers: {
+            Authorization: `Bearer ${session.session.access_token}`,
+            "X-Refresh-Token": session.session.refresh_token || "",
+            "Last-Event-ID": String(lastEventId),
+          },
+          signal,
+        },
+      );
+    } catch (error) {
+      if (signal.aborted) return "unavailable";
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      continue;
+    }
+
+    // 404 means the run is unknown to this backend (finished long ago or restarted)
+    if (!response.ok || !response.body) return "unavailable";
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    try {
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const chunk = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          let id = 0;
+          let event = "message";
+          let data = "";
+          for (const line of chunk.split("\n")) {
+            if (line.startsWith("id: ")) id = Number(line.slice(4));
+            else if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (!data) continue; // keepalive comment
+
+          lastEventId = id;
+          onEvent({ id, event, data: JSON.parse(data) });
+          if (event === "closed") ended = "closed";
+          else if (event !== "step_output") ended = "final";
+        }
+      }
+    } catch (error) {
+      if (signal.aborted) return "unavailable";
+    }
+  }
+  return ended ?? "unavailable";
+};